@@ -0,0 +1,94 @@
+"""
+Import-Time Benchmark.
+
+Measures the start-up cost of TerraViz in fresh interpreters:
+- import only: import src.mapper without any lookup (e.g. --help, non-render modes)
+- lazy:  import src.mapper and look up the three types of a small plan
+         (only the diagrams modules those types need are imported)
+- eager: import src.mapper and resolve every mapped class
+         (what importing the mapper used to cost before classes were resolved lazily)
+- main.py --help: full CLI start-up, parsing included
+- main.py small plan: end-to-end run on a synthetic 20-resource plan, writing the
+  DOT source with the DOT backend (no Graphviz, no render or plan cache)
+
+With `--baseline REV`, `main.py --help` is also timed on a checkout of that git
+revision (e.g. the commit before a change), so regressions show up end to end
+rather than only in the mapper.
+
+Usage:
+    python benchmarks/bench_import.py [--runs N] [--baseline REV]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synth_plan import write_plan
+
+SNIPPETS = {
+    "import only": "import src.mapper\n",
+    "lazy (3 types)": (
+        "from src.mapper import get_diagram_node\n"
+        "for t in ('google_compute_instance', 'google_sql_database_instance', 'google_storage_bucket'):\n"
+        "    get_diagram_node(t)\n"
+    ),
+    "eager (all types)": (
+        "from src.mapper import TERRAFORM_GCP_MAPPING, get_diagram_node\n"
+        "for t in TERRAFORM_GCP_MAPPING:\n"
+        "    get_diagram_node(t)\n"
+    ),
+}
+
+def time_command(cmd, runs, cwd=ROOT):
+    """Runs a command `runs` times in a fresh process and returns the wall times in ms."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def export_revision(rev, directory):
+    """Writes the tree of a git revision into `directory`."""
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, check=True, capture_output=True).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TerraViz start-up time.")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per case. Default: 10")
+    parser.add_argument("--baseline", default=None, metavar="REV", help="Also time `main.py --help` at this git revision")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The small-plan run writes ./output: keep it out of the repository
+        work_dir = os.path.join(tmp_dir, "work")
+        os.makedirs(work_dir)
+        main_py = os.path.join(ROOT, "main.py")
+        sample = os.path.join(tmp_dir, "small", "tfplan.json")
+        write_plan(sample, resources=20)
+
+        cases = {name: ([sys.executable, "-c", code], ROOT) for name, code in SNIPPETS.items()}
+        cases["main.py --help"] = ([sys.executable, main_py, "--help"], ROOT)
+        cases["main.py small plan"] = ([sys.executable, main_py, sample, "dot", "--backend", "dot", "--no-cache"], work_dir)
+        if args.baseline:
+            baseline_dir = os.path.join(tmp_dir, "baseline")
+            os.makedirs(baseline_dir)
+            export_revision(args.baseline, baseline_dir)
+            cases[f"--help @ {args.baseline}"] = ([sys.executable, os.path.join(baseline_dir, "main.py"), "--help"], baseline_dir)
+
+        interpreter = time_command([sys.executable, "-c", "pass"], args.runs)
+
+        print(f"{'case':<22} {'median ms':>10} {'min ms':>10} {'minus interpreter':>18}")
+        for name, (cmd, cwd) in cases.items():
+            samples = time_command(cmd, args.runs, cwd=cwd)
+            print(f"{name:<22} {statistics.median(samples):>10.1f} {min(samples):>10.1f} {statistics.median(samples) - statistics.median(interpreter):>18.1f}")
+
+if __name__ == "__main__":
+    main()
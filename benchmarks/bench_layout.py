@@ -0,0 +1,93 @@
+"""
+Stable Layout Benchmark.
+
+Measures what a layout file (`--layout`, see `src.layout`) costs or saves when a
+plan changes a little between two renders. For each size, a synthetic plan is
+rendered once to store its layout, then a few resource blocks are added and the
+changed plan is rendered twice:
+- dot:    laid out from scratch with `dot` (no stored layout)
+- pinned: the nodes of the first render pinned, the new ones placed by `fdp`
+
+Both renders also write the positions of the new layout, so they run the same
+Graphviz outputs, and the render cache is off. The table reports the median
+wall time of the render stage and how many nodes were pinned.
+
+Requires Graphviz (`dot` and `fdp` on the PATH): the script exits without
+measuring anything when they are missing.
+
+Usage:
+    python benchmarks/bench_layout.py [--sizes 200,1000,3000] [--added N] [--runs N] [--format svg]
+        [--module-depth N] [--fan-out N] [--ref-density X]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synth_plan import add_arguments, plan_params, write_plan
+from src.generator import create_diagram
+from src.layout import INCREMENTAL_ENGINE
+
+def render(plan_path, output_filename, outformat, layout_file):
+    """Renders a plan with a layout file. Returns (render stage seconds, pinned nodes)."""
+    metrics = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_diagram(plan_path, output_filename, outformat=outformat, backend="dot", cache=False, layout_file=layout_file, metrics_hook=metrics.update)
+    seconds = sum(s['wall_seconds'] for s in metrics['stages'] if s['name'].startswith("render"))
+    return seconds, metrics['counts'].get('layout_pinned', 0)
+
+def bench_size(size, args, tmp_dir):
+    """Times both renders of the changed plan. Returns (dot seconds, pinned seconds, pinned nodes)."""
+    params = plan_params(args)
+    before = os.path.join(tmp_dir, f"before_{size}.json")
+    after = os.path.join(tmp_dir, f"after_{size}.json")
+    # Blocks are generated in order from the seed: the changed plan only appends new ones
+    write_plan(before, **dict(params, resources=size))
+    write_plan(after, **dict(params, resources=size + args.added))
+
+    stored = os.path.join(tmp_dir, f"layout_{size}.json")
+    render(before, os.path.join(tmp_dir, "before"), args.format, stored)
+
+    dot_times, pinned_times, pinned = [], [], 0
+    for _ in range(args.runs):
+        layout_file = os.path.join(tmp_dir, "layout.json")
+        if os.path.exists(layout_file):
+            os.remove(layout_file)
+        dot_times.append(render(after, os.path.join(tmp_dir, "dot"), args.format, layout_file)[0])
+
+        shutil.copyfile(stored, layout_file)
+        seconds, pinned = render(after, os.path.join(tmp_dir, "pinned"), args.format, layout_file)
+        pinned_times.append(seconds)
+    return statistics.median(dot_times), statistics.median(pinned_times), pinned
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a pinned incremental layout with a full dot layout.")
+    parser.add_argument("--sizes", default="200,1000,3000", help="Comma-separated resource counts. Default: 200,1000,3000")
+    parser.add_argument("--added", type=int, default=10, help="Resource instances added between the two renders. Default: 10")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per render. Default: 3")
+    parser.add_argument("--format", default="svg", help="Output format. Default: svg")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    missing = [engine for engine in ("dot", INCREMENTAL_ENGINE) if shutil.which(engine) is None]
+    if missing:
+        print(f"Graphviz not found ({', '.join(missing)} missing from PATH): nothing measured.")
+        sys.exit(0)
+
+    print(f"{'resources':>10} {'dot s':>9} {'pinned s':>9} {'speedup':>8} {'pinned nodes':>13}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            dot_seconds, pinned_seconds, pinned = bench_size(size, args, tmp_dir)
+            print(f"{size:>10} {dot_seconds:>9.3f} {pinned_seconds:>9.3f} {dot_seconds / pinned_seconds:>7.2f}x {pinned:>13}")
+
+if __name__ == "__main__":
+    main()
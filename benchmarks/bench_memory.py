@@ -0,0 +1,109 @@
+"""
+Memory Benchmark.
+
+Generates synthetic plans (see `synth_plan.py`) and measures, for each size:
+- records:  the size of the node and cluster records of the graph model,
+            compared with the same fields stored in one dictionary per element
+            (the layout used before `src.model`);
+- retained: the memory still allocated when rendering starts, when the raw
+            plan and the extracted resources are kept alive next to the graph
+            model, and once they are released (what `create_diagram` does).
+
+Allocations are measured with tracemalloc, so strings shared between the plan
+and the graph (addresses, labels) are only counted once.
+
+Usage:
+    python benchmarks/bench_memory.py [--sizes 1000,10000,50000] [--module-depth N] [--fan-out N]
+        [--ref-density X] [--json PATH]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synth_plan import RESOURCE_TYPES, add_arguments, plan_params, write_plan
+from src.loader import load_plan, extract_resources
+from src.mapper import get_diagram_node
+from src.resolver import build_graph
+
+MB = 1024 * 1024
+
+def traced():
+    """Currently allocated memory, after a full collection."""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+def record_sizes(graph):
+    """Returns (bytes as slotted records, bytes as one dictionary per element) of the graph elements."""
+    elements = list(graph['nodes'].values()) + list(graph['clusters'].values())
+    before = traced()
+    as_dicts = [{field: getattr(element, field) for field in element.__slots__} for element in elements]
+    dict_bytes = traced() - before
+    del as_dicts
+    record_bytes = sum(sys.getsizeof(element) for element in elements)
+    return record_bytes, dict_bytes
+
+def measure(plan_path):
+    """Returns the memory figures of one plan, in MB."""
+    tracemalloc.start()
+    try:
+        baseline = traced()
+        plan = load_plan(plan_path)
+        resources = extract_resources(plan)
+        graph = build_graph(resources)
+        kept = traced() - baseline
+
+        record_bytes, dict_bytes = record_sizes(graph)
+
+        del plan, resources
+        released = traced() - baseline
+    finally:
+        tracemalloc.stop()
+    return {
+        'nodes': len(graph['nodes']),
+        'records_mb': record_bytes / MB,
+        'dicts_mb': dict_bytes / MB,
+        'retained_with_plan_mb': kept / MB,
+        'retained_graph_only_mb': released / MB,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory held by the TerraViz graph model on synthetic plans.")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated resource counts. Default: 1000,10000,50000")
+    add_arguments(parser)
+    parser.add_argument("--json", default=None, metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = []
+
+    # Resolve the icon classes up front so their imports are not counted
+    for res_type, _ in RESOURCE_TYPES:
+        get_diagram_node(res_type)
+
+    print(f"{'resources':>10} {'nodes':>8} {'dicts MB':>10} {'records MB':>11} {'with plan MB':>13} {'released MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            params = plan_params(args)
+            params['resources'] = size
+            plan_path = os.path.join(tmp_dir, f"plan_{size}.json")
+            write_plan(plan_path, **params)
+
+            r = measure(plan_path)
+            report.append(dict(r, size=size))
+            print(f"{size:>10} {r['nodes']:>8} {r['dicts_mb']:>10.1f} {r['records_mb']:>11.1f} {r['retained_with_plan_mb']:>13.1f} {r['retained_graph_only_mb']:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'params': plan_params(args), 'results': report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Pipeline Benchmark.
+
+Generates synthetic plans (see `synth_plan.py`) of increasing size and times
+each stage of the pipeline separately:
+- parse:    load_plan (JSON load and pruning)
+- extract:  extract_resources (module walk, reference rewriting, instance expansion)
+- clusters: find_parent_cluster for every resource
+- labels:   get_resource_label for every resource
+- graph:    build_graph (clusters, placement, labels and layers together)
+- edges:    build_edges (dependency edges from every reference)
+- render:   DOT emission and Graphviz (skipped with --no-render)
+
+Every size runs twice: once for wall time, and once under tracemalloc for the
+peak memory of each stage (tracemalloc slows the code down, so it is kept out
+of the timings). With several sizes the table ends with the growth exponent of
+each stage: about 1.0 is linear, and anything approaching 2.0 is a quadratic
+blow-up.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 1000,5000,20000] [--module-depth N] [--fan-out N]
+        [--ref-density X] [--backend dot|diagrams] [--format svg] [--no-render] [--json PATH]
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synth_plan import RESOURCE_TYPES, add_arguments, plan_params, write_plan
+from src.loader import load_plan, extract_resources
+from src.mapper import get_diagram_node
+from src.model import Cluster
+from src.resolver import build_cluster_index, build_edges, build_graph, find_parent_cluster, instance_keys
+from src.resources.lookup import get_resource_label
+from src.dot import emit_dot, run_dot
+from src.render import render_diagram
+from src.generator import layout_attrs
+from src.metrics import reset_peak
+
+STAGES = ["parse", "extract", "clusters", "labels", "graph", "edges", "render"]
+
+def run_pipeline(plan_path, output_filename, backend, outformat, render):
+    """
+    Yields the (stage, thunk) pairs of one run of the pipeline, in order, so the
+    caller decides how to measure them. Each thunk returns the number of items it processed.
+    """
+    state = {}
+
+    def parse():
+        state['plan'] = load_plan(plan_path)
+        return 1
+
+    def extract():
+        state['resources'] = extract_resources(state['plan'])
+        return len(state['resources'])
+
+    def clusters():
+        resources = state['resources']
+        cluster_types = {'google_compute_network': 'vpc', 'google_compute_subnetwork': 'subnet'}
+        index = build_cluster_index({res['address']: Cluster(res['address'], cluster_types[res['type']], res['address']) for res in resources if res['type'] in cluster_types})
+        for res in resources:
+            find_parent_cluster(res.get('expressions', {}), index, instance_keys(res['address']))
+        return len(resources)
+
+    def labels():
+        for res in state['resources']:
+            get_resource_label(res)
+        return len(state['resources'])
+
+    def graph():
+        state['graph'] = build_graph(state['resources'])
+        return len(state['graph']['nodes'])
+
+    def edges():
+        graph = state['graph']
+        return len(build_edges(state['resources'], graph['nodes'], graph['aliases'])[0])
+
+    def render_stage():
+        if backend == "dot":
+            run_dot(emit_dot(state['graph'], graph_attr=layout_attrs(state['graph'])), output_filename, outformat=outformat)
+        else:
+            render_diagram(state['graph'], output_filename, outformat=outformat, graph_attr=layout_attrs(state['graph']))
+        return len(state['graph']['nodes'])
+
+    yield "parse", parse
+    yield "extract", extract
+    yield "clusters", clusters
+    yield "labels", labels
+    yield "graph", graph
+    yield "edges", edges
+    if render:
+        yield "render", render_stage
+
+def measure(plan_path, output_filename, backend, outformat, render):
+    """Returns {stage: {'seconds', 'peak_mb', 'count'}} for one plan."""
+    results = {}
+
+    # Pass 1: wall time
+    for stage, thunk in run_pipeline(plan_path, output_filename, backend, outformat, render):
+        gc.collect()
+        start = time.perf_counter()
+        count = thunk()
+        results[stage] = {'seconds': time.perf_counter() - start, 'count': count}
+
+    # Pass 2: peak memory of each stage (allocations made by the stage itself)
+    tracemalloc.start()
+    try:
+        for stage, thunk in run_pipeline(plan_path, output_filename, backend, outformat, render):
+            gc.collect()
+            reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            thunk()
+            results[stage]['peak_mb'] = (tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+    return results
+
+def growth_exponent(sizes, seconds):
+    """Slope of log(time) against log(size) between the smallest and largest plan."""
+    if len(sizes) < 2 or seconds[0] <= 0 or seconds[-1] <= 0:
+        return None
+    return math.log(seconds[-1] / seconds[0]) / math.log(sizes[-1] / sizes[0])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the TerraViz pipeline on synthetic plans.")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="Comma-separated resource counts. Default: 1000,5000,20000")
+    add_arguments(parser)
+    parser.add_argument("--backend", choices=["dot", "diagrams"], default="dot", help="Rendering backend. Default: dot")
+    parser.add_argument("--format", default="svg", help="Output format of the render stage. Default: svg")
+    parser.add_argument("--no-render", action="store_true", help="Skip the render stage (no Graphviz needed)")
+    parser.add_argument("--json", default=None, metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    stages = [stage for stage in STAGES if stage != "render" or not args.no_render]
+    report = []
+
+    # Resolve the icon classes up front so the first size does not pay for the imports
+    for res_type, _ in RESOURCE_TYPES:
+        get_diagram_node(res_type)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            params = plan_params(args)
+            params['resources'] = size
+            plan_path = os.path.join(tmp_dir, f"plan_{size}.json")
+            write_plan(plan_path, **params)
+
+            results = measure(plan_path, os.path.join(tmp_dir, f"diagram_{size}"), args.backend, args.format, not args.no_render)
+            report.append({'size': size, 'plan_mb': os.path.getsize(plan_path) / (1024 * 1024), 'stages': results})
+
+            print(f"\n{size} resources ({report[-1]['plan_mb']:.1f} MB plan)")
+            print(f"  {'stage':<10} {'seconds':>10} {'peak MB':>10} {'items':>10}")
+            for stage in stages:
+                r = results[stage]
+                print(f"  {stage:<10} {r['seconds']:>10.3f} {r['peak_mb']:>10.1f} {r['count']:>10}")
+
+    if len(sizes) > 1:
+        print(f"\nGrowth exponent ({sizes[0]} -> {sizes[-1]} resources; 1.0 = linear, 2.0 = quadratic)")
+        for stage in stages:
+            exponent = growth_exponent(sizes, [entry['stages'][stage]['seconds'] for entry in report])
+            flag = "  <-- superlinear" if exponent is not None and exponent > 1.3 else ""
+            print(f"  {stage:<10} {exponent:>10.2f}{flag}" if exponent is not None else f"  {stage:<10} {'n/a':>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'params': plan_params(args), 'backend': args.backend, 'results': report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
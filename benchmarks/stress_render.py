@@ -0,0 +1,107 @@
+"""
+Concurrent Rendering Stress Test.
+
+Builds and renders many diagrams at once in the threads of a single process
+and checks that none of them was corrupted by another: every concurrent
+result must match the serial render of the same graph. The renders cycle
+through several option sets (plain, simple labels, module clusters with
+dependency edges), so interleaved builds produce different diagrams.
+
+`diagrams` gives its nodes random ids, so the DOT sources are compared after
+renumbering the ids in order of appearance.
+
+Usage:
+    python benchmarks/stress_render.py [--renders 64] [--threads 16] [--backend diagrams|dot]
+        [--format png] [--no-render] [--plan PATH | --resources N ...]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synth_plan import add_arguments, plan_params, write_plan
+from src.loader import load_plan, extract_resources
+from src.resolver import build_graph
+from src.generator import layout_attrs, graph_source, render_graph
+
+# Option sets the renders cycle through
+VARIANTS = [
+    {},
+    {'simple': True},
+    {'module_clusters': True, 'edges': True},
+]
+
+NODE_ID = re.compile(r"\b[0-9a-f]{32}\b")
+
+def normalize(source):
+    """Renumbers the random node ids of a DOT source in order of appearance."""
+    ids = {}
+    source = NODE_ID.sub(lambda m: ids.setdefault(m.group(), f"n{len(ids)}"), source)
+    return re.sub(r'"(n\d+)"', r"\1", source)
+
+def render_one(resources, variant, backend, outformat, output_filename):
+    """Builds (and, with an output filename, renders) one diagram. Returns its normalized DOT source."""
+    graph = build_graph(resources, **VARIANTS[variant])
+    graph_attr = layout_attrs(graph)
+    if output_filename:
+        render_graph(graph, output_filename, [outformat], backend=backend, graph_attr=graph_attr)
+    return normalize(graph_source(graph, backend, graph_attr))
+
+def run(resources, renders, workers, backend, outformat, out_dir):
+    """Runs the renders on `workers` threads. Returns (wall seconds, normalized sources)."""
+    def job(i):
+        output_filename = os.path.join(out_dir, f"render_{i}") if out_dir else None
+        return render_one(resources, i % len(VARIANTS), backend, outformat, output_filename)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sources = list(executor.map(job, range(renders)))
+    return time.perf_counter() - start, sources
+
+def main():
+    parser = argparse.ArgumentParser(description="Render many TerraViz diagrams concurrently in threads and check the results.")
+    parser.add_argument("--renders", type=int, default=64, help="Number of renders. Default: 64")
+    parser.add_argument("--threads", type=int, default=16, help="Number of threads. Default: 16")
+    parser.add_argument("--backend", choices=["diagrams", "dot"], default="diagrams", help="Rendering backend. Default: diagrams")
+    parser.add_argument("--format", default="png", help="Output format of the renders. Default: png")
+    parser.add_argument("--no-render", action="store_true", help="Only build the diagrams (no Graphviz)")
+    parser.add_argument("--plan", default=None, help="Use this tfplan.json instead of a synthetic plan")
+    add_arguments(parser)
+    parser.set_defaults(resources=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plan_path = args.plan
+        if plan_path is None:
+            plan_path = os.path.join(tmp_dir, "plan.json")
+            write_plan(plan_path, **plan_params(args))
+        resources = extract_resources(load_plan(plan_path))
+
+        expected = [render_one(resources, variant, args.backend, args.format, None) for variant in range(len(VARIANTS))]
+        out_dir = None if args.no_render else os.path.join(tmp_dir, "out")
+        if out_dir:
+            os.makedirs(out_dir)
+
+        serial, _ = run(resources, args.renders, 1, args.backend, args.format, out_dir)
+        wall, sources = run(resources, args.renders, args.threads, args.backend, args.format, out_dir)
+
+        corrupted = [i for i, source in enumerate(sources) if source != expected[i % len(VARIANTS)]]
+        missing = [i for i in range(args.renders) if out_dir and not os.path.exists(os.path.join(out_dir, f"render_{i}.{args.format}"))]
+        leftovers = sorted(name for name in os.listdir(out_dir) if "." not in name) if out_dir else []
+
+    print(f"{args.renders} renders ({args.backend}, {len(resources)} resources): "
+          f"serial {serial:.2f}s, {args.threads} threads {wall:.2f}s ({serial / wall:.1f}x)")
+    print(f"corrupted: {len(corrupted)}  missing outputs: {len(missing)}  stray files: {len(leftovers)}")
+    if corrupted or missing or leftovers:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
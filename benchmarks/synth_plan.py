@@ -0,0 +1,244 @@
+"""
+Synthetic Terraform Plan Generator.
+
+Builds a `terraform show -json` style plan of arbitrary size, so the pipeline
+can be measured (and its scaling checked) on inputs much larger than the
+samples. The plan contains every section TerraViz reads:
+
+- 'configuration': VPCs and subnets in the root module, and resource blocks
+  spread over a chain of nested modules ('module.layer0.module.layer1...').
+  Network references cross the module boundaries through 'var.*' inputs, the
+  way real modules receive their network.
+- 'planned_values': one entry per instance, including count/for_each expansion.
+- 'resource_changes' and 'prior_state': filler, as in real plans.
+
+Parameters:
+- resources: number of resource instances (excluding VPCs and subnets).
+- vpcs / subnets: number of VPCs, and of subnets per VPC.
+- module_depth: nesting depth of the module chain (0 = everything in the root).
+- fan_out: instances per resource block (blocks alternate count and for_each).
+- ref_density: average number of extra references from a block to earlier blocks.
+
+Usage:
+    python benchmarks/synth_plan.py OUTPUT.json [--resources N] [--vpcs N] [--subnets N]
+        [--module-depth N] [--fan-out N] [--ref-density X] [--seed N]
+"""
+
+import argparse
+import json
+import os
+import random
+
+# Resource types of the synthetic plan, with the network attachment each one uses:
+# 'subnet' (network_interface.subnetwork), 'vpc' (network) or None (global resource)
+RESOURCE_TYPES = [
+    ("google_compute_instance", "subnet"),
+    ("google_container_cluster", "subnet"),
+    ("google_sql_database_instance", "vpc"),
+    ("google_redis_instance", "vpc"),
+    ("google_compute_firewall", "vpc"),
+    ("google_compute_address", "subnet"),
+    ("google_storage_bucket", None),
+    ("google_pubsub_topic", None),
+    ("google_cloud_run_service", None),
+    ("google_bigquery_dataset", None),
+    ("google_service_account", None),
+    ("google_kms_crypto_key", None),
+]
+
+def _constant(value):
+    return {"constant_value": value}
+
+def _references(*refs):
+    return {"references": list(refs)}
+
+def _module_path(level):
+    """Address of the module at `level` of the chain ('' for the root module)."""
+    return ".".join(f"module.layer{i}" for i in range(level))
+
+def _expressions(res_type, attachment, network_ref, extra_refs):
+    """Builds the configuration expressions of a resource block."""
+    exprs = {"labels": _constant({"env": "bench"})}
+    if res_type == "google_compute_instance":
+        exprs["machine_type"] = _constant("e2-standard-4")
+        exprs["zone"] = _constant("us-central1-a")
+        exprs["boot_disk"] = [{"initialize_params": [{"image": _constant("debian-cloud/debian-12")}]}]
+    elif res_type == "google_sql_database_instance":
+        exprs["database_version"] = _constant("POSTGRES_15")
+        exprs["settings"] = [{"tier": _constant("db-custom-2-7680"), "ip_configuration": [{"ipv4_enabled": _constant(False)}]}]
+    elif res_type == "google_compute_firewall":
+        exprs["allow"] = [{"protocol": _constant("tcp"), "ports": _constant(["443"])}]
+        exprs["source_ranges"] = _constant(["10.0.0.0/8"])
+
+    if attachment == "subnet":
+        exprs["network_interface"] = [{"subnetwork": _references(f"{network_ref}.id", network_ref), "access_config": [{}]}]
+    elif attachment == "vpc" and res_type == "google_sql_database_instance":
+        exprs["settings"][0]["ip_configuration"][0]["private_network"] = _references(f"{network_ref}.id", network_ref)
+    elif attachment == "vpc":
+        exprs["network"] = _references(f"{network_ref}.id", network_ref)
+
+    if extra_refs:
+        exprs["metadata"] = _references(*[r for ref in extra_refs for r in (f"{ref}.id", ref)])
+    return exprs
+
+def generate_plan(resources=1000, vpcs=2, subnets=4, module_depth=0, fan_out=1, ref_density=1.0, seed=0):
+    """
+    Generates a synthetic Terraform plan.
+
+    Args:
+        resources (int, optional): Number of resource instances. Defaults to 1000.
+        vpcs (int, optional): Number of VPCs. Defaults to 2.
+        subnets (int, optional): Number of subnets per VPC. Defaults to 4.
+        module_depth (int, optional): Depth of the nested module chain. Defaults to 0.
+        fan_out (int, optional): Instances per resource block. Defaults to 1.
+        ref_density (float, optional): Average extra references per block. Defaults to 1.0.
+        seed (int, optional): Random seed, for reproducible plans. Defaults to 0.
+
+    Returns:
+        dict: The plan.
+    """
+    rng = random.Random(seed)
+    fan_out = max(1, fan_out)
+
+    # Root module: the network containers
+    root = {"resources": []}
+    root_planned = {"resources": []}
+    vpc_names = [f"vpc_{v}" for v in range(vpcs)]
+    subnet_names = [f"subnet_{v}_{s}" for v in range(vpcs) for s in range(subnets)]
+    for name in vpc_names:
+        root["resources"].append({
+            "address": f"google_compute_network.{name}", "mode": "managed", "type": "google_compute_network", "name": name,
+            "expressions": {"name": _constant(name.replace("_", "-")), "auto_create_subnetworks": _constant(False)},
+        })
+        root_planned["resources"].append({
+            "address": f"google_compute_network.{name}", "mode": "managed", "type": "google_compute_network", "name": name,
+            "values": {"name": name.replace("_", "-")},
+        })
+    for i, name in enumerate(subnet_names):
+        vpc_ref = f"google_compute_network.{vpc_names[i // subnets]}"
+        root["resources"].append({
+            "address": f"google_compute_subnetwork.{name}", "mode": "managed", "type": "google_compute_subnetwork", "name": name,
+            "expressions": {"name": _constant(name.replace("_", "-")), "network": _references(f"{vpc_ref}.id", vpc_ref)},
+        })
+        root_planned["resources"].append({
+            "address": f"google_compute_subnetwork.{name}", "mode": "managed", "type": "google_compute_subnetwork", "name": name,
+            "values": {"name": name.replace("_", "-"), "ip_cidr_range": f"10.{i // 256}.{i % 256}.0/24", "region": "us-central1"},
+        })
+
+    # Module chain: each level receives every network through input variables
+    config_modules = [root]
+    planned_modules = [root_planned]
+    for level in range(1, module_depth + 1):
+        inputs = {}
+        for name in vpc_names:
+            inputs[name] = _references(f"google_compute_network.{name}.id", f"google_compute_network.{name}") if level == 1 else _references(f"var.{name}")
+        for name in subnet_names:
+            inputs[name] = _references(f"google_compute_subnetwork.{name}.id", f"google_compute_subnetwork.{name}") if level == 1 else _references(f"var.{name}")
+        module = {"resources": []}
+        config_modules[-1]["module_calls"] = {f"layer{level - 1}": {"source": f"./modules/layer{level - 1}", "expressions": inputs, "module": module}}
+        planned = {"address": _module_path(level), "resources": []}
+        planned_modules[-1]["child_modules"] = [planned]
+        config_modules.append(module)
+        planned_modules.append(planned)
+
+    # Resource blocks, spread randomly over the module levels
+    blocks = [[] for _ in config_modules] # Per level: local addresses of the blocks declared so far
+    changes = []
+    for b in range((resources + fan_out - 1) // fan_out):
+        level = rng.randrange(len(config_modules))
+        res_type, attachment = RESOURCE_TYPES[b % len(RESOURCE_TYPES)]
+        name = f"r{b}"
+        local_addr = f"{res_type}.{name}"
+
+        network_ref = None
+        if attachment == "subnet" and subnet_names:
+            target = rng.choice(subnet_names)
+            network_ref = f"var.{target}" if level else f"google_compute_subnetwork.{target}"
+        elif attachment == "vpc" and vpc_names:
+            target = rng.choice(vpc_names)
+            network_ref = f"var.{target}" if level else f"google_compute_network.{target}"
+
+        n_refs = int(ref_density) + (rng.random() < ref_density - int(ref_density))
+        earlier = blocks[level]
+        extra_refs = rng.sample(earlier, min(n_refs, len(earlier)))
+
+        res = {
+            "address": local_addr, "mode": "managed", "type": res_type, "name": name,
+            "expressions": _expressions(res_type, attachment if network_ref else None, network_ref, extra_refs),
+        }
+        if fan_out > 1 and b % 2 == 0:
+            res["count_expression"] = _constant(fan_out)
+            keys = list(range(fan_out))
+        elif fan_out > 1:
+            res["for_each_expression"] = _constant({f"k{i}": i for i in range(fan_out)})
+            keys = [f"k{i}" for i in range(fan_out)]
+        else:
+            keys = [None]
+        config_modules[level]["resources"].append(res)
+        earlier.append(local_addr)
+
+        prefix = f"{_module_path(level)}." if level else ""
+        for key in keys:
+            suffix = "" if key is None else f"[{json.dumps(key)}]"
+            address = f"{prefix}{local_addr}{suffix}"
+            planned = {
+                "address": address, "mode": "managed", "type": res_type, "name": name,
+                "values": {"name": f"{name}-{key}" if key is not None else name, "machine_type": "e2-standard-4", "zone": "us-central1-a", "location": "US"},
+            }
+            if key is not None:
+                planned["index"] = key
+            planned_modules[level]["resources"].append(planned)
+            changes.append({"address": address, "type": res_type, "name": name, "change": {"actions": ["create"], "before": None, "after": planned["values"]}})
+
+    return {
+        "format_version": "1.2",
+        "terraform_version": "1.6.0",
+        "planned_values": {"root_module": root_planned},
+        "resource_changes": changes,
+        "prior_state": {"values": {"root_module": {}}},
+        "configuration": {"provider_config": {"google": {"name": "google"}}, "root_module": root},
+    }
+
+def write_plan(path, **params):
+    """Generates a plan (see `generate_plan`) and writes it to `path`, creating its directory. Returns the plan."""
+    plan = generate_plan(**params)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(plan, f)
+    return plan
+
+def add_arguments(parser):
+    """Registers the generator parameters on an argparse parser."""
+    parser.add_argument("--resources", type=int, default=1000, help="Number of resource instances. Default: 1000")
+    parser.add_argument("--vpcs", type=int, default=2, help="Number of VPCs. Default: 2")
+    parser.add_argument("--subnets", type=int, default=4, help="Subnets per VPC. Default: 4")
+    parser.add_argument("--module-depth", type=int, default=0, help="Depth of the nested module chain. Default: 0")
+    parser.add_argument("--fan-out", type=int, default=1, help="Instances per resource block (count/for_each). Default: 1")
+    parser.add_argument("--ref-density", type=float, default=1.0, help="Average extra references per block. Default: 1.0")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. Default: 0")
+
+def plan_params(args):
+    """Extracts the generator parameters from parsed arguments."""
+    return {
+        "resources": args.resources,
+        "vpcs": args.vpcs,
+        "subnets": args.subnets,
+        "module_depth": args.module_depth,
+        "fan_out": args.fan_out,
+        "ref_density": args.ref_density,
+        "seed": args.seed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Terraform plan JSON.")
+    parser.add_argument("output", help="Path of the generated tfplan.json")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    plan = write_plan(args.output, **plan_params(args))
+    print(f"Wrote {args.output}: {len(plan['resource_changes'])} instances, {args.vpcs} VPCs, {args.vpcs * args.subnets} subnets")
+
+if __name__ == "__main__":
+    main()
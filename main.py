@@ -6,10 +6,12 @@ It handles argument parsing, output directory setup, and invoking the core
 diagram generation logic.
 
 Usage:
-    python main.py <path_to_tfplan.json> [output_format] [--save-script]
+    python main.py <path_to_tfplan.json> [output_format] [--save-script] [--simple] [--module-clusters] [--aggregate N] [--no-cache] [--backend diagrams|dot] [--render-workers N] [--edges [--max-edges N] [--reduce-edges]] [--diff] [--changed-only] [--previous PATH] [--snapshot PATH] [--partition vpc|module [--partition-workers N]] [--large-graph N] [--render-timeout SECONDS] [--layout PATH] [--layer TYPE=LAYER ...] [--profile [summary|json|cprofile]]
+    python main.py --batch <directory|glob|manifest> [output_format] [--workers N] [--summary PATH]
+    python main.py --serve <HOST:PORT|socket path> [--workers N] [--queue N]
 """
 
-from src.generator import create_diagram
+from src.mapper import LAYER_ORDER
 import sys
 import os
 import argparse
@@ -31,10 +33,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate infrastructure diagrams from Terraform plan JSON.")
     
     # Required argument: Path to the JSON plan file
-    parser.add_argument("plan_path", help="Path to the tfplan.json file")
+    parser.add_argument("plan_path", help="Path to the tfplan.json file (with --batch: a directory, glob pattern or manifest; with --serve: HOST:PORT or a Unix socket path)")
     
     # Optional argument: Output format (default: png)
-    parser.add_argument("output_format", nargs="?", default="png", help="Output format (png, jpg, dot, etc.). Default: png")
+    parser.add_argument("output_format", nargs="?", default="png", help="Output format (png, jpg, dot, etc.), or a comma-separated list (e.g. png,svg,dot). Default: png")
     
     # Optional flag: Save the Python script used to generate the diagram
     parser.add_argument("--save-script", action="store_true", help="Save the generated Python script for manual review")
@@ -42,10 +44,112 @@ if __name__ == "__main__":
     # Optional flag: Use simplified labels
     parser.add_argument("--simple", action="store_true", help="Use simplified labels (names only)")
 
+    # Optional flag: Draw each Terraform module as a cluster
+    parser.add_argument("--module-clusters", action="store_true", help="Group resources of each module into a cluster")
+
+    # Optional: Collapse large count/for_each fan-outs into a single node
+    parser.add_argument("--aggregate", type=int, default=None, metavar="N", help="Collapse N or more instances of the same resource block into one node")
+
+    # Optional flag: Always invoke Graphviz, even when an identical diagram was rendered before
+    parser.add_argument("--no-cache", action="store_true", help="Disable the render and parsed-plan caches")
+
+    # Optional: Rendering backend
+    parser.add_argument("--backend", choices=["diagrams", "dot"], default="diagrams", help="diagrams: build with the diagrams library; dot: emit DOT directly (faster on large plans). Default: diagrams")
+
+    # Optional: Bound the number of Graphviz processes when rendering several formats
+    parser.add_argument("--render-workers", type=int, default=None, metavar="N", help="Maximum number of formats rendered concurrently (within each partition with --partition). Default: one per format, up to the CPU count")
+
+    # Optional: Dependency edges derived from the references between resources
+    parser.add_argument("--edges", action="store_true", help="Draw dependency edges between resources (from their references)")
+    parser.add_argument("--max-edges", type=int, default=None, metavar="N", help="Draw at most N dependency edges")
+    parser.add_argument("--reduce-edges", action="store_true", help="Omit dependency edges implied by longer paths (transitive reduction)")
+
+    # Optional: Highlight the planned changes (resource_changes)
+    parser.add_argument("--diff", action="store_true", help="Color resources by their planned change (create, update, delete, replace)")
+    parser.add_argument("--changed-only", action="store_true", help="Render only changed resources, their clusters and direct neighbours (implies --diff)")
+
+    # Optional: Incremental resolution against a previous run
+    parser.add_argument("--previous", default=None, metavar="PATH", help="Previous tfplan.json or graph snapshot: unchanged resources reuse their resolved labels and clusters; with --batch, a directory holding one <name>.json per plan")
+    parser.add_argument("--snapshot", default=None, metavar="PATH", help="Persist the resolved graph snapshot here (and reuse it on the next run); with --batch, a directory holding one <name>.json per plan")
+
+    # Optional: Large plans
+    parser.add_argument("--partition", choices=["vpc", "module"], default=None, help="Render one diagram per top-level VPC or module (in parallel), plus an overview")
+    parser.add_argument("--partition-workers", type=int, default=None, metavar="N", help="Number of processes rendering partitions in parallel. Default: CPU count")
+    parser.add_argument("--large-graph", type=int, default=500, metavar="N", help="Above N nodes, use cheaper layout settings (no orthogonal splines); 0 disables. Default: 500")
+
+    parser.add_argument("--render-timeout", type=float, default=None, metavar="SECONDS", help="Kill Graphviz after SECONDS and retry with cheaper layouts; as a last resort, write the DOT source and a text summary")
+
+    # Optional: Layout
+    parser.add_argument("--layout", default=None, metavar="PATH", help="Persist node positions here; the next render pins unchanged nodes and lays out only new ones (requires --backend dot); with --batch, a directory holding one <name>.json per plan")
+    parser.add_argument("--layer", action="append", default=[], metavar="TYPE=LAYER", help=f"Place a resource type in another column ({', '.join(LAYER_ORDER)}); repeatable")
+
+    # Optional: Per-stage timings, counts and peak allocations
+    parser.add_argument("--profile", nargs="?", const="summary", default=None, choices=["summary", "json", "cprofile"], help="Instrument each stage: print a summary (default), write <output>.metrics.json, or also dump cProfile stats to <output>.prof")
+
+    # Batch mode: render many plans with a pool of worker processes
+    parser.add_argument("--batch", action="store_true", help="Render every plan matched by plan_path (directory, glob or manifest)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes in batch and server mode. Default: CPU count")
+    parser.add_argument("--summary", default=None, help="Path of the batch summary JSON. Default: output/batch_summary.json")
+
+    # Server mode: render uploaded plans over HTTP with a warm pool of worker processes
+    parser.add_argument("--serve", action="store_true", help="Run a render server listening on plan_path (HOST:PORT or a Unix socket path)")
+    parser.add_argument("--queue", type=int, default=64, metavar="N", help="Maximum number of renders waiting in server mode. Default: 64")
+
     args = parser.parse_args()
+
+    # Imported after parsing: --help and argument errors do not pay for the pipeline modules
+    from src.generator import create_diagram
+    from src.batch import run_batch, default_output_name
     
     plan_path = args.plan_path
     output_format = args.output_format
+
+    # Layer overrides: TYPE=LAYER
+    layer_overrides = {}
+    for assignment in args.layer:
+        res_type, _, layer = assignment.partition("=")
+        if not res_type or layer not in LAYER_ORDER:
+            parser.error(f"--layer expects TYPE=LAYER with LAYER one of {', '.join(LAYER_ORDER)} (got '{assignment}')")
+        layer_overrides[res_type] = layer
+
+    if args.layout and (args.backend != "dot" or args.partition):
+        parser.error("--layout requires --backend dot and cannot be combined with --partition")
+
+    # Options shared by the single-plan and batch modes
+    options = {
+        "save_script": args.save_script,
+        "simple": args.simple,
+        "module_clusters": args.module_clusters,
+        "aggregate_threshold": args.aggregate,
+        "cache": not args.no_cache,
+        "backend": args.backend,
+        "render_workers": args.render_workers,
+        "edges": args.edges,
+        "max_edges": args.max_edges,
+        "reduce_edges": args.reduce_edges,
+        "diff": args.diff,
+        "changed_only": args.changed_only,
+        "previous": args.previous,
+        "snapshot": args.snapshot,
+        "partition": args.partition,
+        "partition_workers": args.partition_workers,
+        "large_graph": args.large_graph or None,
+        "render_timeout": args.render_timeout,
+        "layer_overrides": layer_overrides or None,
+        "layout_file": args.layout,
+        "profile": args.profile,
+    }
+
+    if args.serve:
+        # Imported here: asyncio, http and the server are only needed in server mode
+        from src.server import run_server
+        run_server(plan_path, workers=args.workers, max_queue=args.queue)
+        sys.exit(0)
+
+    if args.batch:
+        summary = run_batch(plan_path, output_dir=ensure_output_dir(), outformat=output_format, workers=args.workers, summary_path=args.summary, **options)
+        print(f"Batch finished: {summary['succeeded']}/{summary['total']} succeeded, {summary['failed']} failed in {summary['seconds']}s")
+        sys.exit(1 if summary['failed'] else 0)
     
     # Validate input file existence
     if not os.path.exists(plan_path):
@@ -56,13 +160,8 @@ if __name__ == "__main__":
     # We use the name of the directory containing the plan file as the basis for the output filename.
     # Example: samples/gcp_basic/tfplan.json -> output/gcp_basic.png
     
-    plan_dir = os.path.dirname(os.path.abspath(plan_path))
-    dir_name = os.path.basename(plan_dir)
-    
-    # Fallback if the file is in the current working directory
-    if not dir_name or dir_name == ".":
-         dir_name = "infra_diagram"
-         
+    dir_name = default_output_name(plan_path)
+
     # Setup output directory
     output_dir = ensure_output_dir()
     output_filename = os.path.join(output_dir, dir_name)
@@ -70,4 +169,4 @@ if __name__ == "__main__":
     print(f"Generating diagram for {plan_path}...")
     
     # Invoke the core generator function
-    create_diagram(plan_path, output_filename=output_filename, outformat=output_format, save_script=args.save_script, simple=args.simple)
+    create_diagram(plan_path, output_filename=output_filename, outformat=output_format, **options)
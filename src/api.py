@@ -0,0 +1,76 @@
+"""
+In-Memory API.
+
+`create_diagram` works with files: it reads the plan from a path, writes the
+images next to `output_filename` and reports progress on stdout. A service that
+already holds the plan in memory calls `render_plan` instead. It takes the plan
+as a dict or a JSON buffer and returns the rendered bytes, the DOT source and the
+resolved graph model. Graphviz output is piped straight back, and nothing is
+written to disk or printed.
+"""
+
+from src.loader import parse_plan, extract_resources
+from src.resolver import build_graph
+from src.dot import pipe_formats
+from src.generator import LARGE_GRAPH_NODES, FALLBACK_AGGREGATE, layout_attrs, fallback_layouts, graph_source, summarize_graph, parse_formats
+import functools
+import subprocess
+
+def render_plan(plan, outformat="png", backend="dot", simple=False, module_clusters=False, aggregate_threshold=None, diff=False, changed_only=False, edges=False, max_edges=None, reduce_edges=False, large_graph=LARGE_GRAPH_NODES, render_timeout=None, render_workers=None, layer_overrides=None):
+    """
+    Renders a Terraform plan held in memory.
+
+    The options have the same meaning as in `create_diagram`. The default backend is
+    "dot": it emits the DOT source directly, without the global Diagram context of
+    the `diagrams` library.
+
+    Args:
+        plan (dict, bytes or str): The plan document (`terraform show -json` output),
+            parsed or not. A dict is not modified.
+        outformat (str or list, optional): Output format(s) (png, svg, pdf, jpg, dot). Defaults to "png".
+        backend (str, optional): "dot" or "diagrams". Defaults to "dot".
+        simple (bool, optional): If True, uses simplified labels (names only). Defaults to False.
+        module_clusters (bool, optional): If True, draws each module as a Cluster. Defaults to False.
+        aggregate_threshold (int, optional): Collapse count/for_each instances from this many on.
+        diff (bool, optional): If True, colors nodes and clusters by their planned change.
+        changed_only (bool, optional): If True, keeps only the changed resources and their surroundings.
+        edges (bool, optional): If True, draws dependency edges. Defaults to False.
+        max_edges (int, optional): Maximum number of dependency edges.
+        reduce_edges (bool, optional): If True, omits edges implied by longer paths.
+        large_graph (int, optional): Node count above which cheaper layout settings apply.
+        render_timeout (float, optional): Seconds allowed to each Graphviz run before falling
+            back to a cheaper layout (see `src.generator.RENDER_FALLBACKS`).
+        render_workers (int, optional): Maximum number of concurrent Graphviz processes.
+        layer_overrides (dict, optional): Resource type -> layer.
+
+    Returns:
+        dict:
+            - 'images': format -> rendered bytes (empty when every layout timed out)
+            - 'source': the DOT source that was rendered
+            - 'graph': the graph model it was built from (see `src.resolver.build_graph`)
+            - 'layout': 'initial', the fallback step used, or 'degraded'
+            - 'summary': a text summary of the graph when degraded, otherwise None
+
+    Raises:
+        ValueError: If the plan is not valid JSON, or not a Terraform plan.
+        subprocess.CalledProcessError: If Graphviz fails.
+    """
+    formats = parse_formats(outformat)
+    resources = extract_resources(parse_plan(plan), include_deleted=diff or changed_only)
+    build = functools.partial(build_graph, resources, simple=simple, module_clusters=module_clusters, diff=diff, changed_only=changed_only, edges=edges, max_edges=max_edges, reduce_edges=reduce_edges, layer_overrides=layer_overrides)
+    graph = build(aggregate_threshold=aggregate_threshold)
+    graph_attr = layout_attrs(graph, large_graph)
+
+    current = graph
+    can_aggregate = aggregate_threshold is None or aggregate_threshold > FALLBACK_AGGREGATE
+    for step, attrs, aggregate in fallback_layouts(graph_attr, render_timeout, aggregate=can_aggregate):
+        if aggregate:
+            current = build(aggregate_threshold=FALLBACK_AGGREGATE)
+        source = graph_source(current, backend, attrs)
+        try:
+            images = pipe_formats(source, formats, max_workers=render_workers, timeout=render_timeout)
+        except subprocess.TimeoutExpired:
+            continue
+        return {'images': images, 'source': source, 'graph': current, 'layout': step, 'summary': None}
+
+    return {'images': {}, 'source': graph_source(graph, backend, graph_attr), 'graph': graph, 'layout': "degraded", 'summary': summarize_graph(graph)}
@@ -0,0 +1,182 @@
+"""
+Batch Rendering.
+
+This module renders many Terraform plans in a single invocation, which avoids
+paying the interpreter start-up and the `diagrams` imports once per plan.
+
+Plans can be given as:
+- A directory: every 'tfplan.json' below it is rendered.
+- A glob pattern (e.g. 'workspaces/*/tfplan.json', '**' is supported).
+- A manifest file: a '.json' list of paths (or of {"plan": ..., "output": ...} objects),
+  or a text file with one path per line. Relative paths are resolved against the manifest.
+
+Plans are processed by a pool of worker processes. Each worker warms up the
+mapper and the labelers once, and a failing plan is reported in the summary
+without aborting the rest of the batch.
+
+Options naming a per-workspace file (snapshot, previous run, layout) name a
+directory in batch mode: each plan uses '<directory>/<output name>.json', so
+concurrent workers never share one file and a plan never picks up another
+workspace's state.
+"""
+
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+import traceback
+
+def discover_plans(source):
+    """
+    Resolves the batch source into a list of jobs.
+
+    Args:
+        source (str): A directory, a glob pattern or a manifest file.
+
+    Returns:
+        list: Dictionaries with 'plan' (path) and 'output' (base name, or None to derive it).
+    """
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "**", "tfplan.json"), recursive=True))
+        return [{'plan': path, 'output': None} for path in paths]
+
+    if os.path.isfile(source) and not source.endswith("tfplan.json"):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r') as f:
+            if source.endswith(".json"):
+                entries = json.load(f)
+            else:
+                entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+        jobs = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {'plan': entry}
+            jobs.append({'plan': os.path.join(base_dir, entry['plan']), 'output': entry.get('output')})
+        return jobs
+
+    # Anything else is treated as a glob pattern (a single path matches itself)
+    return [{'plan': path, 'output': None} for path in sorted(glob.glob(source, recursive=True))]
+
+def default_output_name(plan_path):
+    """
+    Derives the output base name from the directory containing the plan.
+    Example: samples/gcp_basic/tfplan.json -> gcp_basic
+    """
+    dir_name = os.path.basename(os.path.dirname(os.path.abspath(plan_path)))
+    # Fallback if the file is in the current working directory
+    if not dir_name or dir_name == ".":
+        dir_name = "infra_diagram"
+    return dir_name
+
+def _assign_output_names(jobs):
+    """Fills in missing output names, making them unique within the batch."""
+    used = set()
+    for job in jobs:
+        name = job['output'] or default_output_name(job['plan'])
+        candidate = name
+        suffix = 2
+        while candidate in used:
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        used.add(candidate)
+        job['output'] = candidate
+    return jobs
+
+# create_diagram options holding the path of a per-plan file; a directory in batch mode
+PER_PLAN_PATH_OPTIONS = ('previous', 'snapshot', 'layout_file')
+
+def init_worker():
+    """
+    Worker initializer: imports the generator and resolves every mapped class and
+    labeler once, so individual plans do not pay for it.
+    """
+    from src import generator  # noqa: F401 (import for its side effects)
+    from src.mapper import TERRAFORM_GCP_MAPPING, get_diagram_node
+    from src.resources.lookup import RESOURCE_LABELERS  # noqa: F401
+
+    for res_type in TERRAFORM_GCP_MAPPING:
+        get_diagram_node(res_type)
+
+def _render_job(job, output_dir, outformat, options):
+    """Renders a single plan. Never raises: failures are returned in the result."""
+    from src.generator import create_diagram, parse_formats
+
+    output_filename = os.path.join(output_dir, job['output'])
+    start = time.perf_counter()
+    outputs = [f"{output_filename}.{fmt}" for fmt in parse_formats(outformat)]
+    result = {'plan': job['plan'], 'output': outputs[0] if len(outputs) == 1 else outputs}
+
+    # One snapshot/layout file per plan, named like its output
+    per_plan = {key: os.path.join(options[key], f"{job['output']}.json") for key in PER_PLAN_PATH_OPTIONS if options.get(key)}
+    if per_plan:
+        options = dict(options, **per_plan)
+
+    # With profiling on, the per-stage metrics of every plan go into the batch summary
+    if options.get('profile'):
+        def collect(metrics):
+            result['metrics'] = metrics
+        options = dict(options, metrics_hook=collect)
+    try:
+        # Keep worker output out of the batch log; the summary reports the outcome
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_diagram(job['plan'], output_filename=output_filename, outformat=outformat, **options)
+        result['status'] = "ok"
+    except Exception as e:
+        result['status'] = "error"
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+def run_batch(source, output_dir="output", outformat="png", workers=None, summary_path=None, **options):
+    """
+    Renders every plan found in `source` using a pool of worker processes.
+
+    Args:
+        source (str): A directory, a glob pattern or a manifest file (see `discover_plans`).
+        output_dir (str, optional): Directory receiving the diagrams. Defaults to "output".
+        outformat (str or list, optional): Output image format(s). Defaults to "png".
+        workers (int, optional): Number of worker processes. Defaults to the CPU count.
+        summary_path (str, optional): Where to write the JSON summary.
+            Defaults to '<output_dir>/batch_summary.json'.
+        **options: Extra keyword arguments passed to `create_diagram` (e.g. simple=True).
+            `previous`, `snapshot` and `layout_file` are directories here (see PER_PLAN_PATH_OPTIONS).
+
+    Returns:
+        dict: The summary: totals and one result per plan (status, output, error, seconds,
+            and the stage metrics when profiling).
+    """
+    jobs = _assign_output_names(discover_plans(source))
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = []
+    if jobs:
+        # Imported here: single-plan runs use this module (default_output_name) without the pool
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = [executor.submit(_render_job, job, output_dir, outformat, options) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                status = "OK   " if result['status'] == "ok" else "ERROR"
+                print(f"[{len(results)}/{len(jobs)}] {status} {result['plan']}" + (f" ({result['error'].splitlines()[0]})" if 'error' in result else ""))
+
+    results.sort(key=lambda r: r['plan'])
+    summary = {
+        'source': source,
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['status'] == "ok"),
+        'failed': sum(1 for r in results if r['status'] != "ok"),
+        'seconds': round(time.perf_counter() - start, 3),
+        'results': results,
+    }
+
+    summary_path = summary_path or os.path.join(output_dir, "batch_summary.json")
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    return summary
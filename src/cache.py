@@ -0,0 +1,149 @@
+"""
+Render Cache.
+
+Rendering with Graphviz is by far the most expensive step, yet most runs
+regenerate a diagram that did not change: plans often differ only in fields we
+never draw (timestamps, 'prior_state', unrelated attributes).
+
+This module keys rendered images by a hash of the normalized graph model
+(clusters, nodes, labels, change actions, layers, graph attributes and output format). When an
+identical graph was rendered before, the cached image is copied to the output
+location and Graphviz is not invoked at all.
+
+Entries live in an on-disk directory bounded in size. Every hit refreshes the
+entry's modification time, and the least recently used entries are evicted when
+the directory grows past its limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Bump when the rendering code changes in a way that alters the output image
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get("TERRAVIZ_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "terraviz", "renders"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def _library_version():
+    """Version of the `diagrams` package (icons and defaults are part of the picture)."""
+    try:
+        from importlib.metadata import version
+        return version("diagrams")
+    except Exception:
+        return "unknown"
+
+def graph_fingerprint(graph, graph_attr, outformat, backend="diagrams"):
+    """
+    Computes the content hash of everything that influences the rendered image.
+
+    Args:
+        graph (dict): The graph model produced by `build_graph`.
+        graph_attr (dict): Graphviz global attributes.
+        outformat (str): Output image format.
+        backend (str, optional): Rendering backend ("diagrams" or "dot").
+
+    Returns:
+        str: A hex digest identifying the picture.
+    """
+    normalized = {
+        'version': [CACHE_VERSION, _library_version()],
+        'clusters': [[addr, c.type, c.label, c.parent_addr, c.change] for addr, c in graph['clusters'].items()],
+        'roots': graph['roots'],
+        'children': graph['children'],
+        'nodes': [
+            [addr, n.diagram_class.__module__, n.diagram_class.__name__, n.label, n.parent_addr, n.layer, n.change]
+            for addr, n in graph['nodes'].items()
+        ],
+        'nodes_by_parent': [[parent, addrs] for parent, addrs in graph['nodes_by_parent'].items()],
+        'layers': graph['layers'],
+        'edges': graph.get('edges', []),
+        'graph_attr': graph_attr,
+        'outformat': outformat,
+        'backend': backend,
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _entry_path(cache_dir, key, outformat):
+    return os.path.join(cache_dir, f"{key}.{outformat}")
+
+def cache_lookup(key, outformat, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Looks up a rendered image in the cache.
+
+    Args:
+        key (str): Fingerprint from `graph_fingerprint`.
+        outformat (str): Output image format.
+        cache_dir (str, optional): Cache directory.
+
+    Returns:
+        str or None: Path of the cached image, or None on a miss.
+    """
+    path = _entry_path(cache_dir, key, outformat)
+    if not os.path.exists(path):
+        return None
+    # Mark the entry as recently used
+    try:
+        os.utime(path, None)
+    except OSError:
+        return None
+    return path
+
+def cache_store(key, outformat, rendered_path, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Stores a freshly rendered image in the cache, then enforces the size limit.
+
+    The file is copied under a temporary name and atomically renamed, so a
+    concurrent reader never sees a partial entry.
+
+    Args:
+        key (str): Fingerprint from `graph_fingerprint`.
+        outformat (str): Output image format.
+        rendered_path (str): Path of the rendered image.
+        cache_dir (str, optional): Cache directory.
+        max_bytes (int, optional): Maximum total size of the cache directory.
+    """
+    if not os.path.exists(rendered_path):
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(rendered_path, tmp_path)
+        os.replace(tmp_path, _entry_path(cache_dir, key, outformat))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict(cache_dir, max_bytes)
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Removes the least recently used entries until the cache fits in `max_bytes`.
+
+    Args:
+        cache_dir (str, optional): Cache directory.
+        max_bytes (int, optional): Maximum total size of the cache directory.
+    """
+    entries = []
+    total = 0
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue # Evicted by a concurrent render
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,231 @@
+"""
+Native DOT Backend.
+
+This module writes the resolved graph model (see `src.resolver.build_graph`)
+straight to Graphviz DOT source, without instantiating `diagrams` nodes or going
+through its global Diagram/Cluster context stack. The output mirrors what the
+`diagrams` backend produces (same default attributes and the same icons, taken
+from the classes in `TERRAFORM_GCP_MAPPING`), but it is built as a single string
+and handed to the `dot` executable in one call.
+
+Node IDs are the Terraform addresses, so the DOT source is stable across runs.
+"""
+
+from src.resolver import layer_edges, change_attrs, DEPENDENCY_EDGE_ATTRS
+import os
+import subprocess
+
+# Background colors of nested clusters, by depth (same palette as diagrams.Cluster)
+CLUSTER_BGCOLORS = ("#E5F5FD", "#EBF3E7", "#ECE8F6", "#FDF7E3")
+
+# Base height of an icon node; each extra label line adds NODE_LINE_PADDING
+NODE_HEIGHT = 1.9
+NODE_LINE_PADDING = 0.4
+
+def quote(value):
+    """Quotes a string as a DOT ID (backslashes first, so they never escape what follows)."""
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace("\n", "\\n")
+    return f'"{value}"'
+
+def format_attrs(attrs):
+    """Formats a dictionary as a DOT attribute list."""
+    return " ".join(f"{key}={quote(value)}" for key, value in attrs.items())
+
+def icon_path(diagram_class):
+    """
+    Returns the icon file of a `diagrams` node class, as `diagrams.Node` resolves it.
+
+    Args:
+        diagram_class (class): A diagrams node class (e.g. ComputeEngine).
+
+    Returns:
+        str or None: Absolute path of the icon image.
+    """
+    if not getattr(diagram_class, "_icon", None):
+        return None
+    import diagrams
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(diagrams.__file__)))
+    return os.path.join(base_dir, diagram_class._icon_dir, diagram_class._icon)
+
+def emit_dot(graph, graph_attr=None, name="Terraform Infrastructure", direction="LR", node_pos=None):
+    """
+    Emits the DOT source of the diagram.
+
+    Args:
+        graph (dict): The graph model produced by `build_graph`.
+        graph_attr (dict, optional): Graphviz global attributes.
+        name (str, optional): Diagram title. Defaults to "Terraform Infrastructure".
+        direction (str, optional): Rank direction. Defaults to "LR".
+        node_pos (dict, optional): Map: address -> `pos` attribute, for the neato/fdp engines
+            (see `src.layout.pinned_positions`).
+
+    Returns:
+        str: The DOT source.
+    """
+    # Only the default attributes are used; imported lazily to keep start-up cheap
+    from diagrams import Diagram, Cluster, Edge
+
+    clusters = graph['clusters']
+    nodes = graph['nodes']
+    icons = {} # Map: diagrams class -> icon path
+
+    attrs = dict(Diagram._default_graph_attrs)
+    attrs["label"] = name
+    attrs["rankdir"] = direction
+    attrs.update(graph_attr or {})
+
+    lines = [f"digraph {quote(name)} {{"]
+    lines.append(f"\tgraph [{format_attrs(attrs)}]")
+    lines.append(f"\tnode [{format_attrs(Diagram._default_node_attrs)}]")
+    lines.append(f"\tedge [{format_attrs(Diagram._default_edge_attrs)}]")
+
+    def write_nodes(parent_addr, indent):
+        for node_addr in graph['nodes_by_parent'][parent_addr]:
+            node = nodes[node_addr]
+            cls = node.diagram_class
+            if cls not in icons:
+                icons[cls] = icon_path(cls)
+            node_attrs = {"label": node.label}
+            if icons[cls]:
+                node_attrs.update({
+                    "shape": "none",
+                    "height": str(NODE_HEIGHT + NODE_LINE_PADDING * node.label.count("\n")),
+                    "image": icons[cls],
+                })
+            node_attrs.update(change_attrs(node.change))
+            if node_pos and node_addr in node_pos:
+                node_attrs["pos"] = node_pos[node_addr]
+            lines.append(f"{indent}{quote(node_addr)} [{format_attrs(node_attrs)}]")
+
+    # Recursive writer for clusters; IDs are positional so identical labels never merge
+    cluster_ids = {}
+
+    def write_cluster(cluster_addr, depth):
+        indent = "\t" * (depth + 1)
+        cluster_ids[cluster_addr] = f"cluster_{len(cluster_ids)}"
+        cluster_attrs = dict(Cluster._default_graph_attrs)
+        cluster_attrs["label"] = clusters[cluster_addr].label
+        cluster_attrs["rankdir"] = direction
+        cluster_attrs["bgcolor"] = CLUSTER_BGCOLORS[depth % len(CLUSTER_BGCOLORS)]
+        cluster_attrs.update(change_attrs(clusters[cluster_addr].change, cluster=True))
+
+        lines.append(f"{indent}subgraph {cluster_ids[cluster_addr]} {{")
+        lines.append(f"{indent}\tgraph [{format_attrs(cluster_attrs)}]")
+        write_nodes(cluster_addr, indent + "\t")
+        for child_addr in graph['children'][cluster_addr]:
+            write_cluster(child_addr, depth + 1)
+        lines.append(f"{indent}}}")
+
+    for cluster_addr in graph['roots']:
+        write_cluster(cluster_addr, 0)
+    write_nodes(None, "\t")
+
+    # Invisible layout edges (same attributes as `Edge(style="invis")` with `>>`)
+    edge_attrs = dict(Edge._default_edge_attrs)
+    edge_attrs.update({"style": "invis", "dir": "forward"})
+    for src_addr, dst_addr in layer_edges(graph['layers']):
+        lines.append(f"\t{quote(src_addr)} -> {quote(dst_addr)} [{format_attrs(edge_attrs)}]")
+
+    # Dependency edges (resource -> the resource it references)
+    edge_attrs = dict(Edge._default_edge_attrs)
+    edge_attrs.update(DEPENDENCY_EDGE_ATTRS)
+    edge_attrs["dir"] = "forward"
+    for src_addr, dst_addr in graph.get('edges', ()):
+        lines.append(f"\t{quote(src_addr)} -> {quote(dst_addr)} [{format_attrs(edge_attrs)}]")
+
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def run_dot(source, output_filename, outformat="png", engine="dot", timeout=None):
+    """
+    Renders DOT source to an image file with the Graphviz executable.
+
+    For outformat 'dot' the source is written as-is and Graphviz is not invoked.
+
+    Args:
+        source (str): The DOT source.
+        output_filename (str): Base filename for the output (no extension).
+        outformat (str, optional): Output format (png, svg, pdf, jpg, dot). Defaults to "png".
+        engine (str, optional): Graphviz layout engine. Defaults to "dot".
+        timeout (float, optional): Seconds after which Graphviz is killed. Defaults to None (no limit).
+
+    Returns:
+        str: Path of the written file.
+
+    Raises:
+        subprocess.TimeoutExpired: If Graphviz did not finish within `timeout`.
+    """
+    path = f"{output_filename}.{outformat}"
+    if outformat == "dot":
+        with open(path, "w") as f:
+            f.write(source)
+        return path
+
+    subprocess.run([engine, f"-T{outformat}", "-o", path], input=source.encode("utf-8"), check=True, capture_output=True, timeout=timeout)
+    return path
+
+def render_formats(source, output_filename, formats, max_workers=None, engine="dot", timeout=None):
+    """
+    Renders one DOT source into several output formats concurrently.
+
+    Each format is an independent Graphviz process, so they run in parallel
+    threads (at most `max_workers` at a time) and the total cost is roughly
+    that of the slowest format instead of the sum of all of them.
+
+    Args:
+        source (str): The DOT source.
+        output_filename (str): Base filename for the outputs (no extension).
+        formats (list): Output formats (e.g. ['png', 'svg', 'dot']).
+        max_workers (int, optional): Maximum number of concurrent Graphviz processes.
+            Defaults to the number of formats, capped at the CPU count.
+        engine (str, optional): Graphviz layout engine. Defaults to "dot".
+        timeout (float, optional): Seconds after which each Graphviz process is killed.
+
+    Returns:
+        list: Paths of the written files, in the order of `formats`.
+    """
+    if len(formats) == 1:
+        return [run_dot(source, output_filename, formats[0], engine=engine, timeout=timeout)]
+
+    from concurrent.futures import ThreadPoolExecutor
+    workers = max_workers or min(len(formats), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_dot, source, output_filename, fmt, engine, timeout) for fmt in formats]
+        # Wait for every render before reporting the first failure, if any
+        return [future.result() for future in futures]
+
+def pipe_dot(source, outformat="png", engine="dot", timeout=None):
+    """
+    Renders DOT source in memory: Graphviz reads the source on stdin and writes the image to stdout.
+
+    Args:
+        source (str): The DOT source.
+        outformat (str, optional): Output format (png, svg, pdf, jpg, dot). Defaults to "png".
+        engine (str, optional): Graphviz layout engine. Defaults to "dot".
+        timeout (float, optional): Seconds after which Graphviz is killed. Defaults to None (no limit).
+
+    Returns:
+        bytes: The rendered file (the source itself for outformat 'dot').
+
+    Raises:
+        subprocess.TimeoutExpired: If Graphviz did not finish within `timeout`.
+    """
+    if outformat == "dot":
+        return source.encode("utf-8")
+    return subprocess.run([engine, f"-T{outformat}"], input=source.encode("utf-8"), check=True, capture_output=True, timeout=timeout).stdout
+
+def pipe_formats(source, formats, max_workers=None, engine="dot", timeout=None):
+    """
+    Renders one DOT source into several formats in memory, concurrently (see `render_formats`).
+
+    Returns:
+        dict: Format -> rendered bytes, in the order of `formats`.
+    """
+    if len(formats) == 1:
+        return {formats[0]: pipe_dot(source, formats[0], engine=engine, timeout=timeout)}
+
+    from concurrent.futures import ThreadPoolExecutor
+    workers = max_workers or min(len(formats), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(pipe_dot, source, fmt, engine, timeout) for fmt in formats]
+        return {fmt: future.result() for fmt, future in zip(formats, futures)}
@@ -2,8 +2,10 @@
 Core Diagram Generator.
 
 This module contains the main logic for parsing the Terraform plan and 
-rendering the architecture diagram. It uses the `diagrams` library to 
-create the visual output.
+rendering the architecture diagram. Resolution happens once into an 
+intermediate graph model (`src.resolver`), which is then consumed by the 
+`diagrams` renderer (`src.render`) or the native DOT emitter (`src.dot`), 
+and by the script emitter (`src.script`).
 
 The process involves:
 1. Parsing the JSON plan.
@@ -14,14 +16,230 @@ The process involves:
 6. Optionally generating a Python script that can reproduce the diagram.
 """
 
-from diagrams import Diagram, Cluster, Edge
-from src.mapper import get_diagram_node
-from src.resources.lookup import get_resource_label
-import json
-import re
+from src.loader import load_plan, extract_resources
+from src.resolver import build_graph, iter_references
+from src.render import render_diagram, diagram_source
+from src.script import generate_script
+from src.dot import emit_dot, render_formats
+from src.cache import DEFAULT_CACHE_DIR, graph_fingerprint, cache_lookup, cache_store
+from src.plancache import DEFAULT_PLAN_CACHE_DIR, plan_cache_key, plan_cache_lookup, plan_cache_store
+from src.snapshot import fingerprint_resources, previous_snapshot, reusable_entries, make_snapshot, save_snapshot
+from src.partition import partition_graph, overview_graph, partition_filename, render_partitions
+from src.layout import INCREMENTAL_ENGINE, parse_plain, make_layout, load_layout, save_layout, pinned_positions
+from src.metrics import new_metrics, stage, count, finish, format_summary, write_json
+from collections import Counter
+import functools
 import os
+import shutil
+import subprocess
+import tracemalloc
 
-def create_diagram(plan_path, output_filename="gcp_infra_diagram", show=False, outformat="png", save_script=False, simple=False):
+# Graphviz global attributes for styling
+GRAPH_ATTR = {
+    "fontsize": "25",
+    "bgcolor": "white",
+    "splines": "ortho", # Orthogonal lines for cleaner look
+    "nodesep": "0.8",   # Horizontal separation
+    "ranksep": "1.0",   # Vertical separation
+}
+
+# Above this many nodes, orthogonal routing (by far the slowest part of the layout) is replaced
+LARGE_GRAPH_NODES = 500
+LARGE_GRAPH_ATTR = {
+    "splines": "spline", # Regular splines: orders of magnitude faster than ortho on big graphs
+}
+
+def layout_attrs(graph, large_graph=LARGE_GRAPH_NODES):
+    """
+    Returns the Graphviz attributes for a graph, falling back to cheaper settings when it is large.
+
+    Args:
+        graph (dict): The graph model to render.
+        large_graph (int, optional): Node count above which LARGE_GRAPH_ATTR applies.
+            None disables the fallback. Defaults to LARGE_GRAPH_NODES.
+
+    Returns:
+        dict: The Graphviz global attributes.
+    """
+    attrs = dict(GRAPH_ATTR)
+    if large_graph is not None and len(graph['nodes']) > large_graph:
+        attrs.update(LARGE_GRAPH_ATTR)
+    return attrs
+
+# Cheaper layouts tried in order when Graphviz exceeds the render timeout: (step, attributes, aggregate)
+RENDER_FALLBACKS = (
+    ("no-ortho", {"splines": "spline"}, False),
+    ("compact", {"splines": "line", "nodesep": "0.25", "ranksep": "0.4"}, False),
+    ("aggregate", {"splines": "line", "nodesep": "0.25", "ranksep": "0.4"}, True),
+)
+
+# Instance count from which the "aggregate" fallback collapses count/for_each instances
+FALLBACK_AGGREGATE = 2
+
+def fallback_layouts(graph_attr, timeout=None, aggregate=True):
+    """
+    Lists the layouts a render tries, the requested one first.
+
+    Args:
+        graph_attr (dict): The requested Graphviz attributes.
+        timeout (float, optional): The render timeout; without one there is no fallback.
+        aggregate (bool, optional): Whether the "aggregate" step is possible. Defaults to True.
+
+    Returns:
+        list: (step, Graphviz attributes, aggregate) tuples.
+    """
+    attempts = [("initial", graph_attr, False)]
+    if timeout is not None:
+        attempts += [(step, {**graph_attr, **attrs}, agg) for step, attrs, agg in RENDER_FALLBACKS if aggregate or not agg]
+    return attempts
+
+def graph_source(graph, backend="diagrams", graph_attr=None, node_pos=None):
+    """Returns the DOT source of a graph model, as built by the given backend (node positions: DOT backend only)."""
+    return emit_dot(graph, graph_attr=graph_attr, node_pos=node_pos) if backend == "dot" else diagram_source(graph, graph_attr=graph_attr)
+
+def render_graph(graph, output_filename, formats, backend="diagrams", graph_attr=None, show=False, render_workers=None, timeout=None, engine="dot", node_pos=None):
+    """
+    Renders a graph model into one or more formats (no caching).
+
+    Args:
+        graph (dict): The graph model.
+        output_filename (str): Base filename for the output (no extension).
+        formats (list): Output formats.
+        backend (str, optional): "diagrams" or "dot". Defaults to "diagrams".
+        graph_attr (dict, optional): Graphviz global attributes.
+        show (bool, optional): Whether to open the image (single format, diagrams backend, no timeout).
+        render_workers (int, optional): Maximum number of concurrent Graphviz processes.
+        timeout (float, optional): Seconds after which each Graphviz process is killed.
+        engine (str, optional): Graphviz layout engine (DOT backend). Defaults to "dot".
+        node_pos (dict, optional): Node positions for the engine (DOT backend, see `emit_dot`).
+
+    Returns:
+        list: Paths of the written files.
+
+    Raises:
+        subprocess.TimeoutExpired: If Graphviz did not finish within `timeout`.
+    """
+    # diagrams runs Graphviz itself without a time limit, so a timeout goes through the DOT source
+    if backend != "dot" and len(formats) == 1 and timeout is None:
+        render_diagram(graph, output_filename, outformat=formats[0], show=show, graph_attr=graph_attr)
+    else:
+        # Several formats: build the DOT source once and run one Graphviz process per format
+        render_formats(graph_source(graph, backend, graph_attr, node_pos), output_filename, formats, max_workers=render_workers, engine=engine, timeout=timeout)
+    return [f"{output_filename}.{fmt}" for fmt in formats]
+
+def summarize_graph(graph):
+    """
+    Describes a graph model as plain text: clusters with their sizes, and node counts by layer and type.
+
+    Args:
+        graph (dict): The graph model.
+
+    Returns:
+        str: The summary.
+    """
+    clusters = graph['clusters']
+    nodes = graph['nodes']
+    lines = [f"{len(nodes)} nodes in {len(clusters)} clusters", "", "Clusters:"]
+
+    def describe(cluster_addr, depth):
+        size = len(graph['nodes_by_parent'][cluster_addr])
+        label = clusters[cluster_addr].label.replace("\n", " / ")
+        lines.append(f"{'  ' * depth}- {label} ({size} resources) [{cluster_addr}]")
+        for child_addr in graph['children'][cluster_addr]:
+            describe(child_addr, depth + 1)
+
+    for cluster_addr in graph['roots']:
+        describe(cluster_addr, 1)
+    lines.append(f"  - (no cluster): {len(graph['nodes_by_parent'][None])} resources")
+
+    lines += ["", "Nodes by layer:"]
+    lines += [f"  {layer}: {len(addrs)}" for layer, addrs in graph['layers'].items() if addrs]
+    lines += ["", "Nodes by type:"]
+    types = Counter(node.res_type for node in nodes.values())
+    lines += [f"  {res_type}: {n}" for res_type, n in types.most_common()]
+    return "\n".join(lines) + "\n"
+
+def render_with_fallback(graph, output_filename, formats, backend="diagrams", graph_attr=None, show=False, render_workers=None, timeout=None, rebuild=None, metrics=None, engine="dot", node_pos=None):
+    """
+    Renders a graph model, degrading the layout each time Graphviz exceeds `timeout`.
+
+    The layout is first tried as given, then with each entry of RENDER_FALLBACKS
+    (the "aggregate" step needs `rebuild`). When every layout times out, the DOT
+    source ('<output_filename>.dot') and a text summary ('<output_filename>.txt')
+    are written instead of the images. Every attempt is a separate stage in
+    `metrics` ('render', 'render:<step>', 'render:degraded') with its 'outcome'.
+
+    Args:
+        graph (dict): The graph model.
+        output_filename (str): Base filename for the output (no extension).
+        formats (list): Output formats.
+        backend (str, optional): "diagrams" or "dot". Defaults to "diagrams".
+        graph_attr (dict, optional): Graphviz global attributes.
+        show (bool, optional): Whether to open the image (see `render_graph`).
+        render_workers (int, optional): Maximum number of concurrent Graphviz processes.
+        timeout (float, optional): Seconds allowed to each Graphviz run. Defaults to None (no limit, no fallback).
+        rebuild (callable, optional): Returns the graph model with count/for_each instances aggregated.
+        metrics (dict, optional): Metrics record (see `src.metrics`).
+        engine (str, optional): Graphviz layout engine (see `render_graph`). Defaults to "dot".
+        node_pos (dict, optional): Node positions for the engine (see `render_graph`).
+
+    Returns:
+        tuple: (paths of the written files, step that produced them: 'initial', a fallback step or 'degraded')
+    """
+    graph_attr = graph_attr or {}
+    attempts = fallback_layouts(graph_attr, timeout, aggregate=rebuild is not None)
+
+    current = graph
+    for step, attrs, aggregate in attempts:
+        if aggregate:
+            current = rebuild()
+        with stage(metrics, "render" if step == "initial" else f"render:{step}") as entry:
+            try:
+                paths = render_graph(current, output_filename, formats, backend=backend, graph_attr=attrs, show=show, render_workers=render_workers, timeout=timeout, engine=engine, node_pos=node_pos)
+            except subprocess.TimeoutExpired:
+                if entry is not None:
+                    entry['outcome'] = "timeout"
+                print(f"Rendering {output_filename} timed out after {timeout}s ({step} layout)")
+                continue
+            if entry is not None:
+                entry['outcome'] = "ok"
+                entry['nodes'] = len(current['nodes'])
+            return paths, step
+
+    # Last resort: hand over what Graphviz could not lay out
+    with stage(metrics, "render:degraded") as entry:
+        dot_path = f"{output_filename}.dot"
+        with open(dot_path, "w") as f:
+            f.write(graph_source(graph, backend, graph_attr))
+        summary_path = f"{output_filename}.txt"
+        with open(summary_path, "w") as f:
+            f.write(f"Rendering timed out after {timeout}s with every layout ({', '.join(step for step, _, _ in attempts)}).\n")
+            f.write(f"Render {dot_path} manually, or split the plan with --partition.\n\n")
+            f.write(summarize_graph(graph))
+        if entry is not None:
+            entry['outcome'] = "degraded"
+    return [dot_path, summary_path], "degraded"
+
+def parse_formats(outformat):
+    """
+    Normalizes the requested output format(s) into a list without duplicates.
+
+    Args:
+        outformat (str or list): A format, a comma-separated list (e.g. "png,svg") or a list.
+
+    Returns:
+        list: The output formats, in the requested order.
+    """
+    if isinstance(outformat, str):
+        outformat = outformat.split(",")
+    formats = []
+    for fmt in outformat:
+        fmt = fmt.strip().lower()
+        if fmt and fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+def create_diagram(plan_path, output_filename="gcp_infra_diagram", show=False, outformat="png", save_script=False, simple=False, module_clusters=False, aggregate_threshold=None, cache=True, cache_dir=DEFAULT_CACHE_DIR, plan_cache_dir=DEFAULT_PLAN_CACHE_DIR, backend="diagrams", render_workers=None, diff=False, changed_only=False, edges=False, max_edges=None, reduce_edges=False, previous=None, snapshot=None, partition=None, partition_workers=None, large_graph=LARGE_GRAPH_NODES, render_timeout=None, layer_overrides=None, layout_file=None, profile=None, metrics_hook=None):
     """
     Parses a Terraform plan and generates an infrastructure diagram.
 
@@ -29,342 +247,253 @@ def create_diagram(plan_path, output_filename="gcp_infra_diagram", show=False, o
         plan_path (str): Path to the tfplan.json file.
         output_filename (str, optional): Base filename for the output (no extension). Defaults to "gcp_infra_diagram".
         show (bool, optional): Whether to open the image after generation. Defaults to False.
-        outformat (str, optional): Output image format (png, jpg, dot). Defaults to "png".
+        outformat (str or list, optional): Output image format (png, jpg, dot), a comma-separated
+            list or a list of formats. Defaults to "png".
         save_script (bool, optional): If True, saves the Python code used to generate the diagram. Defaults to False.
         simple (bool, optional): If True, uses simplified labels (names only). Defaults to False.
+        module_clusters (bool, optional): If True, draws each module as a Cluster. Defaults to False.
+        aggregate_threshold (int, optional): Collapse count/for_each instances of a block into one
+            "×N" node when there are at least this many. Defaults to None (no aggregation).
+        cache (bool, optional): If True, reuses a previously rendered image of an identical graph
+            instead of invoking Graphviz, and the resources extracted from an identical plan file
+            instead of parsing it. Defaults to True.
+        cache_dir (str, optional): Directory of the render cache.
+        plan_cache_dir (str, optional): Directory of the parsed-plan cache (see `src.plancache`).
+        backend (str, optional): "diagrams" to build the image with the diagrams library, or "dot"
+            to emit DOT source directly and pipe it to Graphviz. Defaults to "diagrams".
+        render_workers (int, optional): Maximum number of Graphviz processes running at once when
+            several formats are requested. Defaults to one per format, capped at the CPU count.
+        diff (bool, optional): If True, colors nodes and clusters by their planned change
+            (create, update, delete, replace), as recorded in 'resource_changes', and includes
+            the resources being destroyed. Defaults to False.
+        changed_only (bool, optional): If True (implies `diff`), renders only the changed resources,
+            their enclosing clusters and their direct neighbours. Defaults to False.
+        edges (bool, optional): If True, draws dependency edges between resources, derived from
+            the references in their expressions. Defaults to False.
+        max_edges (int, optional): Maximum number of dependency edges drawn. Defaults to None (no cap).
+        reduce_edges (bool, optional): If True, omits dependency edges implied by longer paths
+            (transitive reduction). Defaults to False.
+        previous (str, optional): Snapshot file or tfplan.json of a previous run. Resources whose
+            content did not change reuse their resolved label and parent cluster.
+        snapshot (str, optional): Path of the graph snapshot to persist for the next run. When the
+            file already exists and `previous` is not given, it is used as the previous run,
+            provided it was made from the same plan file.
+        partition (str, optional): "vpc" or "module" to render one diagram per top-level VPC or
+            module ('<output_filename>_<name>.<format>'), in parallel worker processes, plus an
+            overview of the partitions as '<output_filename>.<format>'. Partitions are not cached.
+            Defaults to None (a single diagram).
+        partition_workers (int, optional): Number of worker processes rendering partitions (each
+            of them still runs up to `render_workers` Graphviz processes, one per format).
+            Defaults to the CPU count.
+        large_graph (int, optional): Node count above which a diagram is laid out with cheaper
+            settings (see LARGE_GRAPH_ATTR). None disables the fallback. Defaults to LARGE_GRAPH_NODES.
+        render_timeout (float, optional): Seconds allowed to each Graphviz run. When exceeded, the
+            render is retried with cheaper layouts (RENDER_FALLBACKS), and as a last resort the DOT
+            source and a text summary are written instead (see `render_with_fallback`). Every
+            attempt is recorded in the metrics. Defaults to None (no limit).
+        layer_overrides (dict, optional): Resource type -> layer ('security', 'network', 'app',
+            'data' or 'storage'), replacing the default column of those types.
+        layout_file (str, optional): Path of the layout file (see `src.layout`). The node positions
+            of the render are saved there, and the next render pins the unchanged nodes and lays
+            out the new ones around them with the `fdp` engine. Such renders bypass the render
+            cache. Requires the DOT backend and no partitioning. Defaults to None.
+        profile (str, optional): Per-stage instrumentation (see `src.metrics`): "summary" prints a
+            table, "json" writes '<output_filename>.metrics.json', "cprofile" prints the table and
+            dumps cProfile stats to '<output_filename>.prof'. Profiling also traces the peak
+            allocation of every stage. Defaults to None (off).
+        metrics_hook (callable, optional): Called with the metrics dictionary once the diagram is
+            created (timings and counts; peak allocations only when profiling).
+
+    Returns:
+        list: Paths of the generated images, one per format (the DOT source and text summary
+            instead when every layout timed out).
     """
-    
-    # Load the JSON plan
-    with open(plan_path, 'r') as f:
-        plan = json.load(f)
-
-    # Extract the list of resources from the root module
-    resources = plan.get('configuration', {}).get('root_module', {}).get('resources', [])
-    
-    # Extract resolved values (planned_values) to handle variables
-    planned_resources = plan.get('planned_values', {}).get('root_module', {}).get('resources', [])
-    planned_resources_map = {res['address']: res for res in planned_resources}
-
-    # Inject resolved values into configuration resources
-    for res in resources:
-        if res['address'] in planned_resources_map:
-             res['planned_values'] = planned_resources_map[res['address']].get('values', {})
-    
-    nodes = {}  # Map: resource_address -> {diagram_class, label, parent_addr, res_type}
-    clusters = {} # Map: resource_address -> {type: 'vpc'|'subnet', label: str}
+    if layout_file and (backend != "dot" or partition):
+        raise ValueError("A layout file requires the DOT backend and a single diagram (no partitions)")
 
-    # =========================================================================
-    # Step 1: Identify Clusters (VPCs and Subnets)
-    # =========================================================================
-    # We identify network containers first so we can later check if other resources
-    # belong to them.
-    for res in resources:
-        res_type = res['type']
-        address = res['address']
-        
-        if res_type == 'google_compute_network':
-            label = get_resource_label(res, simple=simple)
-            clusters[address] = {'type': 'vpc', 'label': label}
-        elif res_type == 'google_compute_subnetwork':
-             label = get_resource_label(res, simple=simple)
-             clusters[address] = {'type': 'subnet', 'label': label}
-
-    # Helper function to resolve parent relationships
-    def find_parent_cluster(res_expressions):
-        """
-        Recursively searches resource expressions for references to known clusters (VPCs/Subnets).
-        Prioritizes Subnets over VPCs (deepest nesting).
-        """
-        found_parents = []
-        
-        def search_refs(expr_data):
-            if isinstance(expr_data, dict):
-                # 'references' key contains list of resource addresses this block refers to
-                if 'references' in expr_data:
-                    for ref in expr_data['references']:
-                        for cluster_addr in clusters:
-                            # Match exact address or sub-attribute (e.g., module.vpc.network_id)
-                            if ref == cluster_addr or ref.startswith(cluster_addr + "."):
-                                found_parents.append(cluster_addr)
-                # Recursively search nested dictionaries
-                for v in expr_data.values():
-                    search_refs(v)
-            elif isinstance(expr_data, list):
-                # Recursively search lists
-                for v in expr_data:
-                    search_refs(v)
-
-        search_refs(res_expressions)
-        
-        # Categorize found parents
-        subnets = [p for p in found_parents if clusters[p]['type'] == 'subnet']
-        vpcs = [p for p in found_parents if clusters[p]['type'] == 'vpc']
-        
-        # Return the most specific parent (Subnet > VPC)
-        if subnets: return subnets[0] 
-        if vpcs: return vpcs[0] 
-        return None
+    # Instrumentation: collected when profiling or when a caller asked for the metrics
+    metrics = new_metrics(trace_memory=profile is not None, plan=plan_path, outformat=outformat, backend=backend) if profile or metrics_hook else None
+    profiler = None
+    if profile == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+    if profiler:
+        profiler.enable()
+    # tracemalloc is process-wide: leave it to whoever started it (e.g. a concurrent render)
+    started_tracing = bool(metrics and metrics['trace_memory']) and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    try:
+        image_paths = _create_diagram(plan_path, output_filename, show, outformat, save_script, simple, module_clusters, aggregate_threshold, cache, cache_dir, plan_cache_dir, backend, render_workers, diff, changed_only, edges, max_edges, reduce_edges, previous, snapshot, partition, partition_workers, large_graph, render_timeout, layer_overrides, layout_file, metrics)
+    finally:
+        if profiler:
+            profiler.disable()
+        if started_tracing:
+            tracemalloc.stop()
+
+    # Report the metrics
+    if metrics:
+        finish(metrics)
+        if profile == "json":
+            write_json(metrics, f"{output_filename}.metrics.json")
+            print(f"Metrics saved: {output_filename}.metrics.json")
+        elif profile:
+            print(format_summary(metrics))
+        if profiler:
+            profiler.dump_stats(f"{output_filename}.prof")
+            print(f"Profile saved: {output_filename}.prof")
+        if metrics_hook:
+            metrics_hook(metrics)
+
+    return image_paths
+
+def _create_diagram(plan_path, output_filename, show, outformat, save_script, simple, module_clusters, aggregate_threshold, cache, cache_dir, plan_cache_dir, backend, render_workers, diff, changed_only, edges, max_edges, reduce_edges, previous, snapshot, partition, partition_workers, large_graph, render_timeout, layer_overrides, layout_file, metrics):
+    """Runs the pipeline of `create_diagram`, recording each stage in `metrics` (may be None)."""
+
+    include_deleted = diff or changed_only
+    resources = None
+    if cache:
+        # Resources extracted from an identical plan file by a previous run: no JSON to parse
+        with stage(metrics, "plan-cache") as entry:
+            plan_key = plan_cache_key(plan_path, include_deleted, plan_cache_dir)
+            resources = plan_cache_lookup(plan_key, plan_cache_dir)
+            if entry is not None:
+                entry['outcome'] = "hit" if resources is not None else "miss"
+
+    if resources is None:
+        # Load the JSON plan (only the sections we need)
+        with stage(metrics, "load"):
+            plan = load_plan(plan_path)
+
+        # Extract the resources of every module, with their resolved values (planned_values)
+        with stage(metrics, "extract"):
+            resources = extract_resources(plan, include_deleted=include_deleted)
+        del plan # Resources keep only the parts of the plan they reference
+
+        if cache:
+            plan_cache_store(plan_key, resources, plan_cache_dir)
+
+    if metrics:
+        count(metrics, "resources", len(resources))
+        count(metrics, "references", sum(1 for res in resources for _ in iter_references(res.get('expressions', {}))))
+
+    # Incremental mode: reuse the results of a previous run for unchanged resources
+    reuse = resolved = None
+    if previous or snapshot:
+        with stage(metrics, "snapshot"):
+            fingerprints, signature = fingerprint_resources(resources)
+            source = os.path.abspath(plan_path)
+            # An explicit `previous` may come from any plan; the snapshot file only from this one
+            same_source = None if previous else source
+            previous = previous or (snapshot if snapshot and os.path.exists(snapshot) else None)
+            prior = previous_snapshot(previous, simple=simple, include_deleted=diff or changed_only) if previous else None
+            reuse = reusable_entries(prior, fingerprints, signature, simple, source=same_source) if prior else None
+            resolved = {'labels': {}, 'parents': {}} if snapshot else None
+        count(metrics, "reused_labels", len(reuse['labels']) if reuse else 0)
+        count(metrics, "reused_parents", len(reuse['parents']) if reuse else 0)
 
     # =========================================================================
-    # Step 2: Identify Nodes (Resources) and Assign to Clusters
+    # Step 1 & 2: Resolve Clusters, Nodes and Layers into the graph model
     # =========================================================================
-    for res in resources:
-        res_type = res['type']
-        address = res['address']
-        
-        # Skip resources that are themselves clusters (we handled them in Step 1)
-        if res_type in ['google_compute_network', 'google_compute_subnetwork']:
-            continue
-
-        # Get the corresponding Diagrams class (visual icon)
-        diagram_class = get_diagram_node(res_type)
-        
-        if diagram_class:
-            # Determine which cluster (if any) this resource belongs to
-            expressions = res.get('expressions', {})
-            parent_addr = find_parent_cluster(expressions)
-            
-            # Generate the text label
-            label = get_resource_label(res, simple=simple)
-            
-            nodes[address] = {'diagram_class': diagram_class, 'label': label, 'parent_addr': parent_addr, 'res_type': res_type}
+    # The graph model is built once and shared by every backend below.
+    graph = build_graph(resources, simple=simple, module_clusters=module_clusters, aggregate_threshold=aggregate_threshold, diff=diff, changed_only=changed_only, edges=edges, max_edges=max_edges, reduce_edges=reduce_edges, previous=reuse, resolved=resolved, layer_overrides=layer_overrides, metrics=metrics)
+    if snapshot:
+        save_snapshot(make_snapshot(resolved, fingerprints, signature, simple, source=source), snapshot)
+    count(metrics, "clusters", len(graph['clusters']))
+    count(metrics, "nodes", len(graph['nodes']))
+
+    # Last render fallback before giving up: collapse count/for_each instances (unless they already are)
+    rebuild = None
+    if render_timeout is not None and (aggregate_threshold is None or aggregate_threshold > FALLBACK_AGGREGATE):
+        rebuild = functools.partial(build_graph, resources, simple=simple, module_clusters=module_clusters, aggregate_threshold=FALLBACK_AGGREGATE, diff=diff, changed_only=changed_only, edges=edges, max_edges=max_edges, reduce_edges=reduce_edges, previous=reuse, layer_overrides=layer_overrides)
+    # The graph model holds everything needed from here on: release the raw plan data
+    del resources
 
     # =========================================================================
     # Step 3: Render Diagram
     # =========================================================================
-    node_instances = {} # Map: address -> instantiated Diagram node object
-    
-    # Graphviz global attributes for styling
-    graph_attr = {
-        "fontsize": "25",
-        "bgcolor": "white",
-        "splines": "ortho", # Orthogonal lines for cleaner look
-        "nodesep": "0.8",   # Horizontal separation
-        "ranksep": "1.0",   # Vertical separation
-    }
-
-    # 1. Define your "Buckets" (The visual columns)
-    layers = {
-        "security": [], # Firewalls, WAFs
-        "network":  [], # VPCs, Subnets, Gateways
-        "app":      [], # EC2, Lambda, K8s
-        "data":     [], # RDS, DynamoDB, Redis
-        "storage":  []  # S3, GCS
-    }
-
-    def categorize_node(node_obj, rtype):
-        """Helper to sort nodes into layers"""
-        if any(x in rtype for x in ["firewall", "security", "iam", "kms"]):
-            layers["security"].append(node_obj)
-        elif any(x in rtype for x in ["network", "router", "gateway", "address", "dns", "cdn", "nat", "vpn"]):
-            layers["network"].append(node_obj)
-        elif any(x in rtype for x in ["sql", "redis", "bigtable", "firestore", "spanner", "bigquery", "data"]):
-            layers["data"].append(node_obj)
-        elif any(x in rtype for x in ["storage", "filestore", "disk"]):
-            layers["storage"].append(node_obj)
-        else:
-            # Default to app for compute instances, functions, containers etc.
-            layers["app"].append(node_obj)
-
-    with Diagram("Terraform Infrastructure", show=show, filename=output_filename, outformat=outformat, graph_attr=graph_attr, direction="LR"):
-        
-        # Recursive function to render clusters and their contents
-        def render_cluster(cluster_addr):
-            cluster_data = clusters[cluster_addr]
-            
-            with Cluster(cluster_data["label"]):
-                # 1. Instantiate nodes belonging directly to this cluster
-                cluster_node_addrs = [addr for addr, node in nodes.items() if node['parent_addr'] == cluster_addr]
-                for node_addr in cluster_node_addrs:
-                    node_data = nodes[node_addr]
-                    cls = node_data['diagram_class']
-                    node_inst = cls(node_data['label'])
-                    node_instances[node_addr] = node_inst
-                    
-                    # Sort into layers
-                    categorize_node(node_inst, node_data['res_type'])
-                
-                # 2. Recursively render child clusters (e.g., Subnets inside this VPC)
-                if cluster_data['type'] == 'vpc':
-                     # Find subnets that reference this specific VPC
-                     child_subnets = []
-                     for sub_addr, sub in clusters.items():
-                         if sub['type'] == 'subnet':
-                             # We need to look up the subnet resource again to find its references
-                             res = next(r for r in resources if r['address'] == sub_addr)
-                             if find_parent_cluster(res.get('expressions', {})) == cluster_addr:
-                                 child_subnets.append(sub_addr)
-                     
-                     for sub_addr in child_subnets:
-                         render_cluster(sub_addr)
-
-        # Start by rendering Top Level VPCs (those are the main containers)
-        vpcs = [addr for addr, c in clusters.items() if c['type'] == 'vpc']
-        for vpc_addr in vpcs:
-            render_cluster(vpc_addr)
-            
-        # Render Global nodes (those with no parent cluster)
-        global_nodes = [addr for addr, node in nodes.items() if node['parent_addr'] is None]
-        for node_addr in global_nodes:
-            node_data = nodes[node_addr]
-            cls = node_data['diagram_class']
-            node_inst = cls(node_data['label'])
-            node_instances[node_addr] = node_inst
-            
-            # Sort into layers
-            categorize_node(node_inst, node_data['res_type'])
-    
-        # 3. Draw the invisible edges between the first item of each bucket
-        # This forces the columns to line up Left-to-Right
-        
-        # Order: Security -> Network -> App -> Data -> Storage
-        if layers["security"] and layers["network"]:
-            layers["security"][0] >> Edge(style="invis") >> layers["network"][0]
-        
-        # If network is empty, try connecting security to app
-        if layers["security"] and not layers["network"] and layers["app"]:
-             layers["security"][0] >> Edge(style="invis") >> layers["app"][0]
-             
-        if layers["network"] and layers["app"]:
-            layers["network"][0] >> Edge(style="invis") >> layers["app"][0]
-
-        if layers["app"] and layers["data"]:
-            layers["app"][0] >> Edge(style="invis") >> layers["data"][0]
-            
-        if layers["data"] and layers["storage"]:
-            layers["data"][0] >> Edge(style="invis") >> layers["storage"][0]
-            
-        # Fallback edges if some layers are missing to ensure continuity
-        # e.g. App -> Storage if Data is missing
-        if layers["app"] and not layers["data"] and layers["storage"]:
-            layers["app"][0] >> Edge(style="invis") >> layers["storage"][0]
-
-    print(f"Diagram created: {output_filename}.{outformat}")
+    formats = parse_formats(outformat)
+    graph_attr = layout_attrs(graph, large_graph)
+
+    if partition:
+        # One diagram per partition, rendered in parallel, plus the overview under the main name
+        with stage(metrics, "partition"):
+            partitions = partition_graph(graph, by=partition)
+            overview = overview_graph(graph, partitions)
+        count(metrics, "partitions", len(partitions))
+
+        with stage(metrics, "render"):
+            jobs = [(overview, output_filename, formats, backend, layout_attrs(overview, large_graph), render_timeout, render_workers)]
+            jobs += [(part, partition_filename(output_filename, name), formats, backend, layout_attrs(part, large_graph), render_timeout, render_workers) for name, part in partitions]
+            rendered = render_partitions(jobs, workers=partition_workers)
+        count(metrics, "partition_fallbacks", sum(1 for _, step in rendered if step != "initial"))
+
+        image_paths = [path for paths, _ in rendered for path in paths]
+        for path in image_paths:
+            print(f"Diagram created: {path}")
+    else:
+        image_paths = [f"{output_filename}.{fmt}" for fmt in formats]
+
+        # Stable layout: pin the nodes drawn by the previous render, lay out the others around them
+        node_pos, engine = None, "dot"
+        if layout_file:
+            previous_layout = load_layout(layout_file)
+            node_pos, pinned = pinned_positions(graph, previous_layout) if previous_layout else (None, 0)
+            if node_pos is not None:
+                engine = INCREMENTAL_ENGINE
+            count(metrics, "layout_pinned", pinned)
+
+        with stage(metrics, "cache"):
+            # Identical graphs produce identical pictures: skip Graphviz when we rendered this one before
+            pending = [] # (format, cache key) pairs that still need rendering
+            for fmt, image_path in zip(formats, image_paths):
+                # With a layout file, every render must also produce the positions to save: not cached
+                cache_key = graph_fingerprint(graph, graph_attr, fmt, backend) if cache and not show and not layout_file else None
+                cached_path = cache_lookup(cache_key, fmt, cache_dir) if cache_key else None
+                if cached_path:
+                    shutil.copyfile(cached_path, image_path)
+                    print(f"Diagram created (cached): {image_path}")
+                else:
+                    pending.append((fmt, cache_key))
+
+        if pending:
+            # The node positions come from the same layout, as one more output format
+            extra = ["plain"] if layout_file else []
+            paths, step = render_with_fallback(graph, output_filename, [fmt for fmt, _ in pending] + extra, backend=backend, graph_attr=graph_attr, show=show, render_workers=render_workers, timeout=render_timeout, rebuild=rebuild, metrics=metrics, engine=engine, node_pos=node_pos)
+            count(metrics, "render_layout", step if engine == "dot" else f"{step}:{engine}")
+
+            if layout_file and step != "degraded":
+                plain_path = f"{output_filename}.plain"
+                with open(plain_path, "r") as f:
+                    save_layout(make_layout(graph, parse_plain(f.read())), layout_file)
+                os.remove(plain_path)
+                print(f"Layout saved: {layout_file}")
+
+            if step == "degraded":
+                rendered = {f"{output_filename}.{fmt}" for fmt, _ in pending}
+                image_paths = [path for path in image_paths if path not in rendered] + paths
+                print(f"Rendering gave up; DOT source and summary saved: {', '.join(paths)}")
+            else:
+                for fmt, cache_key in pending:
+                    image_path = f"{output_filename}.{fmt}"
+                    # Only the requested layout is cached: a fallback depends on the timeout
+                    if cache_key and step == "initial":
+                        cache_store(cache_key, fmt, image_path, cache_dir)
+                    print(f"Diagram created: {image_path}")
+
+        count(metrics, "formats", len(formats))
+        count(metrics, "cache_hits", len(formats) - len(pending))
 
     # =========================================================================
     # Step 4: Generate Python Script (Optional)
     # =========================================================================
     if save_script:
-        def sanitize_var_name(address):
-            """Converts a resource address into a valid Python variable name."""
-            clean = re.sub(r'[^a-zA-Z0-9_]', '_', address)
-            if clean[0].isdigit(): clean = "_" + clean
-            return clean
-
-        lines = []
-        
-        # Collect imports dynamically based on used classes
-        imports = set()
-        for node in nodes.values():
-            cls = node['diagram_class']
-            imports.add((cls.__module__, cls.__name__))
-        
-        sorted_imports = sorted(list(imports))
-        lines.append("from diagrams import Diagram, Cluster, Edge")
-        for module, cls_name in sorted_imports:
-            lines.append(f"from {module} import {cls_name}")
-        lines.append("")
-        
-        lines.append(f"graph_attr = {json.dumps(graph_attr, indent=4)}")
-        lines.append("")
-        
-        script_out_name = os.path.basename(output_filename)
-        
-        lines.append(f'with Diagram("Terraform Infrastructure", show=False, filename="{script_out_name}", outformat="{outformat}", graph_attr=graph_attr, direction="LR"):')
-        
-        node_vars = {} # address -> var_name
-        
-        # Helper to track layers for script generation
-        script_layers = {
-            "security": [],
-            "network": [],
-            "app": [],
-            "data": [],
-            "storage": []
-        }
-
-        def categorize_script_node(var_name, rtype):
-            if any(x in rtype for x in ["firewall", "security", "iam", "kms"]):
-                script_layers["security"].append(var_name)
-            elif any(x in rtype for x in ["network", "router", "gateway", "address", "dns", "cdn", "nat", "vpn"]):
-                script_layers["network"].append(var_name)
-            elif any(x in rtype for x in ["sql", "redis", "bigtable", "firestore", "spanner", "bigquery", "data"]):
-                script_layers["data"].append(var_name)
-            elif any(x in rtype for x in ["storage", "filestore", "disk"]):
-                script_layers["storage"].append(var_name)
-            else:
-                script_layers["app"].append(var_name)
-        
-        # Recursive script writer for clusters
-        def render_cluster_script(cluster_addr, indent_level):
-            indent = "    " * indent_level
-            cluster_data = clusters[cluster_addr]
-            label = cluster_data['label']
-            
-            lines.append(f'{indent}with Cluster({repr(label)}):')
-            
-            # Nodes in cluster
-            cluster_node_addrs = [addr for addr, node in nodes.items() if node['parent_addr'] == cluster_addr]
-            for node_addr in cluster_node_addrs:
-                node_data = nodes[node_addr]
-                cls_name = node_data['diagram_class'].__name__
-                node_label_repr = repr(node_data['label'])
-                var_name = sanitize_var_name(node_addr)
-                node_vars[node_addr] = var_name
-                
-                lines.append(f'{indent}    {var_name} = {cls_name}({node_label_repr})')
-                categorize_script_node(var_name, node_data['res_type'])
-                
-            # Child Clusters (Subnets in VPC)
-            if cluster_data['type'] == 'vpc':
-                 child_subnets = []
-                 for sub_addr, sub in clusters.items():
-                     if sub['type'] == 'subnet':
-                         res = next(r for r in resources if r['address'] == sub_addr)
-                         if find_parent_cluster(res.get('expressions', {})) == cluster_addr:
-                             child_subnets.append(sub_addr)
-                 
-                 for sub_addr in child_subnets:
-                     render_cluster_script(sub_addr, indent_level + 1)
-
-        # Script for Top Level VPCs
-        for vpc_addr in vpcs:
-            render_cluster_script(vpc_addr, 1)
-            
-        # Script for Global nodes
-        for node_addr in global_nodes:
-            node_data = nodes[node_addr]
-            cls_name = node_data['diagram_class'].__name__
-            node_label_repr = repr(node_data['label'])
-            var_name = sanitize_var_name(node_addr)
-            node_vars[node_addr] = var_name
-            lines.append(f'    {var_name} = {cls_name}({node_label_repr})')
-            categorize_script_node(var_name, node_data['res_type'])
-
-        # Add invisible edges logic to script
-        lines.append("")
-        lines.append("    # Invisible Edges for Layout")
-        
-        if script_layers["security"] and script_layers["network"]:
-             lines.append(f'    {script_layers["security"][0]} >> Edge(style="invis") >> {script_layers["network"][0]}')
-             
-        if script_layers["security"] and not script_layers["network"] and script_layers["app"]:
-             lines.append(f'    {script_layers["security"][0]} >> Edge(style="invis") >> {script_layers["app"][0]}')
-
-        if script_layers["network"] and script_layers["app"]:
-             lines.append(f'    {script_layers["network"][0]} >> Edge(style="invis") >> {script_layers["app"][0]}')
-             
-        if script_layers["app"] and script_layers["data"]:
-             lines.append(f'    {script_layers["app"][0]} >> Edge(style="invis") >> {script_layers["data"][0]}')
-
-        if script_layers["data"] and script_layers["storage"]:
-             lines.append(f'    {script_layers["data"][0]} >> Edge(style="invis") >> {script_layers["storage"][0]}')
-             
-        if script_layers["app"] and not script_layers["data"] and script_layers["storage"]:
-             lines.append(f'    {script_layers["app"][0]} >> Edge(style="invis") >> {script_layers["storage"][0]}')
-
-        script_filename = output_filename + ".py"
-        with open(script_filename, "w") as f:
-            f.write("\n".join(lines))
-        
+        with stage(metrics, "script"):
+            script_filename = output_filename + ".py"
+            with open(script_filename, "w") as f:
+                f.write(generate_script(graph, output_filename, outformat=formats if len(formats) > 1 else formats[0], graph_attr=graph_attr))
+
         print(f"Script saved: {script_filename}")
+
+    return image_paths
@@ -0,0 +1,151 @@
+"""
+Stable Layouts.
+
+Graphviz lays out the whole diagram from scratch on every run. That is slow on
+big graphs, and a small change in the plan can move everything around, so
+diagrams of consecutive commits are hard to compare. A layout file persists
+where each node was drawn: its position, read from Graphviz's `plain` output
+(in inches) and keyed by resource address, and the bounding box of each
+cluster.
+
+On the next run, unchanged nodes (same address, same parent cluster) are pinned
+at their previous positions. New nodes start at the center of their cluster's
+previous box, and the `fdp` engine places them around the pinned ones, so the
+picture stays put. Whether this is also faster than a full `dot` layout depends
+on the graph: `benchmarks/bench_layout.py` measures both. When too few nodes can
+be pinned, the diagram is laid out again from scratch.
+
+Layouts require the DOT backend, whose node IDs are the resource addresses.
+"""
+
+import json
+import os
+import re
+import tempfile
+
+# Bump when the DOT output changes in a way that invalidates stored positions
+LAYOUT_VERSION = 1
+
+# Engine of incremental layouts: force-directed, honors pinned positions and clusters
+INCREMENTAL_ENGINE = "fdp"
+
+# Minimum share of the nodes that must keep their position for an incremental layout
+LAYOUT_REUSE_MIN = 0.5
+
+# 'node <name> <x> <y> <width> <height> ...' (names are quoted as DOT IDs)
+PLAIN_NODE = re.compile(r'^node ("(?:[^"\\]|\\.)*"|\S+) (\S+) (\S+) (\S+) (\S+)')
+
+# Escaped character in a quoted name (the inverse of `src.dot.quote`)
+PLAIN_ESCAPE = re.compile(r'\\(.)')
+
+def parse_plain(text):
+    """
+    Reads node boxes from Graphviz `-Tplain` output.
+
+    Args:
+        text (str): The plain output.
+
+    Returns:
+        dict: Map: node ID -> (x, y, width, height), in inches (x, y is the center).
+    """
+    boxes = {}
+    for line in text.splitlines():
+        match = PLAIN_NODE.match(line)
+        if not match:
+            continue
+        name = match.group(1)
+        if name.startswith('"'):
+            name = PLAIN_ESCAPE.sub(r'\1', name[1:-1])
+        boxes[name] = tuple(float(value) for value in match.group(2, 3, 4, 5))
+    return boxes
+
+def make_layout(graph, boxes):
+    """
+    Builds the layout record of a rendered graph.
+
+    Args:
+        graph (dict): The graph model that was rendered.
+        boxes (dict): Node boxes from `parse_plain`.
+
+    Returns:
+        dict: {'version', 'nodes': {address: [x, y, parent]}, 'clusters': {address: [x0, y0, x1, y1]}}
+    """
+    nodes = {}
+    clusters = {}
+    for addr, node in graph['nodes'].items():
+        if addr not in boxes:
+            continue
+        x, y, width, height = boxes[addr]
+        nodes[addr] = [x, y, node.parent_addr]
+        # A cluster's box encloses the boxes of its nodes, including those of nested clusters
+        cluster_addr = node.parent_addr
+        while cluster_addr is not None:
+            box = clusters.setdefault(cluster_addr, [x, y, x, y])
+            box[0] = min(box[0], x - width / 2)
+            box[1] = min(box[1], y - height / 2)
+            box[2] = max(box[2], x + width / 2)
+            box[3] = max(box[3], y + height / 2)
+            cluster_addr = graph['clusters'][cluster_addr].parent_addr
+    return {'version': LAYOUT_VERSION, 'nodes': nodes, 'clusters': clusters}
+
+def load_layout(path):
+    """
+    Reads a layout file.
+
+    Returns:
+        dict or None: The layout, or None if the file is missing, unreadable or outdated.
+    """
+    try:
+        with open(path, 'r') as f:
+            layout = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return layout if isinstance(layout, dict) and layout.get('version') == LAYOUT_VERSION else None
+
+def save_layout(layout, path):
+    """Writes a layout file atomically (a concurrent reader never sees a partial file)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(layout, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def pinned_positions(graph, layout, reuse_min=LAYOUT_REUSE_MIN):
+    """
+    Computes the `pos` attribute of each node from a previous layout.
+
+    Args:
+        graph (dict): The graph model about to be rendered.
+        layout (dict): The previous layout (see `make_layout`).
+        reuse_min (float, optional): Minimum share of pinned nodes. Defaults to LAYOUT_REUSE_MIN.
+
+    Returns:
+        tuple: (map: address -> pos, number of pinned nodes), or (None, pinned) when the
+            layout should be computed from scratch instead.
+    """
+    previous = layout['nodes']
+    positions = {}
+    pinned = 0
+    for addr, node in graph['nodes'].items():
+        entry = previous.get(addr)
+        if entry is not None and entry[2] == node.parent_addr:
+            # Trailing '!': the node keeps this position
+            positions[addr] = f"{entry[0]:.4f},{entry[1]:.4f}!"
+            pinned += 1
+            continue
+        # New or moved node: start from where its cluster was
+        cluster_addr = node.parent_addr
+        while cluster_addr is not None and cluster_addr not in layout['clusters']:
+            cluster_addr = graph['clusters'][cluster_addr].parent_addr
+        if cluster_addr is not None:
+            x0, y0, x1, y1 = layout['clusters'][cluster_addr]
+            positions[addr] = f"{(x0 + x1) / 2:.4f},{(y0 + y1) / 2:.4f}"
+
+    if not graph['nodes'] or pinned < reuse_min * len(graph['nodes']):
+        return None, pinned
+    return positions, pinned
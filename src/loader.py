@@ -0,0 +1,381 @@
+"""
+Terraform Plan Loader.
+
+A `tfplan.json` file contains much more than we need to draw a diagram:
+'prior_state', 'resource_changes', provider configuration and so on. For large
+workspaces these sections can weigh hundreds of megabytes, and loading the whole
+document with `json.load` keeps all of it in memory at once.
+
+This module only extracts the parts the generator uses:
+- `configuration.root_module`: 'resources' and 'module_calls'
+- `planned_values.root_module`: 'resources' and 'child_modules'
+- `resource_changes`: only the identity of each change and its 'actions'
+  (the 'before'/'after' values, usually the bulk of the section, are dropped)
+
+When the optional `ijson` package is installed the file is parsed as a stream of
+events and only the sections above are ever materialized, so peak memory grows
+with the number of resources kept rather than with the file size. Without it, we
+fall back to a full load (using `orjson` if available, which is considerably
+faster than the standard library) and prune the result.
+"""
+
+from src.resolver import iter_references, config_address
+import functools
+import importlib
+import json
+import marshal
+
+@functools.lru_cache(maxsize=None)
+def optional_module(name):
+    """
+    Imports an optional dependency (the `ijson` streaming parser, the faster `orjson`
+    backend) on first use, so start-up and the runs that never load a plan do not pay for it.
+
+    Returns:
+        module or None: The module, or None when it is not installed.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+# Sections kept from the plan
+# Key: dotted path inside the JSON document (as reported by ijson)
+# Value: (top-level section, module key, field) where the value is stored in the result
+PLAN_SECTIONS = {
+    "configuration.root_module.resources": ("configuration", "root_module", "resources"),
+    "configuration.root_module.module_calls": ("configuration", "root_module", "module_calls"),
+    "planned_values.root_module.resources": ("planned_values", "root_module", "resources"),
+    "planned_values.root_module.child_modules": ("planned_values", "root_module", "child_modules"),
+}
+
+# Top-level sections of which every Terraform plan has at least one (a document without any is rejected)
+PLAN_KEYS = ("configuration", "planned_values")
+NOT_A_PLAN = f"Not a Terraform plan: expected a JSON object with a '{PLAN_KEYS[0]}' or '{PLAN_KEYS[1]}' section"
+
+# Fields kept from each `resource_changes` entry (besides 'change.actions')
+RESOURCE_CHANGE_FIELDS = ("address", "module_address", "mode", "type", "name", "index")
+
+def load_plan(plan_path):
+    """
+    Loads the parts of a Terraform plan needed to build the diagram.
+
+    Args:
+        plan_path (str): Path to the tfplan.json file.
+
+    Returns:
+        dict: A pruned plan with the same layout as the original document, e.g.
+            {'configuration': {'root_module': {'resources': [...], 'module_calls': {...}}},
+             'planned_values': {'root_module': {'resources': [...], 'child_modules': [...]}},
+             'resource_changes': [{'address': ..., 'type': ..., 'change': {'actions': [...]}}, ...]}
+
+    Raises:
+        ValueError: If the file is not valid JSON, or not a Terraform plan.
+    """
+    ijson = optional_module("ijson")
+    if ijson is not None:
+        try:
+            with open(plan_path, 'rb') as f:
+                return _load_plan_streaming(f)
+        except ijson.JSONError as e:
+            # Same exception type as the full loaders (json/orjson decode errors are ValueErrors)
+            raise ValueError(f"Invalid JSON in {plan_path}: {e}") from e
+    return _load_plan_full(plan_path)
+
+def parse_plan(data):
+    """
+    Loads the parts of a Terraform plan held in memory (see `load_plan`).
+
+    Args:
+        data (bytes, str or dict): The plan JSON document, or the document already parsed.
+
+    Returns:
+        dict: The pruned plan. A parsed document is left untouched: its configuration
+            section is copied, since `extract_resources` rewrites it in place.
+
+    Raises:
+        ValueError: If the document is not valid JSON, or not a Terraform plan.
+    """
+    if isinstance(data, dict):
+        plan = prune_plan(data)
+        if 'configuration' in plan:
+            # marshal round-trip: a fast deep copy of JSON data
+            plan['configuration'] = marshal.loads(marshal.dumps(plan['configuration']))
+        return plan
+    # The document is in memory already, so a full parse beats streaming it
+    orjson = optional_module("orjson")
+    return prune_plan(orjson.loads(data) if orjson is not None else json.loads(data))
+
+def _store(plan, path, value):
+    """Stores a kept section in the pruned plan."""
+    section, module_key, field = PLAN_SECTIONS[path]
+    plan.setdefault(section, {}).setdefault(module_key, {})[field] = value
+
+def _prune_change(change):
+    """Keeps the identity and the actions of a `resource_changes` entry."""
+    pruned = {field: change[field] for field in RESOURCE_CHANGE_FIELDS if field in change}
+    pruned['change'] = {'actions': list(change.get('change', {}).get('actions', []))}
+    return pruned
+
+def _load_plan_streaming(f):
+    """
+    Event-based loader: only the kept sections are built into Python objects,
+    everything else is tokenized and discarded.
+
+    Args:
+        f (file): The plan, opened in binary mode.
+    """
+    ijson = optional_module("ijson")
+    plan = {}
+    builder = None
+    depth = 0
+    target = None
+    change = None # resource_changes entry being collected
+    is_plan = False
+
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if prefix.startswith("resource_changes.item"):
+            # Collect identity fields and actions; 'before'/'after' are skipped as they stream by
+            if prefix == "resource_changes.item":
+                if event == 'start_map':
+                    change = {'change': {'actions': []}}
+                elif event == 'end_map':
+                    plan.setdefault('resource_changes', []).append(change)
+            elif prefix == "resource_changes.item.change.actions.item":
+                change['change']['actions'].append(value)
+            elif prefix[len("resource_changes.item."):] in RESOURCE_CHANGE_FIELDS and event not in ('start_map', 'start_array', 'end_map', 'end_array', 'map_key'):
+                change[prefix[len("resource_changes.item."):]] = value
+        elif builder is not None:
+            builder.event(event, value)
+            if event == 'start_map' or event == 'start_array':
+                depth += 1
+            elif event == 'end_map' or event == 'end_array':
+                depth -= 1
+                if depth == 0:
+                    # The section is complete
+                    _store(plan, target, builder.value)
+                    builder = None
+        elif prefix in PLAN_SECTIONS and (event == 'start_map' or event == 'start_array'):
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+            target = prefix
+        elif not prefix and event == 'map_key' and value in PLAN_KEYS:
+            is_plan = True
+
+    if not is_plan:
+        raise ValueError(NOT_A_PLAN)
+    return plan
+
+def _load_plan_full(plan_path):
+    """
+    Fallback loader: parses the whole document and keeps only the needed sections
+    so the rest can be garbage collected straight away.
+    """
+    orjson = optional_module("orjson")
+    if orjson is not None:
+        with open(plan_path, 'rb') as f:
+            document = orjson.loads(f.read())
+    else:
+        with open(plan_path, 'r') as f:
+            document = json.load(f)
+    return prune_plan(document)
+
+def prune_plan(document):
+    """Keeps only the needed sections of a parsed plan document (shared, not copied)."""
+    if not isinstance(document, dict) or not any(key in document for key in PLAN_KEYS):
+        raise ValueError(NOT_A_PLAN)
+    plan = {}
+    for path in PLAN_SECTIONS:
+        section, module_key, field = PLAN_SECTIONS[path]
+        value = document.get(section, {}).get(module_key, {}).get(field)
+        if value is not None:
+            _store(plan, path, value)
+    if 'resource_changes' in document:
+        plan['resource_changes'] = [_prune_change(change) for change in document['resource_changes']]
+    return plan
+
+# Reference prefixes that never point at a resource or a module output
+NON_RESOURCE_REFERENCES = ("local", "each", "count", "path", "terraform", "self")
+
+def _strip_index(name):
+    """Removes the instance key from a name (e.g. 'web[0]' -> 'web')."""
+    return name.split('[', 1)[0]
+
+def _child_module_path(path, name):
+    """Builds the address of a child module call (e.g. 'module.app.module.db')."""
+    return f"{path}.module.{name}" if path else f"module.{name}"
+
+def extract_resources(plan, include_deleted=False):
+    """
+    Flattens every configuration resource of the plan, including the ones
+    declared in child modules, and injects their resolved planned values.
+
+    Both module trees (configuration 'module_calls' and planned values
+    'child_modules') are walked iteratively, visiting each module exactly once.
+    Resources declared in child modules get their full address
+    (e.g. 'module.app.google_compute_instance.web') and a 'module_address' key,
+    and the references inside their 'expressions' are rewritten into plan-wide
+    addresses: 'var.x' is replaced by the references passed in by the parent
+    module call, and 'module.child.output' by the references of that output.
+    The resource dictionaries of the plan are updated in place.
+
+    Blocks expanded with count/for_each (on the resource or on an enclosing
+    module) produce one entry per planned instance, carrying the instance
+    'address' (e.g. 'google_compute_instance.web[3]'), its 'index', and the
+    'config_address' of the block it came from.
+
+    When the plan has 'resource_changes', every resource carries the
+    'change_actions' Terraform plans for it (e.g. ['create'] or ['delete', 'create']).
+
+    Args:
+        plan (dict): The (possibly pruned) Terraform plan.
+        include_deleted (bool, optional): If True, resources being destroyed (absent from the
+            planned values) are added too, using their configuration block when it still
+            exists. Defaults to False.
+
+    Returns:
+        list: Configuration resource dictionaries, with 'planned_values' injected.
+    """
+    config_root = plan.get('configuration', {}).get('root_module', {})
+
+    # Pass 1: Index the configuration module tree
+    # Map: module path -> (module config, parent module path, module call block)
+    modules = {}
+    stack = [("", config_root, None, None)]
+    while stack:
+        path, module, parent_path, call = stack.pop()
+        modules[path] = (module, parent_path, call)
+        module_calls = module.get('module_calls', {})
+        for name in reversed(list(module_calls)):
+            child_call = module_calls[name]
+            stack.append((_child_module_path(path, name), child_call.get('module', {}), path, child_call))
+
+    # Pass 2: Qualify references into plan-wide addresses (memoized per module/reference)
+    qualified = {}
+
+    def qualify(path, ref):
+        key = (path, ref)
+        if key in qualified:
+            return qualified[key]
+        qualified[key] = ()  # Guards against reference cycles between modules
+
+        parts = ref.split('.')
+        if parts[0] == 'module' and len(parts) > 2:
+            # Reference to a child module output: follow the output expression
+            child_path = _child_module_path(path, _strip_index(parts[1]))
+            child = modules.get(child_path)
+            result = ()
+            if child is not None:
+                output = child[0].get('outputs', {}).get(_strip_index(parts[2]), {})
+                result = qualify_all(child_path, output.get('expression', {}))
+        elif not path:
+            # Root module references are already plan-wide addresses
+            result = (ref,)
+        elif parts[0] == 'var':
+            # Input variable: follow the expression given by the parent module call
+            _, parent_path, call = modules[path]
+            expr = call.get('expressions', {}).get(_strip_index(parts[1]), {}) if len(parts) > 1 else {}
+            result = qualify_all(parent_path, expr)
+        elif parts[0] in NON_RESOURCE_REFERENCES or parts[0] == 'module':
+            result = ()
+        else:
+            result = (f"{path}.{ref}",)
+
+        qualified[key] = result
+        return result
+
+    def qualify_all(path, expressions):
+        result = []
+        for ref in iter_references(expressions):
+            for q in qualify(path, ref):
+                if q not in result:
+                    result.append(q)
+        return tuple(result)
+
+    def rewrite_references(path, expressions):
+        stack = [expressions]
+        while stack:
+            expr_data = stack.pop()
+            if isinstance(expr_data, dict):
+                refs = expr_data.get('references')
+                if isinstance(refs, list):
+                    new_refs = []
+                    for ref in refs:
+                        for q in qualify(path, ref):
+                            if q not in new_refs:
+                                new_refs.append(q)
+                    expr_data['references'] = new_refs
+                stack.extend(expr_data.values())
+            elif isinstance(expr_data, list):
+                stack.extend(expr_data)
+
+    # Pass 3: Index the planned values of every module instance
+    # Map: configuration address (instance keys removed) -> [(planned resource, module instance address)]
+    planned_instances = {}
+    stack = [plan.get('planned_values', {}).get('root_module', {})]
+    while stack:
+        module = stack.pop()
+        module_addr = module.get('address', "")
+        for res in module.get('resources', []):
+            planned_instances.setdefault(config_address(res['address']), []).append((res, module_addr))
+        stack.extend(reversed(module.get('child_modules', [])))
+
+    # Pass 4: Collect resources, module by module, in declaration order
+    resources = []
+    config_blocks = {} # Map: configuration address -> configuration resource
+    for path, (module, _, _) in modules.items():
+        for res in module.get('resources', []):
+            if path:
+                res['address'] = f"{path}.{res['address']}"
+                res['module_address'] = path
+            rewrite_references(path, res.get('expressions', {}))
+            config_blocks[res['address']] = res
+
+            instances = planned_instances.get(res['address'], [])
+            if len(instances) == 1 and instances[0][0]['address'] == res['address']:
+                # Single instance: inject resolved values into the configuration resource
+                res['planned_values'] = instances[0][0].get('values', {})
+                resources.append(res)
+            elif instances:
+                # count / for_each (on the resource or an enclosing module): one entry per instance.
+                # Instances share the configuration body and only differ by their planned values.
+                for planned, module_addr in instances:
+                    instance = dict(res)
+                    instance['address'] = planned['address']
+                    instance['config_address'] = res['address']
+                    instance['planned_values'] = planned.get('values', {})
+                    if 'index' in planned:
+                        instance['index'] = planned['index']
+                    if module_addr:
+                        instance['module_address'] = module_addr
+                    resources.append(instance)
+            else:
+                resources.append(res)
+
+    # Pass 5: Attach the planned change actions
+    changes = {change['address']: change for change in plan.get('resource_changes', []) if 'address' in change}
+    if changes:
+        for res in resources:
+            change = changes.get(res['address'])
+            if change is not None:
+                res['change_actions'] = change['change']['actions']
+
+        if include_deleted:
+            present = {res['address'] for res in resources}
+            for address, change in changes.items():
+                if address in present or change.get('mode', 'managed') != 'managed' or 'delete' not in change['change']['actions']:
+                    continue
+                # The block may still exist (e.g. a lower count); otherwise only the identity is known
+                block = config_blocks.get(config_address(address), {})
+                deleted = dict(block)
+                deleted.update({'address': address, 'type': change.get('type', block.get('type')), 'name': change.get('name', block.get('name')), 'planned_values': {}, 'change_actions': change['change']['actions']})
+                if block and address != block['address']:
+                    deleted['config_address'] = block['address']
+                if 'index' in change:
+                    deleted['index'] = change['index']
+                if change.get('module_address'):
+                    deleted['module_address'] = change['module_address']
+                resources.append(deleted)
+
+    return resources
@@ -8,106 +8,249 @@ This acts as the primary translation layer for visual representation. If a resou
 is missing here, it won't be rendered in the diagram.
 """
 
-from diagrams.gcp.analytics import BigQuery, Composer, DataFusion, Dataflow, Dataproc, PubSub
-from diagrams.gcp.api import APIGateway, Apigee, Endpoints
-from diagrams.gcp.compute import AppEngine, ComputeEngine, Functions, KubernetesEngine, Run
-from diagrams.gcp.database import Bigtable, Firestore, Memorystore, Spanner, SQL
-from diagrams.gcp.devtools import Build, ContainerRegistry, Scheduler, SourceRepositories, Tasks
-from diagrams.gcp.management import Project
-from diagrams.gcp.network import Armor, CDN, DNS, ExternalIpAddresses, FirewallRules, LoadBalancing, NAT, Router, Routes, VirtualPrivateCloud, VPN
-from diagrams.gcp.operations import Logging, Monitoring
-from diagrams.gcp.security import Iam, KeyManagementService, SecretManager
-from diagrams.gcp.storage import Filestore, PersistentDisk, Storage
+import importlib
+import re
 
 # Mapping of Terraform resource types to Diagrams classes
 # Key: Terraform resource type string (e.g., "google_compute_instance")
-# Value: diagrams Class (e.g., ComputeEngine)
+# Value: "module:Class" reference to a diagrams Class (e.g., "diagrams.gcp.compute:ComputeEngine").
+#        The class is only imported the first time the resource type is looked up.
 TERRAFORM_GCP_MAPPING = {
     # Analytics
-    "google_bigquery_dataset": BigQuery,
-    "google_bigquery_table": BigQuery,
-    "google_composer_environment": Composer,
-    "google_data_fusion_instance": DataFusion,
-    "google_dataflow_job": Dataflow,
-    "google_dataproc_cluster": Dataproc,
-    "google_pubsub_topic": PubSub,
-    "google_pubsub_subscription": PubSub,
+    "google_bigquery_dataset": "diagrams.gcp.analytics:BigQuery",
+    "google_bigquery_table": "diagrams.gcp.analytics:BigQuery",
+    "google_composer_environment": "diagrams.gcp.analytics:Composer",
+    "google_data_fusion_instance": "diagrams.gcp.analytics:DataFusion",
+    "google_dataflow_job": "diagrams.gcp.analytics:Dataflow",
+    "google_dataproc_cluster": "diagrams.gcp.analytics:Dataproc",
+    "google_pubsub_topic": "diagrams.gcp.analytics:PubSub",
+    "google_pubsub_subscription": "diagrams.gcp.analytics:PubSub",
 
     # API
-    "google_api_gateway_gateway": APIGateway,
-    "google_apigee_organization": Apigee,
-    "google_endpoints_service": Endpoints,
+    "google_api_gateway_gateway": "diagrams.gcp.api:APIGateway",
+    "google_apigee_organization": "diagrams.gcp.api:Apigee",
+    "google_endpoints_service": "diagrams.gcp.api:Endpoints",
 
     # Compute
-    "google_app_engine_application": AppEngine,
-    "google_compute_instance": ComputeEngine,
-    "google_cloudfunctions_function": Functions,
-    "google_cloudfunctions2_function": Functions,
-    "google_container_cluster": KubernetesEngine,
-    "google_cloud_run_service": Run,
-    "google_cloud_run_v2_service": Run,
+    "google_app_engine_application": "diagrams.gcp.compute:AppEngine",
+    "google_compute_instance": "diagrams.gcp.compute:ComputeEngine",
+    "google_cloudfunctions_function": "diagrams.gcp.compute:Functions",
+    "google_cloudfunctions2_function": "diagrams.gcp.compute:Functions",
+    "google_container_cluster": "diagrams.gcp.compute:KubernetesEngine",
+    "google_cloud_run_service": "diagrams.gcp.compute:Run",
+    "google_cloud_run_v2_service": "diagrams.gcp.compute:Run",
 
     # Database
-    "google_bigtable_instance": Bigtable,
-    "google_firestore_database": Firestore,
-    "google_redis_instance": Memorystore,
-    "google_spanner_instance": Spanner,
-    "google_sql_database_instance": SQL,
+    "google_bigtable_instance": "diagrams.gcp.database:Bigtable",
+    "google_firestore_database": "diagrams.gcp.database:Firestore",
+    "google_redis_instance": "diagrams.gcp.database:Memorystore",
+    "google_spanner_instance": "diagrams.gcp.database:Spanner",
+    "google_sql_database_instance": "diagrams.gcp.database:SQL",
 
     # DevTools
-    "google_cloudbuild_trigger": Build,
-    "google_container_registry": ContainerRegistry,
-    "google_artifact_registry_repository": ContainerRegistry,
-    "google_cloud_scheduler_job": Scheduler,
-    "google_sourcerepo_repository": SourceRepositories,
-    "google_cloud_tasks_queue": Tasks,
+    "google_cloudbuild_trigger": "diagrams.gcp.devtools:Build",
+    "google_container_registry": "diagrams.gcp.devtools:ContainerRegistry",
+    "google_artifact_registry_repository": "diagrams.gcp.devtools:ContainerRegistry",
+    "google_cloud_scheduler_job": "diagrams.gcp.devtools:Scheduler",
+    "google_sourcerepo_repository": "diagrams.gcp.devtools:SourceRepositories",
+    "google_cloud_tasks_queue": "diagrams.gcp.devtools:Tasks",
 
     # Management
-    "google_project": Project,
+    "google_project": "diagrams.gcp.management:Project",
 
     # Network
-    "google_compute_security_policy": Armor,
-    "google_compute_backend_bucket": CDN,
-    "google_dns_managed_zone": DNS,
-    "google_compute_address": ExternalIpAddresses,
-    "google_compute_global_address": ExternalIpAddresses,
-    "google_compute_firewall": FirewallRules,
-    "google_compute_forwarding_rule": LoadBalancing,
-    "google_compute_target_pool": LoadBalancing,
-    "google_compute_backend_service": LoadBalancing,
-    "google_compute_router_nat": NAT,
-    "google_compute_router": Router,
-    "google_compute_route": Routes,
-    "google_compute_network": VirtualPrivateCloud,
-    "google_compute_subnetwork": VirtualPrivateCloud,
-    "google_compute_vpn_gateway": VPN,
-    "google_compute_vpn_tunnel": VPN,
+    "google_compute_security_policy": "diagrams.gcp.network:Armor",
+    "google_compute_backend_bucket": "diagrams.gcp.network:CDN",
+    "google_dns_managed_zone": "diagrams.gcp.network:DNS",
+    "google_compute_address": "diagrams.gcp.network:ExternalIpAddresses",
+    "google_compute_global_address": "diagrams.gcp.network:ExternalIpAddresses",
+    "google_compute_firewall": "diagrams.gcp.network:FirewallRules",
+    "google_compute_forwarding_rule": "diagrams.gcp.network:LoadBalancing",
+    "google_compute_target_pool": "diagrams.gcp.network:LoadBalancing",
+    "google_compute_backend_service": "diagrams.gcp.network:LoadBalancing",
+    "google_compute_router_nat": "diagrams.gcp.network:NAT",
+    "google_compute_router": "diagrams.gcp.network:Router",
+    "google_compute_route": "diagrams.gcp.network:Routes",
+    "google_compute_network": "diagrams.gcp.network:VirtualPrivateCloud",
+    "google_compute_subnetwork": "diagrams.gcp.network:VirtualPrivateCloud",
+    "google_compute_vpn_gateway": "diagrams.gcp.network:VPN",
+    "google_compute_vpn_tunnel": "diagrams.gcp.network:VPN",
 
     # Operations
-    "google_logging_project_sink": Logging,
-    "google_monitoring_alert_policy": Monitoring,
+    "google_logging_project_sink": "diagrams.gcp.operations:Logging",
+    "google_monitoring_alert_policy": "diagrams.gcp.operations:Monitoring",
 
     # Security
-    "google_service_account": Iam,
-    "google_project_iam_member": Iam,
-    "google_kms_key_ring": KeyManagementService,
-    "google_kms_crypto_key": KeyManagementService,
-    "google_secret_manager_secret": SecretManager,
+    "google_service_account": "diagrams.gcp.security:Iam",
+    "google_project_iam_member": "diagrams.gcp.security:Iam",
+    "google_kms_key_ring": "diagrams.gcp.security:KeyManagementService",
+    "google_kms_crypto_key": "diagrams.gcp.security:KeyManagementService",
+    "google_secret_manager_secret": "diagrams.gcp.security:SecretManager",
 
     # Storage
-    "google_filestore_instance": Filestore,
-    "google_compute_disk": PersistentDisk,
-    "google_storage_bucket": Storage,
+    "google_filestore_instance": "diagrams.gcp.storage:Filestore",
+    "google_compute_disk": "diagrams.gcp.storage:PersistentDisk",
+    "google_storage_bucket": "diagrams.gcp.storage:Storage",
 }
 
+# Memoized classes, filled by get_diagram_node
+# Key: Terraform resource type string, Value: resolved diagrams Class
+_resolved_classes = {}
+
+def resolve_class_ref(ref):
+    """
+    Imports the class designated by a "module:Class" reference.
+
+    Args:
+        ref (str): The class reference (e.g., 'diagrams.gcp.compute:ComputeEngine').
+
+    Returns:
+        class: The referenced class.
+    """
+    module_name, _, class_name = ref.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
 def get_diagram_node(resource_type):
     """
     Retrieves the corresponding Diagrams class for a given Terraform resource type.
 
+    The class is imported on the first lookup of each resource type and memoized,
+    so only the `diagrams.gcp.*` modules a plan actually uses are ever loaded.
+    Mapping values may also be classes (e.g., registered by a caller), which are returned as-is.
+
     Args:
         resource_type (str): The Terraform resource string (e.g., 'google_compute_instance').
 
     Returns:
         class or None: The Diagrams node class if found, otherwise None.
     """
-    return TERRAFORM_GCP_MAPPING.get(resource_type)
\ No newline at end of file
+    cls = _resolved_classes.get(resource_type)
+    if cls is None:
+        ref = TERRAFORM_GCP_MAPPING.get(resource_type)
+        if ref is None:
+            return None
+        cls = resolve_class_ref(ref) if isinstance(ref, str) else ref
+        _resolved_classes[resource_type] = cls
+    return cls
+
+# Order of the logical layers (visual columns) from left to right
+LAYER_ORDER = ["security", "network", "app", "data", "storage"]
+
+# Layer (visual column) of each mapped resource type
+# Key: Terraform resource type string, Value: one of LAYER_ORDER
+TERRAFORM_GCP_LAYERS = {
+    # Analytics
+    "google_bigquery_dataset": "data",
+    "google_bigquery_table": "data",
+    "google_composer_environment": "app",
+    "google_data_fusion_instance": "data",
+    "google_dataflow_job": "data",
+    "google_dataproc_cluster": "data",
+    "google_pubsub_topic": "app",
+    "google_pubsub_subscription": "app",
+
+    # API
+    "google_api_gateway_gateway": "network",
+    "google_apigee_organization": "app",
+    "google_endpoints_service": "app",
+
+    # Compute
+    "google_app_engine_application": "app",
+    "google_compute_instance": "app",
+    "google_cloudfunctions_function": "app",
+    "google_cloudfunctions2_function": "app",
+    "google_container_cluster": "app",
+    "google_cloud_run_service": "app",
+    "google_cloud_run_v2_service": "app",
+
+    # Database
+    "google_bigtable_instance": "data",
+    "google_firestore_database": "data",
+    "google_redis_instance": "data",
+    "google_spanner_instance": "data",
+    "google_sql_database_instance": "data",
+
+    # DevTools
+    "google_cloudbuild_trigger": "app",
+    "google_container_registry": "app",
+    "google_artifact_registry_repository": "app",
+    "google_cloud_scheduler_job": "app",
+    "google_sourcerepo_repository": "app",
+    "google_cloud_tasks_queue": "app",
+
+    # Management
+    "google_project": "app",
+
+    # Network
+    "google_compute_security_policy": "security",
+    "google_compute_backend_bucket": "network",
+    "google_dns_managed_zone": "network",
+    "google_compute_address": "network",
+    "google_compute_global_address": "network",
+    "google_compute_firewall": "security",
+    "google_compute_forwarding_rule": "network",
+    "google_compute_target_pool": "network",
+    "google_compute_backend_service": "network",
+    "google_compute_router_nat": "network",
+    "google_compute_router": "network",
+    "google_compute_route": "network",
+    "google_compute_network": "network",
+    "google_compute_subnetwork": "network",
+    "google_compute_vpn_gateway": "network",
+    "google_compute_vpn_tunnel": "network",
+
+    # Operations
+    "google_logging_project_sink": "app",
+    "google_monitoring_alert_policy": "app",
+
+    # Security
+    "google_service_account": "security",
+    "google_project_iam_member": "security",
+    "google_kms_key_ring": "security",
+    "google_kms_crypto_key": "security",
+    "google_secret_manager_secret": "security",
+
+    # Storage
+    "google_filestore_instance": "storage",
+    "google_compute_disk": "storage",
+    "google_storage_bucket": "storage",
+}
+
+# Fallback for types without an explicit layer (e.g. registered by a caller): the first
+# pattern matching a whole word of the type wins, so "google_compute_network_peering"
+# is a network resource no matter which other words it contains.
+LAYER_PATTERNS = [
+    ("security", re.compile(r"(?:^|_)(?:firewall|security|iam|kms|secret|ssl|certificate|account)(?:_|$)")),
+    ("network", re.compile(r"(?:^|_)(?:network|subnetwork|router|route|gateway|address|dns|cdn|nat|vpn|forwarding|backend|interconnect)(?:_|$)")),
+    ("data", re.compile(r"(?:^|_)(?:sql|redis|memcache|bigtable|firestore|spanner|bigquery|database|dataflow|dataproc|data)(?:_|$)")),
+    ("storage", re.compile(r"(?:^|_)(?:storage|filestore|disk|bucket)(?:_|$)")),
+]
+
+# Memoized layers, filled by categorize_layer
+# Key: Terraform resource type string, Value: layer name
+_resolved_layers = {}
+
+def categorize_layer(resource_type, overrides=None):
+    """
+    Sorts a resource type into one of the logical layers.
+
+    The layer comes from `overrides`, then TERRAFORM_GCP_LAYERS, then the first
+    matching entry of LAYER_PATTERNS, and defaults to "app" (compute instances,
+    functions, containers etc.). It is memoized per resource type.
+
+    Args:
+        resource_type (str): The Terraform resource type.
+        overrides (dict, optional): Resource type -> layer, taking precedence over the tables.
+
+    Returns:
+        str: One of the names in LAYER_ORDER.
+    """
+    if overrides and resource_type in overrides:
+        return overrides[resource_type]
+    layer = _resolved_layers.get(resource_type)
+    if layer is None:
+        layer = TERRAFORM_GCP_LAYERS.get(resource_type)
+        if layer is None:
+            layer = next((name for name, pattern in LAYER_PATTERNS if pattern.search(resource_type)), "app")
+        _resolved_layers[resource_type] = layer
+    return layer
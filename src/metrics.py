@@ -0,0 +1,149 @@
+"""
+Pipeline Metrics.
+
+This module records where the time goes in `create_diagram`. Every stage
+(plan load, resource extraction, cluster detection, node resolution, layering,
+rendering, script emission) is wrapped in `stage(metrics, name)`, which records:
+- wall time and CPU time (including the CPU of child processes, i.e. Graphviz),
+- the peak allocation of the stage, when memory tracing is enabled (tracemalloc),
+- the peak resident size of the process so far.
+
+Counts (resources, references, clusters, nodes, ...) are added with `count`.
+Metrics are plain dictionaries, so they can be dumped as JSON or handed to a
+caller's hook as-is. Passing `None` instead of a metrics dictionary turns every
+helper into a no-op, so instrumented code pays nothing when nobody is listening.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows
+
+def new_metrics(trace_memory=False, **info):
+    """
+    Creates an empty metrics record.
+
+    Args:
+        trace_memory (bool, optional): If True, records the peak allocation of every stage
+            with tracemalloc (slows the pipeline down noticeably). Defaults to False.
+        **info: Extra fields stored as-is (e.g. plan path, output format).
+
+    Returns:
+        dict: The metrics record: info fields, 'stages' (list) and 'counts' (dict).
+    """
+    metrics = dict(info)
+    metrics['stages'] = []
+    metrics['counts'] = {}
+    metrics['trace_memory'] = trace_memory
+    return metrics
+
+def reset_peak():
+    """
+    Starts a new peak measurement of the traced memory.
+
+    `tracemalloc.reset_peak` only exists from Python 3.9. Before that, the traces are
+    cleared instead: allocations made earlier are forgotten, so the traced size
+    restarts from zero, and the peak that follows is still the one of the new allocations.
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.clear_traces()
+
+def _max_rss_mb():
+    """Peak resident set size of the process, in MB (None when unavailable)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def _cpu_seconds():
+    """CPU time of this process and of its terminated children (e.g. dot)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+@contextlib.contextmanager
+def stage(metrics, name):
+    """
+    Context manager measuring one stage of the pipeline.
+
+    Args:
+        metrics (dict or None): Record created by `new_metrics` (None: do nothing).
+        name (str): Stage name (e.g. 'load', 'render').
+
+    Yields:
+        dict or None: The stage entry, to which the caller may add fields.
+    """
+    if metrics is None:
+        yield None
+        return
+
+    entry = {'name': name}
+    tracing = metrics['trace_memory']
+    started_tracing = False
+    if tracing:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    try:
+        yield entry
+    finally:
+        entry['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+        entry['cpu_seconds'] = round(_cpu_seconds() - cpu_start, 6)
+        if tracing:
+            entry['peak_alloc_mb'] = round((tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024), 3)
+            if started_tracing:
+                tracemalloc.stop()
+        max_rss = _max_rss_mb()
+        if max_rss is not None:
+            entry['max_rss_mb'] = round(max_rss, 1)
+        metrics['stages'].append(entry)
+
+def count(metrics, name, value):
+    """Records a counter (no-op when `metrics` is None)."""
+    if metrics is not None:
+        metrics['counts'][name] = value
+
+def finish(metrics):
+    """Adds the totals over all stages and returns the record."""
+    metrics['wall_seconds'] = round(sum(s['wall_seconds'] for s in metrics['stages']), 6)
+    metrics['cpu_seconds'] = round(sum(s['cpu_seconds'] for s in metrics['stages']), 6)
+    return metrics
+
+def format_summary(metrics):
+    """
+    Formats the metrics as a human-readable table.
+
+    Args:
+        metrics (dict): A finished metrics record.
+
+    Returns:
+        str: The summary.
+    """
+    total = metrics.get('wall_seconds') or 1e-9
+    lines = [f"{'stage':<16} {'wall s':>9} {'cpu s':>9} {'share':>7} {'peak MB':>9}"]
+    for s in metrics['stages']:
+        peak = f"{s['peak_alloc_mb']:>9.1f}" if 'peak_alloc_mb' in s else f"{'-':>9}"
+        lines.append(f"{s['name']:<16} {s['wall_seconds']:>9.3f} {s['cpu_seconds']:>9.3f} {s['wall_seconds'] / total:>7.1%} {peak} {s.get('outcome', '')}".rstrip())
+    lines.append(f"{'total':<16} {metrics.get('wall_seconds', 0):>9.3f} {metrics.get('cpu_seconds', 0):>9.3f}")
+    if metrics['counts']:
+        lines.append("counts: " + ", ".join(f"{key}={value}" for key, value in metrics['counts'].items()))
+    return "\n".join(lines)
+
+def write_json(metrics, path):
+    """Writes the metrics record to a JSON file."""
+    with open(path, "w") as f:
+        json.dump(metrics, f, indent=2)
@@ -0,0 +1,67 @@
+"""
+Graph Model Records.
+
+The nodes and clusters of the graph model (see `src.resolver.build_graph`) are
+kept for the whole run and, on large plans, number in the tens of thousands.
+They are slotted records rather than dictionaries: a record has a fixed set of
+fields and no per-instance `__dict__`, which makes it several times smaller,
+and it only holds what the renderers, the script emitter and the cache need.
+Records are picklable, so graphs can be handed to worker processes.
+"""
+
+class Node:
+    """A resource drawn as an icon."""
+
+    __slots__ = ('address', 'res_type', 'diagram_class', 'label', 'parent_addr', 'layer', 'count', 'change', 'module')
+
+    def __init__(self, address, res_type, diagram_class, label, parent_addr=None, layer="app", count=1, change=None, module=None):
+        """
+        Args:
+            address (str): Resource address (block address for an aggregated node).
+            res_type (str): Terraform resource type (None for synthetic nodes).
+            diagram_class (type): The `diagrams` node class (icon).
+            label (str): Display label.
+            parent_addr (str, optional): Address of the enclosing cluster. Defaults to None (global).
+            layer (str, optional): Layout layer (see `src.resolver.LAYER_ORDER`). Defaults to "app".
+            count (int, optional): Number of instances collapsed into this node. Defaults to 1.
+            change (str, optional): Planned change action ('create', 'update', 'delete', 'replace',
+                or 'mixed' for an aggregated node whose instances differ).
+            module (str, optional): Address of the module declaring the resource.
+        """
+        self.address = address
+        self.res_type = res_type
+        self.diagram_class = diagram_class
+        self.label = label
+        self.parent_addr = parent_addr
+        self.layer = layer
+        self.count = count
+        self.change = change
+        self.module = module
+
+    def __repr__(self):
+        return f"Node({self.address!r}, {self.res_type!r}, parent={self.parent_addr!r})"
+
+class Cluster:
+    """A VPC, subnet or module drawn as a box around its contents."""
+
+    __slots__ = ('address', 'type', 'label', 'parent_addr', 'change', 'module')
+
+    def __init__(self, address, type, label, parent_addr=None, change=None, module=None):
+        """
+        Args:
+            address (str): Address of the VPC, subnet or module.
+            type (str): 'vpc', 'subnet' or 'module'.
+            label (str): Display label.
+            parent_addr (str, optional): Address of the enclosing cluster. Defaults to None (top level).
+            change (str, optional): Planned change action.
+            module (str, optional): Address of the module declaring it (the parent module for a module cluster).
+        """
+        self.address = address
+        self.type = type
+        self.label = label
+        self.parent_addr = parent_addr
+        self.change = change
+        self.module = module
+
+    def __repr__(self):
+        return f"Cluster({self.address!r}, {self.type!r}, parent={self.parent_addr!r})"
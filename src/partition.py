@@ -0,0 +1,149 @@
+"""
+Partitioned Rendering.
+
+Graphviz layout time grows much faster than linearly with the number of nodes,
+and `splines: ortho` on thousands of nodes may never finish. For large plans the
+resolved graph can instead be split into independent diagrams:
+
+- by 'vpc': one diagram per top-level VPC (with its subnets and resources), plus
+  one for the resources outside any VPC;
+- by 'module': one diagram per top-level module, plus one for the root module.
+  VPCs and subnets enclosing a module's resources are drawn in its diagram too.
+
+An overview diagram shows one node per partition (with its size) and, when
+dependency edges are enabled, the dependencies between partitions. Partitions
+are rendered in parallel worker processes.
+"""
+
+from src.mapper import get_diagram_node, resolve_class_ref
+from src.resolver import LAYER_ORDER, restrict_graph
+from src.model import Node
+import re
+
+# Icon of the overview nodes that do not stand for a VPC
+PARTITION_CLASS = "diagrams.generic.place:Datacenter"
+
+def partition_filename(output_filename, name):
+    """Output filename of a partition (e.g. 'output/prod' + 'module.app' -> 'output/prod_module.app')."""
+    return f"{output_filename}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_')}"
+
+def _top_module(module_addr):
+    """Top-level module of a module address (e.g. 'module.app.module.db' -> 'module.app')."""
+    pos = module_addr.find('.module.')
+    return module_addr[:pos] if pos != -1 else module_addr
+
+def _top_vpc(graph, cluster_addr):
+    """The outermost VPC enclosing a cluster, if any."""
+    clusters = graph['clusters']
+    vpc = None
+    while cluster_addr is not None:
+        if clusters[cluster_addr].type == 'vpc':
+            vpc = cluster_addr
+        cluster_addr = clusters[cluster_addr].parent_addr
+    return vpc
+
+def partition_graph(graph, by="vpc"):
+    """
+    Splits the graph model into partitions.
+
+    Args:
+        graph (dict): The graph model produced by `build_graph`.
+        by (str, optional): "vpc" or "module". Defaults to "vpc".
+
+    Returns:
+        list: (name, graph model) pairs, in render order. Empty partitions are omitted.
+    """
+    if by not in ("vpc", "module"):
+        raise ValueError(f"Unknown partitioning '{by}' (expected 'vpc' or 'module')")
+
+    members = {} # Map: partition name -> addresses of its nodes and clusters
+    rest = "global" if by == "vpc" else "root"
+    if by == "vpc":
+        for addr, cluster in graph['clusters'].items():
+            if cluster.type in ('vpc', 'subnet'):
+                vpc = _top_vpc(graph, addr)
+                members.setdefault(vpc, set()).add(addr)
+        for addr, node in graph['nodes'].items():
+            vpc = _top_vpc(graph, node.parent_addr) if node.parent_addr is not None else None
+            members.setdefault(vpc or rest, set()).add(addr)
+    else:
+        for addr, node in graph['nodes'].items():
+            key = _top_module(node.module) if node.module else rest
+            members.setdefault(key, set()).add(addr)
+
+    # Render order: the partitions in plan order, the remainder last
+    order = [name for name in members if name != rest]
+    if rest in members:
+        order.append(rest)
+    partitions = [(name, restrict_graph(graph, members[name])) for name in order]
+    return [(name, part) for name, part in partitions if part['nodes']]
+
+def overview_graph(graph, partitions):
+    """
+    Builds the overview: one node per partition, and the dependencies between partitions.
+
+    Args:
+        graph (dict): The full graph model.
+        partitions (list): (name, graph model) pairs from `partition_graph`.
+
+    Returns:
+        dict: A graph model (no clusters).
+    """
+    nodes = {}
+    owner = {} # Map: node address -> partition name
+    for name, part in partitions:
+        is_vpc = name in graph['clusters'] and graph['clusters'][name].type == 'vpc'
+        label = graph['clusters'][name].label if is_vpc else name
+        nodes[name] = Node(
+            name,
+            None,
+            get_diagram_node('google_compute_network') if is_vpc else resolve_class_ref(PARTITION_CLASS),
+            f"{label}\n{len(part['nodes'])} resources",
+            layer="network",
+            count=len(part['nodes']),
+        )
+        for addr in part['nodes']:
+            owner.setdefault(addr, name)
+
+    edges = {}
+    for src, dst in graph['edges']:
+        if src in owner and dst in owner and owner[src] != owner[dst]:
+            edges[(owner[src], owner[dst])] = None
+
+    layers = {layer: [] for layer in LAYER_ORDER}
+    layers["network"] = list(nodes)
+    return {
+        'clusters': {},
+        'nodes': nodes,
+        'roots': [],
+        'children': {},
+        'nodes_by_parent': {None: list(nodes)},
+        'layers': layers,
+        'aliases': {},
+        'edges': list(edges),
+    }
+
+def _render_partition(job):
+    """Worker: renders one partition. Returns the written paths and the layout used."""
+    from src.generator import render_with_fallback
+    part, output_filename, formats, backend, graph_attr, timeout, render_workers = job
+    return render_with_fallback(part, output_filename, formats, backend=backend, graph_attr=graph_attr, render_workers=render_workers, timeout=timeout)
+
+def render_partitions(jobs, workers=None):
+    """
+    Renders partitions in parallel worker processes.
+
+    Args:
+        jobs (list): (graph model, output filename, formats, backend, graph_attr, timeout,
+            render_workers) tuples.
+        workers (int, optional): Number of worker processes. Defaults to the CPU count.
+
+    Returns:
+        list: For each job, (paths of the written files, layout step) as returned by
+            `src.generator.render_with_fallback`.
+    """
+    if len(jobs) == 1:
+        return [_render_partition(jobs[0])]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_render_partition, jobs))
@@ -0,0 +1,155 @@
+"""
+Parsed-Plan Cache.
+
+The same plan is often rendered several times in a row with different flags
+(`--simple`, another output format, `--save-script`), and every run used to
+parse the whole JSON document and walk its modules again. This module stores
+the extracted resources (see `src.loader.extract_resources`) on disk in
+`marshal` format, so later runs skip JSON entirely: an entry is memory-mapped
+and deserialized in a fraction of the parse time.
+
+Entries are keyed by the content hash of the plan file. Hashing is much cheaper
+than parsing, and is itself skipped while the file keeps the size and mtime it
+had when it was last hashed: a small '.ref' file maps (path, size, mtime) to the
+content hash. A plan regenerated with identical content still hits.
+
+The marshal format is specific to the Python version, which is part of the
+key. Entries share the size-bounded, least-recently-used eviction of the render
+cache (see `src.cache.evict`).
+"""
+
+from src.cache import evict
+import gc
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+import tempfile
+
+# Bump when resource extraction changes in a way that alters its output
+PLAN_CACHE_VERSION = 1
+
+DEFAULT_PLAN_CACHE_DIR = os.environ.get("TERRAVIZ_PLAN_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "terraviz", "plans"))
+DEFAULT_PLAN_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Read size when hashing a plan file (bounds memory on multi-GB plans)
+HASH_CHUNK_BYTES = 1024 * 1024
+
+def _write_atomic(path, data):
+    """Writes a file under a temporary name and renames it, so readers never see a partial entry."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _ref_path(plan_path, cache_dir):
+    """Path of the record holding the content hash of the plan file at its current size and mtime."""
+    stat = os.stat(plan_path)
+    stat_key = hashlib.sha256(f"{os.path.realpath(plan_path)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{stat_key}.ref")
+
+def _content_hash(plan_path, cache_dir):
+    """
+    Returns the SHA-256 of the plan file, reusing the hash recorded for its current size and mtime.
+    """
+    ref_path = _ref_path(plan_path, cache_dir)
+    try:
+        with open(ref_path, "r") as f:
+            digest = f.read().strip()
+        os.utime(ref_path, None)
+        if len(digest) == 64:
+            return digest
+    except OSError:
+        pass
+
+    sha = hashlib.sha256()
+    with open(plan_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(ref_path, digest.encode("ascii"))
+    return digest
+
+def plan_cache_key(plan_path, include_deleted=False, cache_dir=DEFAULT_PLAN_CACHE_DIR):
+    """
+    Computes the cache key of the resources extracted from a plan file.
+
+    Args:
+        plan_path (str): Path to the tfplan.json file.
+        include_deleted (bool, optional): The `extract_resources` option. Defaults to False.
+        cache_dir (str, optional): Cache directory (holds the size/mtime -> hash records).
+
+    Returns:
+        str: A hex digest identifying the extracted resources.
+    """
+    digest = _content_hash(plan_path, cache_dir)
+    payload = f"{PLAN_CACHE_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}:{marshal.version}:{digest}:{bool(include_deleted)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def plan_cache_forget(plan_path, cache_dir=DEFAULT_PLAN_CACHE_DIR):
+    """
+    Removes the size/mtime record of a plan file that will not be read again (e.g. a
+    temporary copy of an upload). The cached resources themselves are kept.
+
+    Args:
+        plan_path (str): Path to the tfplan.json file (must still exist).
+        cache_dir (str, optional): Cache directory.
+    """
+    try:
+        os.remove(_ref_path(plan_path, cache_dir))
+    except OSError:
+        pass
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.marshal")
+
+def plan_cache_lookup(key, cache_dir=DEFAULT_PLAN_CACHE_DIR):
+    """
+    Loads cached resources.
+
+    Args:
+        key (str): Key from `plan_cache_key`.
+        cache_dir (str, optional): Cache directory.
+
+    Returns:
+        list or None: The extracted resources, or None on a miss (or an unreadable entry).
+    """
+    path = _entry_path(cache_dir, key)
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Deserialization allocates only containers that live on: collecting meanwhile is wasted work
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                resources = marshal.loads(data)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+        os.utime(path, None) # Mark the entry as recently used
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    return resources
+
+def plan_cache_store(key, resources, cache_dir=DEFAULT_PLAN_CACHE_DIR, max_bytes=DEFAULT_PLAN_CACHE_MAX_BYTES):
+    """
+    Stores extracted resources in the cache, then enforces the size limit.
+
+    Args:
+        key (str): Key from `plan_cache_key`.
+        resources (list): The output of `extract_resources`.
+        cache_dir (str, optional): Cache directory.
+        max_bytes (int, optional): Maximum total size of the cache directory.
+    """
+    try:
+        data = marshal.dumps(resources)
+    except ValueError:
+        return # Not plain JSON data: leave it uncached
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(_entry_path(cache_dir, key), data)
+    evict(cache_dir, max_bytes)
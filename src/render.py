@@ -0,0 +1,114 @@
+"""
+Diagrams Rendering Backend.
+
+This module turns the resolved graph model (see `src.resolver.build_graph`) into
+an image using the `diagrams` library. Clusters become `Cluster` contexts, nodes
+are instantiated from their mapped classes, and the invisible layer edges keep
+the Left-to-Right column layout.
+
+`diagrams` tracks the current Diagram and Cluster in context variables. Each
+diagram is built in a fresh context of its own, so concurrent renders (threads
+of one process, asyncio tasks) never see each other's stack or the caller's,
+and the intermediate DOT file lives in a private temporary directory.
+"""
+
+from src.resolver import layer_edges, change_attrs, DEPENDENCY_EDGE_ATTRS
+import contextvars
+import os
+import tempfile
+
+def _populate(graph):
+    """
+    Instantiates the clusters, nodes and layout edges of the graph model
+    inside the currently active `diagrams` Diagram.
+    """
+    from diagrams import Cluster, Edge
+
+    clusters = graph['clusters']
+    nodes = graph['nodes']
+    node_instances = {} # Map: address -> instantiated Diagram node object
+
+    def render_nodes(parent_addr):
+        for node_addr in graph['nodes_by_parent'][parent_addr]:
+            node_data = nodes[node_addr]
+            node_instances[node_addr] = node_data.diagram_class(node_data.label, **change_attrs(node_data.change))
+
+    # Recursive function to render clusters and their contents
+    def render_cluster(cluster_addr):
+        with Cluster(clusters[cluster_addr].label, graph_attr=change_attrs(clusters[cluster_addr].change, cluster=True)):
+            # 1. Instantiate nodes belonging directly to this cluster
+            render_nodes(cluster_addr)
+
+            # 2. Recursively render child clusters (e.g., Subnets inside this VPC)
+            for child_addr in graph['children'][cluster_addr]:
+                render_cluster(child_addr)
+
+    # Start by rendering Top Level clusters (VPCs are the main containers)
+    for cluster_addr in graph['roots']:
+        render_cluster(cluster_addr)
+
+    # Render Global nodes (those with no parent cluster)
+    render_nodes(None)
+
+    # Draw the invisible edges between the first item of each layer
+    # This forces the columns to line up Left-to-Right
+    for src_addr, dst_addr in layer_edges(graph['layers']):
+        node_instances[src_addr] >> Edge(style="invis") >> node_instances[dst_addr]
+
+    # Dependency edges (resource -> the resource it references)
+    for src_addr, dst_addr in graph.get('edges', ()):
+        node_instances[src_addr] >> Edge(**DEPENDENCY_EDGE_ATTRS) >> node_instances[dst_addr]
+
+def build_diagram(graph, graph_attr=None, outformat="png"):
+    """
+    Builds the `diagrams` Diagram of the graph model without rendering it.
+
+    Args:
+        graph (dict): The graph model produced by `build_graph`.
+        graph_attr (dict, optional): Graphviz global attributes.
+        outformat (str, optional): Output format, validated by `diagrams`. Defaults to "png".
+
+    Returns:
+        diagrams.Diagram: The populated diagram.
+    """
+    from diagrams import Diagram, setdiagram
+
+    def build():
+        diagram = Diagram("Terraform Infrastructure", show=False, outformat=outformat, graph_attr=graph_attr, direction="LR")
+        # Activate the diagram like `with Diagram(...)` does, minus the render on exit
+        setdiagram(diagram)
+        _populate(graph)
+        return diagram
+
+    # A fresh Context: the Diagram/Cluster stack set here is discarded with it
+    return contextvars.Context().run(build)
+
+def render_diagram(graph, output_filename, outformat="png", show=False, graph_attr=None):
+    """
+    Renders the graph model with the `diagrams` library.
+
+    Args:
+        graph (dict): The graph model produced by `build_graph`.
+        output_filename (str): Base filename for the output (no extension).
+        outformat (str, optional): Output image format (png, jpg, dot). Defaults to "png".
+        show (bool, optional): Whether to open the image after generation. Defaults to False.
+        graph_attr (dict, optional): Graphviz global attributes.
+    """
+    diagram = build_diagram(graph, graph_attr=graph_attr, outformat=outformat)
+    # Graphviz reads the source from a file: keep it private to this render
+    with tempfile.TemporaryDirectory(prefix="terraviz-") as tmp_dir:
+        diagram.dot.render(filename=os.path.join(tmp_dir, "diagram.gv"), outfile=f"{output_filename}.{outformat}", format=outformat, view=show, quiet=True)
+
+def diagram_source(graph, graph_attr=None):
+    """
+    Builds the diagram with the `diagrams` library and returns its DOT source
+    without rendering it, so the caller can run Graphviz itself.
+
+    Args:
+        graph (dict): The graph model produced by `build_graph`.
+        graph_attr (dict, optional): Graphviz global attributes.
+
+    Returns:
+        str: The DOT source.
+    """
+    return build_diagram(graph, graph_attr=graph_attr).dot.source
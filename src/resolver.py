@@ -0,0 +1,785 @@
+"""
+Relationship Resolver.
+
+This module works out how resources relate to each other inside a Terraform plan,
+most importantly which container (Subnet or VPC) a resource lives in.
+
+Terraform records relationships as plain address strings inside the 'references'
+lists of a resource's 'expressions' block. A reference may point at the resource
+itself (e.g. 'google_compute_network.vpc') or at one of its attributes
+(e.g. 'google_compute_network.vpc.id'). Instead of comparing every reference
+against every known cluster, we build a hash index of cluster addresses once per
+plan and resolve each reference by probing its dot-separated prefixes.
+
+The result of the resolution is a small intermediate graph model (see `build_graph`)
+that every output backend consumes.
+"""
+
+from src.mapper import get_diagram_node, categorize_layer, LAYER_ORDER
+from src.resources.lookup import get_resource_labels, RESOURCE_LABELERS, LABEL_VALUES
+from src.metrics import stage, count as count_metric
+from src.model import Node, Cluster
+import re
+
+# Matches an instance key such as [0] or ["eu-west1"]
+INSTANCE_KEY_RE = re.compile(r'\[(?:"(?:[^"\\]|\\.)*"|[^\]]*)\]')
+
+def config_address(address):
+    """
+    Removes every instance key from an address, giving the address of the
+    configuration block it was expanded from.
+
+    Example: 'module.app[0].google_compute_instance.web["a"]' -> 'module.app.google_compute_instance.web'
+    """
+    return INSTANCE_KEY_RE.sub('', address)
+
+def instance_keys(address):
+    """
+    Returns the instance keys of an address, outermost module first.
+
+    Example: 'module.app[0].google_compute_instance.web["a"]' -> ('[0]', '["a"]')
+    """
+    return tuple(INSTANCE_KEY_RE.findall(address))
+
+def build_cluster_index(clusters):
+    """
+    Builds the lookup index used to resolve references to clusters.
+
+    Every cluster is indexed under its own address. Clusters expanded with
+    count/for_each are also indexed under their configuration address, so that
+    references without a key (e.g. 'google_compute_subnetwork.sub', as written
+    with `count.index`) still resolve; those entries are keyed by instance keys
+    so the matching instance can be picked in constant time.
+
+    Args:
+        clusters (dict): Map of cluster address -> Cluster (type 'vpc', 'subnet' or 'module').
+
+    Returns:
+        dict: Map of address -> {instance keys (or None for the default): (cluster address, cluster type)}.
+    """
+    index = {}
+    for addr, cluster in clusters.items():
+        # Only network containers can be referenced; module clusters are structural
+        if cluster.type not in ('vpc', 'subnet'):
+            continue
+        entry = (addr, cluster.type)
+        index[addr] = {None: entry}
+
+        base = config_address(addr)
+        if base != addr:
+            group = index.setdefault(base, {})
+            group.setdefault(None, entry)
+            group[instance_keys(addr)] = entry
+    return index
+
+def _lookup_address(cluster_index, candidate, keys):
+    """
+    Looks up a candidate address in an address index (see `build_cluster_index`).
+
+    For expanded blocks the instance sharing the most leading instance keys
+    with the referencing resource wins (e.g. 'web[2]' -> 'sub[2]'), otherwise the first one.
+    """
+    group = cluster_index.get(candidate)
+    if group is None and '[' in candidate:
+        # Keyed reference into an expanded module (e.g. 'module.net.google_compute_subnetwork.sub[0]')
+        group = cluster_index.get(config_address(candidate))
+    if group is None:
+        return None
+    for n in range(len(keys), 0, -1):
+        entry = group.get(keys[:n])
+        if entry is not None:
+            return entry
+    return group[None]
+
+def reference_prefixes(ref):
+    """
+    Yields every candidate address a reference could point at.
+
+    A reference matches an address when it is equal to it or starts with
+    the address followed by a '.', so the candidates are the reference itself
+    and everything before each '.' in it.
+
+    Args:
+        ref (str): A reference string (e.g. 'google_compute_subnetwork.subnet.id').
+
+    Yields:
+        str: Candidate addresses, shortest first.
+    """
+    pos = ref.find('.')
+    while pos != -1:
+        yield ref[:pos]
+        pos = ref.find('.', pos + 1)
+    yield ref
+
+def iter_references(expressions):
+    """
+    Walks an 'expressions' tree and yields every reference it contains.
+
+    The walk is iterative and visits the tree in the same order as a recursive
+    depth-first search (a block's own references before its nested blocks).
+
+    Args:
+        expressions (dict | list): The resource's 'expressions' block.
+
+    Yields:
+        str: Each reference string, in document order.
+    """
+    stack = [expressions]
+    while stack:
+        expr_data = stack.pop()
+        if isinstance(expr_data, dict):
+            # 'references' key contains list of resource addresses this block refers to
+            refs = expr_data.get('references')
+            if isinstance(refs, list):
+                yield from refs
+            stack.extend(reversed(list(expr_data.values())))
+        elif isinstance(expr_data, list):
+            stack.extend(reversed(expr_data))
+
+def find_parent_cluster(res_expressions, cluster_index, keys=()):
+    """
+    Searches resource expressions for references to known clusters (VPCs/Subnets).
+    Prioritizes Subnets over VPCs (deepest nesting).
+
+    Args:
+        res_expressions (dict): The resource's 'expressions' block.
+        cluster_index (dict): Index built by `build_cluster_index`.
+        keys (tuple, optional): Instance keys of the resource (see `instance_keys`),
+            used to pick the matching instance of an expanded cluster.
+
+    Returns:
+        str or None: The address of the most specific parent cluster, if any.
+    """
+    first_vpc = None
+    for ref in iter_references(res_expressions):
+        for candidate in reference_prefixes(ref):
+            entry = _lookup_address(cluster_index, candidate, keys)
+            if entry is None:
+                continue
+            if entry[1] == 'subnet':
+                # The first Subnet found always wins, no need to keep scanning
+                return entry[0]
+            if entry[1] == 'vpc' and first_vpc is None:
+                first_vpc = entry[0]
+    return first_vpc
+
+def build_node_index(nodes, aliases):
+    """
+    Builds the reverse address index used to turn references into edges.
+
+    Same layout as `build_cluster_index`, but the entries are node addresses.
+    Collapsed instances (see `aliases`) point at their aggregated node.
+
+    Args:
+        nodes (dict): Node address -> node (see `build_graph`).
+        aliases (dict): Collapsed instance address -> aggregated node address.
+
+    Returns:
+        dict: Map of address -> {instance keys (or None for the default): node address}.
+    """
+    index = {}
+    for addr, target in list(aliases.items()) + [(addr, addr) for addr in nodes]:
+        index.setdefault(addr, {})[None] = target
+        base = config_address(addr)
+        if base != addr:
+            group = index.setdefault(base, {})
+            group.setdefault(None, target)
+            group[instance_keys(addr)] = target
+    return index
+
+def _instance_targets(group):
+    """
+    Groups the instances of an expanded block by instance-key prefix.
+
+    Returns:
+        dict: Map: key prefix -> addresses of the instances sharing it (() maps to every instance).
+    """
+    by_prefix = {}
+    for keys, target in group.items():
+        if keys is None:
+            continue
+        for n in range(len(keys) + 1):
+            by_prefix.setdefault(keys[:n], []).append(target)
+    return by_prefix
+
+def _lookup_targets(index, candidate, keys, prefix_cache):
+    """
+    Looks up every node a reference candidate points at (see `_lookup_address`).
+
+    A reference without instance keys to a count/for_each block (e.g. a splat over
+    'google_compute_instance.web') depends on all of its instances. Only the instances
+    sharing the longest leading instance keys with the referencing resource are kept
+    (e.g. 'web[2]' -> 'sub[2]' for a 'count.index' lookup, or the instances of the same
+    module instance); without any in common, all of them.
+
+    Args:
+        index (dict): The node index (see `build_node_index`).
+        candidate (str): A candidate address (see `reference_prefixes`).
+        keys (tuple): Instance keys of the referencing resource.
+        prefix_cache (dict): Memo of `_instance_targets` per candidate, shared across lookups.
+
+    Returns:
+        list: Node addresses (empty when the candidate is not a node).
+    """
+    group = index.get(candidate)
+    if group is None:
+        # Keyed reference into an expanded module: a single instance
+        target = _lookup_address(index, candidate, keys)
+        return [target] if target is not None else []
+    if len(group) == 1:
+        return [group[None]]
+
+    by_prefix = prefix_cache.get(candidate)
+    if by_prefix is None:
+        by_prefix = prefix_cache[candidate] = _instance_targets(group)
+    for n in range(len(keys), 0, -1):
+        targets = by_prefix.get(keys[:n])
+        if targets is not None:
+            return targets
+    return by_prefix[()]
+
+def build_edges(resources, nodes, aliases, max_edges=None, reduce=False):
+    """
+    Builds the dependency edges between nodes from the references of their expressions.
+
+    Each reference is resolved with hash lookups in the reverse address index,
+    so the cost is linear in the total number of references (and edges). An edge
+    goes from the referencing resource to the referenced one (e.g. instance -> SQL).
+    A reference to a count/for_each block reaches all of its instances, or their
+    aggregated node (see `_lookup_targets`).
+    Multi-edges, self-loops and edges inside an aggregated node are dropped.
+
+    Args:
+        resources (list): The resources the nodes were built from.
+        nodes (dict): Node address -> node.
+        aliases (dict): Collapsed instance address -> aggregated node address.
+        max_edges (int, optional): Keep at most this many edges (in plan order). Defaults to None.
+        reduce (bool, optional): If True, applies a transitive reduction first, dropping
+            A -> C when A -> B -> ... -> C is also drawn. Defaults to False.
+
+    Returns:
+        tuple: (list of (source, target) node addresses, number of edges dropped).
+    """
+    index = build_node_index(nodes, aliases)
+    prefix_cache = {}
+    edges = {} # Ordered set of (source, target)
+    for res in resources:
+        source = aliases.get(res['address'], res['address'])
+        if source not in nodes:
+            continue
+        keys = instance_keys(res['address'])
+        for ref in iter_references(res.get('expressions', {})):
+            for candidate in reference_prefixes(ref):
+                targets = _lookup_targets(index, candidate, keys, prefix_cache)
+                if targets:
+                    for target in targets:
+                        if target != source:
+                            edges[(source, target)] = None
+                    break
+
+    edges = list(edges)
+    total = len(edges)
+    if reduce:
+        edges = transitive_reduction(edges)
+    if max_edges is not None and len(edges) > max_edges:
+        edges = edges[:max_edges]
+    return edges, total - len(edges)
+
+def transitive_reduction(edges):
+    """
+    Removes the edges implied by longer paths (A -> C when A -> B -> C exists).
+
+    Reachability is computed once per node, sinks first, as integer bitsets, so
+    the cost is about O(edges * nodes / 64) word operations. Nodes on a cycle (and
+    the nodes leading to one) keep all their edges.
+
+    Args:
+        edges (list): (source, target) pairs without duplicates.
+
+    Returns:
+        list: The remaining edges, in their original order.
+    """
+    successors = {}
+    predecessors = {}
+    for src, dst in edges:
+        successors.setdefault(src, []).append(dst)
+        predecessors.setdefault(dst, []).append(src)
+        successors.setdefault(dst, [])
+
+    bit = {addr: 1 << i for i, addr in enumerate(successors)}
+    reach = {} # Map: node -> bitset of the nodes reachable from it (itself excluded)
+    pending = {addr: len(succ) for addr, succ in successors.items()}
+    ready = [addr for addr, n in pending.items() if n == 0]
+    while ready:
+        addr = ready.pop()
+        mask = 0
+        for dst in successors[addr]:
+            mask |= reach[dst] | bit[dst]
+        reach[addr] = mask
+        for src in predecessors.get(addr, ()):
+            pending[src] -= 1
+            if pending[src] == 0:
+                ready.append(src)
+
+    # A -> B is redundant when B is reachable from another successor of A
+    redundant = set()
+    for src, succ in successors.items():
+        if src not in reach or len(succ) < 2:
+            continue
+        via = 0
+        for dst in succ:
+            via |= reach[dst]
+        for dst in succ:
+            if via & bit[dst]:
+                redundant.add((src, dst))
+    return [edge for edge in edges if edge not in redundant]
+
+# Change actions: label prefix and color (Terraform's own plan symbols)
+CHANGE_STYLES = {
+    "create": ("+", "#2E7D32"),
+    "update": ("~", "#E65100"),
+    "delete": ("-", "#C62828"),
+    "replace": ("-/+", "#6A1B9A"),
+    # Aggregated node whose instances do not all plan the same change
+    "mixed": ("±", "#1565C0"),
+}
+
+def change_action(actions):
+    """
+    Reduces the 'actions' of a resource change to a single action.
+
+    Args:
+        actions (list): Terraform change actions (e.g. ['delete', 'create']).
+
+    Returns:
+        str or None: 'create', 'update', 'delete', 'replace', or None when nothing changes
+            ('no-op', 'read' or no change recorded).
+    """
+    if not actions:
+        return None
+    if 'create' in actions and 'delete' in actions:
+        return "replace"
+    for action in ("create", "update", "delete"):
+        if action in actions:
+            return action
+    return None
+
+def change_label(label, change):
+    """Prefixes a label with the symbol of its change action (e.g. '+ web-server')."""
+    if change is None:
+        return label
+    return f"{CHANGE_STYLES[change][0]} {label}"
+
+def change_attrs(change, cluster=False):
+    """
+    Graphviz attributes highlighting a changed node (font color) or cluster (border and title).
+
+    Args:
+        change (str or None): The change action (see `change_action`).
+        cluster (bool, optional): If True, returns cluster attributes. Defaults to False.
+
+    Returns:
+        dict: The attributes (empty when nothing changes).
+    """
+    if change is None:
+        return {}
+    color = CHANGE_STYLES[change][1]
+    if cluster:
+        return {"pencolor": color, "fontcolor": color, "penwidth": "2"}
+    return {"fontcolor": color}
+
+def parent_module(module_addr):
+    """
+    Returns the address of the module that calls the given module.
+
+    Args:
+        module_addr (str): A module address (e.g. 'module.app.module.db').
+
+    Returns:
+        str or None: The parent module address, or None for a top-level module.
+    """
+    pos = module_addr.rfind('.module.')
+    return module_addr[:pos] if pos != -1 else None
+
+def module_label(module_addr):
+    """Builds the cluster label of a module (e.g. 'module.app.module.db[0]' -> 'Module: db[0]')."""
+    parent_addr = parent_module(module_addr)
+    name = module_addr[len(parent_addr) + len('.module.'):] if parent_addr else module_addr[len('module.'):]
+    return f"Module: {name}"
+
+# Labels to compute from which identical resource bodies are labeled once (see `get_resource_labels`)
+LABEL_CACHE_RESOURCES = 1000
+
+def build_graph(resources, simple=False, module_clusters=False, aggregate_threshold=None, diff=False, changed_only=False, edges=False, max_edges=None, reduce_edges=False, previous=None, resolved=None, layer_overrides=None, metrics=None):
+    """
+    Resolves a list of configuration resources into the intermediate graph model.
+
+    The model is built in a single linear pass over the resources and is shared
+    by every output backend (the diagrams renderer and the script emitter), so
+    none of them has to re-scan the plan.
+
+    Args:
+        resources (list): Configuration resources (with 'planned_values' injected).
+        simple (bool, optional): If True, uses simplified labels (names only). Defaults to False.
+        module_clusters (bool, optional): If True, each module becomes a Cluster holding
+            the resources (and VPCs) declared in it. Modules left without any content (e.g.
+            all their resources sit in a VPC of the root module) are not drawn. Defaults to False.
+        aggregate_threshold (int, optional): When set, count/for_each instances of the same
+            block that share a parent cluster are collapsed into a single node labelled
+            "×N" once there are at least this many of them. Defaults to None (never).
+        diff (bool, optional): If True, nodes and clusters carry the action of their planned
+            change ('create', 'update', 'delete', 'replace') and their labels its symbol. An
+            aggregated node is 'mixed' when its instances do not all plan the same change.
+            Defaults to False.
+        changed_only (bool, optional): If True (implies `diff`), keeps only the changed
+            resources, their enclosing clusters and their direct neighbours by reference
+            (see `focus_changes`). Defaults to False.
+        edges (bool, optional): If True, adds the dependency edges found in the references
+            (see `build_edges`). Defaults to False.
+        max_edges (int, optional): Maximum number of dependency edges. Defaults to None (no cap).
+        reduce_edges (bool, optional): If True, drops dependency edges implied by longer paths.
+            Defaults to False.
+        previous (dict, optional): Results of a previous run that are still valid, as selected
+            by `src.snapshot.reusable_entries`: {'labels': address -> label, 'parents': address ->
+            parent cluster}. Those are reused instead of being resolved again.
+        resolved (dict, optional): {'labels': {}, 'parents': {}}, filled with the per-resource
+            results of this run, to be persisted as a snapshot.
+        layer_overrides (dict, optional): Resource type -> layer, replacing the default
+            layer of those types (see `src.mapper.categorize_layer`).
+        metrics (dict, optional): Metrics record (see `src.metrics`) receiving the timings
+            of the cluster, node and layer steps.
+
+    Returns:
+        dict: The graph model with the following keys:
+            - 'clusters': address -> Cluster record (see `src.model`)
+            - 'nodes': address -> Node record (see `src.model`)
+            - 'roots': top-level cluster addresses, in plan order
+            - 'children': cluster address -> child cluster addresses
+            - 'nodes_by_parent': cluster address (or None for global) -> node addresses
+            - 'layers': layer name -> node addresses, in render order
+            - 'aliases': collapsed instance address -> address of the aggregated node
+            - 'edges': (source, target) dependency edges between nodes (empty unless `edges`)
+    """
+    diff = diff or changed_only
+    clusters = {}
+    cluster_expressions = {}
+
+    def resource_change(res):
+        return change_action(res.get('change_actions')) if diff else None
+
+    previous_labels = previous['labels'] if previous else {}
+    previous_parents = previous['parents'] if previous else {}
+    resolved_labels = resolved['labels'] if resolved is not None else None
+    resolved_parents = resolved['parents'] if resolved is not None else None
+
+    def resource_labels(batch):
+        # Labels only depend on the resource itself: reuse the previous one when unchanged
+        todo = [res for res in batch if res['address'] not in previous_labels] if previous_labels else batch
+        # Built-in labelers are cheaper than the cache keys: only cache labelers registered at runtime
+        runtime_types = RESOURCE_LABELERS.keys() - LABEL_VALUES.keys()
+        cache = not simple and len(todo) >= LABEL_CACHE_RESOURCES and bool(runtime_types) and any(res['type'] in runtime_types for res in todo)
+        labels = get_resource_labels(todo, simple=simple, cache=cache)
+        if previous_labels:
+            labels = dict(zip((res['address'] for res in todo), labels))
+            labels = [previous_labels[res['address']] if res['address'] in previous_labels else labels[res['address']] for res in batch]
+        if resolved_labels is not None:
+            resolved_labels.update(zip((res['address'] for res in batch), labels))
+        return labels
+
+    with stage(metrics, "clusters"):
+        # Step 0: Module Clusters (optional), created before their contents so they render first
+        if module_clusters:
+            for res in resources:
+                # Walk up until we reach a module we already know, then add the new ones top-down
+                chain = []
+                module_addr = res.get('module_address')
+                while module_addr and module_addr not in clusters:
+                    chain.append(module_addr)
+                    module_addr = parent_module(module_addr)
+                for module_addr in reversed(chain):
+                    clusters[module_addr] = Cluster(module_addr, 'module', module_label(module_addr), parent_addr=parent_module(module_addr), module=parent_module(module_addr))
+
+        def module_cluster(res):
+            return res.get('module_address') if module_clusters else None
+
+        # Step 1: Identify Clusters (VPCs and Subnets)
+        networks = [res for res in resources if res['type'] in ('google_compute_network', 'google_compute_subnetwork')]
+        for res, label in zip(networks, resource_labels(networks)):
+            res_type = res['type']
+            change = resource_change(res)
+            clusters[res['address']] = Cluster(
+                res['address'],
+                'vpc' if res_type == 'google_compute_network' else 'subnet',
+                change_label(label, change),
+                parent_addr=module_cluster(res),
+                change=change,
+                module=res.get('module_address'),
+            )
+            if res_type == 'google_compute_subnetwork':
+                cluster_expressions[res['address']] = res.get('expressions', {})
+
+        cluster_index = build_cluster_index(clusters)
+
+        # Subnets are nested inside the VPC they reference
+        for sub_addr, expressions in cluster_expressions.items():
+            parent_addr = find_parent_cluster(expressions, cluster_index, instance_keys(sub_addr))
+            if parent_addr is not None and clusters[parent_addr].type == 'vpc':
+                clusters[sub_addr].parent_addr = parent_addr
+
+        roots = []
+        children = {addr: [] for addr in clusters}
+        for addr, cluster in clusters.items():
+            if cluster.parent_addr is None:
+                roots.append(addr)
+            else:
+                children[cluster.parent_addr].append(addr)
+
+    with stage(metrics, "nodes"):
+        # Step 2: Identify Nodes (Resources) and Assign to Clusters
+        placed = [] # List of (resource, diagram class, parent address)
+        group_sizes = {} # Map: (config address, parent address) -> number of instances
+        group_changes = {} # Map: (config address, parent address) -> change shared by the instances, or "mixed"
+        for res in resources:
+            res_type = res['type']
+            if res_type in ['google_compute_network', 'google_compute_subnetwork']:
+                continue
+
+            # Get the corresponding Diagrams class (visual icon)
+            diagram_class = get_diagram_node(res_type)
+            if not diagram_class:
+                continue
+
+            if res['address'] in previous_parents:
+                parent_addr = previous_parents[res['address']]
+            else:
+                parent_addr = find_parent_cluster(res.get('expressions', {}), cluster_index, instance_keys(res['address']))
+            if resolved_parents is not None:
+                resolved_parents[res['address']] = parent_addr
+            if parent_addr is None:
+                parent_addr = module_cluster(res)
+            placed.append((res, diagram_class, parent_addr))
+
+            if aggregate_threshold and 'config_address' in res:
+                group = (res['config_address'], parent_addr)
+                group_sizes[group] = group_sizes.get(group, 0) + 1
+                change = resource_change(res)
+                # One changed instance is enough for the aggregated node to show a change
+                group_changes[group] = change if group_changes.get(group, change) == change else "mixed"
+
+        drawn = [] # List of (resource, diagram class, parent address, node address, count, change)
+        aliases = {}
+        aggregated = {} # Map: (config address, parent address) -> aggregated node address
+        taken = set()
+        for res, diagram_class, parent_addr in placed:
+            address = res['address']
+            count = 1
+            change = resource_change(res)
+            if aggregate_threshold and 'config_address' in res:
+                group = (res['config_address'], parent_addr)
+                if group_sizes[group] >= aggregate_threshold:
+                    if group in aggregated:
+                        # Already represented by the aggregated node
+                        aliases[address] = aggregated[group]
+                        continue
+                    count = group_sizes[group]
+                    # The aggregated node takes the block address, unless another parent already did
+                    aggregated[group] = res['config_address'] if res['config_address'] not in taken else address
+                    aliases[address] = aggregated[group]
+                    address = aggregated[group]
+                    change = group_changes[group]
+            taken.add(address)
+            drawn.append((res, diagram_class, parent_addr, address, count, change))
+
+        # Only the drawn resources are labeled (one per aggregated node), in a single batch
+        nodes = {}
+        nodes_by_parent = {addr: [] for addr in clusters}
+        nodes_by_parent[None] = []
+        labels = resource_labels([res for res, *_ in drawn])
+        for (res, diagram_class, parent_addr, address, count, change), label in zip(drawn, labels):
+            label = change_label(label, change)
+            if count > 1:
+                label += f"\n×{count}"
+            nodes[address] = Node(
+                address,
+                res['type'],
+                diagram_class,
+                label,
+                parent_addr=parent_addr,
+                layer=categorize_layer(res['type'], layer_overrides),
+                count=count,
+                change=change,
+                module=res.get('module_address'),
+            )
+            nodes_by_parent[parent_addr].append(address)
+
+    with stage(metrics, "layers"):
+        # Step 3: Assign nodes to layers in render order (clusters depth-first, then global nodes).
+        # The first node of each layer anchors the invisible layout edges.
+        layers = {layer: [] for layer in LAYER_ORDER}
+        stack = list(reversed(roots))
+        while stack:
+            cluster_addr = stack.pop()
+            for node_addr in nodes_by_parent[cluster_addr]:
+                layers[nodes[node_addr].layer].append(node_addr)
+            stack.extend(reversed(children[cluster_addr]))
+        for node_addr in nodes_by_parent[None]:
+            layers[nodes[node_addr].layer].append(node_addr)
+
+    dependency_edges = []
+    if edges:
+        with stage(metrics, "edges"):
+            dependency_edges, dropped = build_edges(resources, nodes, aliases, max_edges=max_edges, reduce=reduce_edges)
+        count_metric(metrics, "edges", len(dependency_edges))
+        count_metric(metrics, "edges_dropped", dropped)
+
+    graph = {
+        'clusters': clusters,
+        'nodes': nodes,
+        'roots': roots,
+        'children': children,
+        'nodes_by_parent': nodes_by_parent,
+        'layers': layers,
+        'aliases': aliases,
+        'edges': dependency_edges,
+    }
+
+    if module_clusters and any(cluster.type == 'module' and not nodes_by_parent[addr] for addr, cluster in clusters.items()):
+        # A module whose resources all sit in VPCs or subnets declared elsewhere would be an empty box
+        graph = restrict_graph(graph, set(nodes) | {addr for addr, cluster in clusters.items() if cluster.type != 'module'})
+
+    if changed_only:
+        with stage(metrics, "focus"):
+            graph = focus_changes(graph, resources)
+    return graph
+
+def focus_changes(graph, resources):
+    """
+    Reduces the graph model to the changed resources and their surroundings.
+
+    Kept are: every changed node or cluster, the nodes and clusters that reference
+    a changed one or are referenced by it (one hop), and the clusters enclosing
+    any of them. References are matched with a hash index of node and cluster
+    addresses, in one pass over the resources.
+
+    Args:
+        graph (dict): A graph model built with `diff=True`.
+        resources (list): The resources the graph was built from.
+
+    Returns:
+        dict: A new graph model with the same keys, restricted to the focused elements.
+    """
+    nodes = graph['nodes']
+    clusters = graph['clusters']
+    aliases = graph['aliases']
+
+    # Index: address (and block address of expanded instances) -> graph elements
+    index = {}
+    for addr in list(nodes) + list(clusters):
+        index.setdefault(addr, []).append(addr)
+        base = config_address(addr)
+        if base != addr:
+            index.setdefault(base, []).append(addr)
+    for addr, target in aliases.items():
+        index.setdefault(addr, []).append(target)
+
+    def changed(addr):
+        element = nodes.get(addr) or clusters.get(addr)
+        return element is not None and element.change is not None
+
+    keep = {addr for addr in list(nodes) + list(clusters) if changed(addr)}
+    neighbours = set()
+    for res in resources:
+        source = aliases.get(res['address'], res['address'])
+        if source not in nodes and source not in clusters:
+            continue
+        targets = set()
+        for ref in iter_references(res.get('expressions', {})):
+            for candidate in reference_prefixes(ref):
+                targets.update(index.get(candidate, ()))
+        targets.discard(source)
+        if source in keep:
+            neighbours.update(targets)
+        elif any(target in keep for target in targets):
+            neighbours.add(source)
+    keep |= neighbours
+
+    return restrict_graph(graph, keep)
+
+def restrict_graph(graph, keep):
+    """
+    Restricts the graph model to a set of nodes and clusters, plus the clusters enclosing them.
+
+    Args:
+        graph (dict): A graph model (see `build_graph`).
+        keep (set): Addresses of the nodes and clusters to keep.
+
+    Returns:
+        dict: A new graph model with the same keys. Render order is preserved.
+    """
+    nodes = graph['nodes']
+    clusters = graph['clusters']
+    keep = set(keep)
+
+    # Enclosing clusters of everything kept
+    for addr in list(keep):
+        element = nodes.get(addr) or clusters.get(addr)
+        if element is None:
+            keep.discard(addr)
+            continue
+        parent_addr = element.parent_addr
+        while parent_addr is not None and parent_addr not in keep:
+            keep.add(parent_addr)
+            parent_addr = clusters[parent_addr].parent_addr
+
+    kept_clusters = {addr: cluster for addr, cluster in clusters.items() if addr in keep}
+    kept_nodes = {addr: node for addr, node in nodes.items() if addr in keep}
+    return {
+        'clusters': kept_clusters,
+        'nodes': kept_nodes,
+        'roots': [addr for addr in graph['roots'] if addr in keep],
+        'children': {addr: [child for child in graph['children'][addr] if child in keep] for addr in kept_clusters},
+        'nodes_by_parent': {parent: [addr for addr in addrs if addr in keep] for parent, addrs in graph['nodes_by_parent'].items() if parent is None or parent in keep},
+        'layers': {layer: [addr for addr in addrs if addr in keep] for layer, addrs in graph['layers'].items()},
+        'aliases': {addr: target for addr, target in graph['aliases'].items() if target in keep},
+        'edges': [(src, dst) for src, dst in graph['edges'] if src in keep and dst in keep],
+    }
+
+# Style of the dependency edges; they do not constrain ranks so the layer columns stay in place
+DEPENDENCY_EDGE_ATTRS = {"color": "#7B8894", "constraint": "false"}
+
+def layer_edges(layers):
+    """
+    Picks the pairs of nodes joined by invisible edges to force a Left-to-Right layout.
+
+    The first item of each adjacent layer is connected:
+    Security -> Network -> App -> Data -> Storage, with fallbacks when a layer is empty.
+
+    Args:
+        layers (dict): Layer name -> node addresses (see `build_graph`).
+
+    Returns:
+        list: (source_address, target_address) tuples, in drawing order.
+    """
+    edges = []
+    if layers["security"] and layers["network"]:
+        edges.append((layers["security"][0], layers["network"][0]))
+
+    # If network is empty, try connecting security to app
+    if layers["security"] and not layers["network"] and layers["app"]:
+        edges.append((layers["security"][0], layers["app"][0]))
+
+    if layers["network"] and layers["app"]:
+        edges.append((layers["network"][0], layers["app"][0]))
+
+    if layers["app"] and layers["data"]:
+        edges.append((layers["app"][0], layers["data"][0]))
+
+    if layers["data"] and layers["storage"]:
+        edges.append((layers["data"][0], layers["storage"][0]))
+
+    # Fallback edges if some layers are missing to ensure continuity
+    # e.g. App -> Storage if Data is missing
+    if layers["app"] and not layers["data"] and layers["storage"]:
+        edges.append((layers["app"][0], layers["storage"][0]))
+
+    return edges
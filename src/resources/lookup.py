@@ -12,6 +12,7 @@ or regions) from the resource's JSON representation.
 
 from src.resources.gcp import compute, database, storage, network
 from src.utils import get_resource_name
+import marshal
 
 # Registry mapping resource types to their custom label generator functions
 RESOURCE_LABELERS = {
@@ -23,6 +24,18 @@ RESOURCE_LABELERS = {
     "google_compute_subnetwork": network.get_subnetwork_label,
 }
 
+# Planned values read by each built-in labeler besides the name (see `body_key`). Their labels
+# all follow one pattern: a first line ending with the resource name ("web-1", "FW: web-1"),
+# then details that do not depend on the name.
+LABEL_VALUES = {
+    "google_compute_instance": ("machine_type", "zone"),
+    "google_sql_database_instance": ("database_version",),
+    "google_storage_bucket": ("location", "uniform_bucket_level_access"),
+    "google_compute_firewall": (),
+    "google_compute_network": (),
+    "google_compute_subnetwork": ("ip_cidr_range", "region"),
+}
+
 def get_resource_label(resource, simple=False):
     """
     Generates a descriptive label for a resource.
@@ -47,4 +60,100 @@ def get_resource_label(resource, simple=False):
         return RESOURCE_LABELERS[res_type](resource)
     
     # Fallback: Just return the resource name
-    return get_resource_name(resource)
\ No newline at end of file
+    return get_resource_name(resource)
+
+def body_key(resource, simple=False):
+    """
+    Content key of everything a labeler reads, apart from the resource name.
+
+    For the labelers of LABEL_VALUES (and for `get_resource_name`), the key holds
+    the type, the expressions and the planned values listed there: the name is
+    left out, as are the address and the planned values that differ between
+    for_each/count instances (IDs, self links, ...), so those instances share it.
+    Other labelers are keyed on the name, the planned values and the expressions.
+
+    Args:
+        resource (dict): The resource dictionary.
+        simple (bool, optional): If True, keys what `get_resource_name` reads. Defaults to False.
+
+    Returns:
+        bytes: The key.
+    """
+    res_type = resource['type']
+    if simple or res_type not in RESOURCE_LABELERS:
+        # The label is the name
+        return marshal.dumps((res_type,), 2)
+    # marshal format 2 has no back-references, so equal bodies always serialize identically
+    if res_type in LABEL_VALUES:
+        values = resource.get('planned_values') or {}
+        values = {key: values[key] for key in LABEL_VALUES[res_type] if key in values}
+        return marshal.dumps((res_type, values, resource.get('expressions')), 2)
+    return marshal.dumps((res_type, resource.get('name'), resource.get('planned_values'), resource.get('expressions')), 2)
+
+def _rename_label(label, name, new_name):
+    """Label of a resource named `new_name` with the same body as the one labeled `label` (None: unknown)."""
+    if new_name == name:
+        return label
+    first, sep, rest = label.partition("\n")
+    if isinstance(name, str) and isinstance(new_name, str) and name and first.endswith(name):
+        return first[:len(first) - len(name)] + new_name + sep + rest
+    return None
+
+def _label_all(resources, simple=False):
+    """Labels a list of resources, looking up each labeler in a single dictionary probe."""
+    labelers = {} if simple else RESOURCE_LABELERS
+    return [labelers.get(resource['type'], get_resource_name)(resource) for resource in resources]
+
+def get_resource_labels(resources, simple=False, cache=False, workers=None, processes=False):
+    """
+    Generates the labels of many resources at once.
+
+    The result is the same as calling `get_resource_label` on each resource. On top of it:
+    - `cache` labels resources with identical bodies (see `body_key`) only once: the
+      instances of a for_each/count block then usually take the label of the first one,
+      with their own name. This pays off with expensive custom labelers or large fan-outs.
+    - `workers` labels the (distinct) resources in chunks across a thread pool, or a
+      process pool with `processes`. Processes only help when labelers are CPU-bound and
+      costly enough to outweigh sending the resources to the workers; labelers registered
+      at runtime must then be registered in the workers too (e.g. at import time).
+
+    Args:
+        resources (iterable): Resource dictionaries.
+        simple (bool, optional): If True, returns only the resource names. Defaults to False.
+        cache (bool, optional): If True, labels identical bodies once. Defaults to False.
+        workers (int, optional): Size of the pool. Defaults to None (label in the calling thread).
+        processes (bool, optional): If True, the pool runs processes instead of threads.
+
+    Returns:
+        list: The labels, in the order of `resources`.
+    """
+    resources = list(resources)
+    todo = resources
+    if cache:
+        keys = [body_key(resource, simple) for resource in resources]
+        unique = {}
+        for key, resource in zip(keys, resources):
+            unique.setdefault(key, resource)
+        todo = list(unique.values())
+
+    if workers and len(todo) > 1:
+        # A few chunks per worker keeps the pool busy without paying a round-trip per resource
+        size = -(-len(todo) // (workers * 4))
+        chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+        # Imported here: concurrent.futures (and multiprocessing) are not worth loading for serial labeling
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool(max_workers=workers) as executor:
+            labels = [label for part in executor.map(_label_all, chunks, [simple] * len(chunks)) for label in part]
+    else:
+        labels = _label_all(todo, simple)
+
+    if cache:
+        by_key = {key: (get_resource_name(resource), label) for (key, resource), label in zip(unique.items(), labels)}
+        result = []
+        for key, resource in zip(keys, resources):
+            name, label = by_key[key]
+            label = _rename_label(label, name, get_resource_name(resource))
+            result.append(label if label is not None else get_resource_label(resource, simple))
+        return result
+    return labels
@@ -0,0 +1,102 @@
+"""
+Python Script Emitter.
+
+This module writes the resolved graph model (see `src.resolver.build_graph`) out as
+a standalone Python script using the `diagrams` library. The script reproduces the
+rendered diagram and can be edited by hand for manual tweaks.
+"""
+
+from src.resolver import layer_edges, change_attrs, DEPENDENCY_EDGE_ATTRS
+import json
+import re
+import os
+
+def sanitize_var_name(address):
+    """Converts a resource address into a valid Python variable name."""
+    clean = re.sub(r'[^a-zA-Z0-9_]', '_', address)
+    if clean[0].isdigit(): clean = "_" + clean
+    return clean
+
+def generate_script(graph, output_filename, outformat="png", graph_attr=None):
+    """
+    Generates the Python code that reproduces the diagram.
+
+    Args:
+        graph (dict): The graph model produced by `build_graph`.
+        output_filename (str): Base filename of the diagram (no extension).
+        outformat (str or list, optional): Output image format(s) used by the script. Defaults to "png".
+        graph_attr (dict, optional): Graphviz global attributes.
+
+    Returns:
+        str: The source code of the script.
+    """
+    clusters = graph['clusters']
+    nodes = graph['nodes']
+    lines = []
+
+    # Collect imports dynamically based on used classes
+    imports = set()
+    for node in nodes.values():
+        cls = node.diagram_class
+        imports.add((cls.__module__, cls.__name__))
+
+    lines.append("from diagrams import Diagram, Cluster, Edge")
+    for module, cls_name in sorted(imports):
+        lines.append(f"from {module} import {cls_name}")
+    lines.append("")
+
+    lines.append(f"graph_attr = {json.dumps(graph_attr or {}, indent=4)}")
+    lines.append("")
+
+    script_out_name = os.path.basename(output_filename)
+    # diagrams accepts a list of formats and renders each of them
+    outformat_arg = json.dumps(outformat)
+
+    lines.append(f'with Diagram("Terraform Infrastructure", show=False, filename="{script_out_name}", outformat={outformat_arg}, graph_attr=graph_attr, direction="LR"):')
+
+    def write_nodes(parent_addr, indent):
+        for node_addr in graph['nodes_by_parent'][parent_addr]:
+            node_data = nodes[node_addr]
+            cls_name = node_data.diagram_class.__name__
+            attrs = "".join(f", {key}={value!r}" for key, value in change_attrs(node_data.change).items())
+            lines.append(f'{indent}{sanitize_var_name(node_addr)} = {cls_name}({repr(node_data.label)}{attrs})')
+
+    # Recursive script writer for clusters
+    def write_cluster(cluster_addr, indent_level):
+        indent = "    " * indent_level
+        attrs = change_attrs(clusters[cluster_addr].change, cluster=True)
+        graph_attr_arg = f", graph_attr={attrs!r}" if attrs else ""
+        lines.append(f'{indent}with Cluster({repr(clusters[cluster_addr].label)}{graph_attr_arg}):')
+
+        # Nodes in cluster
+        write_nodes(cluster_addr, indent + "    ")
+
+        # Child Clusters (Subnets in VPC)
+        for child_addr in graph['children'][cluster_addr]:
+            write_cluster(child_addr, indent_level + 1)
+
+        # Empty cluster (e.g. a subnet without resources): a `with` block needs a body
+        if not graph['nodes_by_parent'][cluster_addr] and not graph['children'][cluster_addr]:
+            lines.append(f'{indent}    pass')
+
+    # Script for Top Level clusters
+    for cluster_addr in graph['roots']:
+        write_cluster(cluster_addr, 1)
+
+    # Script for Global nodes
+    write_nodes(None, "    ")
+
+    # Add invisible edges logic to script
+    lines.append("")
+    lines.append("    # Invisible Edges for Layout")
+    for src_addr, dst_addr in layer_edges(graph['layers']):
+        lines.append(f'    {sanitize_var_name(src_addr)} >> Edge(style="invis") >> {sanitize_var_name(dst_addr)}')
+
+    if graph.get('edges'):
+        edge_args = ", ".join(f"{key}={value!r}" for key, value in DEPENDENCY_EDGE_ATTRS.items())
+        lines.append("")
+        lines.append("    # Dependency Edges")
+        for src_addr, dst_addr in graph['edges']:
+            lines.append(f'    {sanitize_var_name(src_addr)} >> Edge({edge_args}) >> {sanitize_var_name(dst_addr)}')
+
+    return "\n".join(lines)
@@ -0,0 +1,309 @@
+"""
+Render Server.
+
+A long-running HTTP service that renders uploaded plans, so callers such as a
+PR bot do not pay the interpreter start-up, the `diagrams` imports and the
+mapper warm-up on every diagram.
+
+- `POST /render?format=png&backend=dot&...` with the plan JSON as the request
+  body returns the rendered file. Query parameters mirror the CLI flags (see
+  RENDER_PARAMS); boolean flags take 1/0 or true/false.
+- `GET /health` returns the queue and pool statistics as JSON.
+
+Requests are queued (at most `max_queue`; a full queue answers 503) and
+rendered by a bounded pool of worker processes, warmed up once at start. A
+request for a plan and options identical to one already queued or rendering
+waits for that render instead of starting another one. The server listens on
+a TCP address or a Unix socket and closes the connection after each response.
+"""
+
+from src.batch import init_worker
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import signal
+import tempfile
+
+# Content types of the output formats a request may ask for
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "svg": "image/svg+xml",
+    "pdf": "application/pdf",
+    "dot": "text/vnd.graphviz",
+    "txt": "text/plain; charset=utf-8",
+}
+
+# Query parameters of POST /render: name -> (create_diagram keyword, type)
+RENDER_PARAMS = {
+    "backend": ("backend", str),
+    "simple": ("simple", bool),
+    "module-clusters": ("module_clusters", bool),
+    "aggregate": ("aggregate_threshold", int),
+    "edges": ("edges", bool),
+    "reduce-edges": ("reduce_edges", bool),
+    "diff": ("diff", bool),
+    "changed-only": ("changed_only", bool),
+    "render-timeout": ("render_timeout", float),
+}
+
+# Largest accepted plan upload, in bytes
+MAX_BODY = 512 * 1024 * 1024
+
+class RequestError(Exception):
+    """A request the server rejects, with the HTTP status to answer."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def parse_render_query(query):
+    """
+    Validates the query string of POST /render.
+
+    Args:
+        query (str): The raw query string (e.g. 'format=svg&simple=1').
+
+    Returns:
+        tuple: (output format, create_diagram keyword arguments)
+
+    Raises:
+        RequestError: On an unknown parameter or an invalid value.
+    """
+    params = {name: values[-1] for name, values in parse_qs(query, keep_blank_values=True).items()}
+    outformat = params.pop("format", "png").lower()
+    if outformat not in CONTENT_TYPES or outformat == "txt":
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Unsupported format '{outformat}'")
+
+    options = {}
+    for name, value in params.items():
+        if name not in RENDER_PARAMS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Unknown parameter '{name}'")
+        keyword, kind = RENDER_PARAMS[name]
+        try:
+            if kind is bool:
+                options[keyword] = value.lower() in ("", "1", "true", "yes")
+            else:
+                options[keyword] = kind(value)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid value for '{name}': {value!r}")
+    if options.get('backend', "diagrams") not in ("diagrams", "dot"):
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Unknown backend '{options['backend']}'")
+    return outformat, options
+
+def render_upload(plan_bytes, outformat, options):
+    """
+    Worker: renders an uploaded plan in a scratch directory.
+
+    Returns:
+        tuple: (file extension, file contents). The extension differs from the requested
+            format when the render degraded to DOT source (see `render_with_fallback`).
+    """
+    from src.generator import create_diagram
+    from src.plancache import DEFAULT_PLAN_CACHE_DIR, plan_cache_forget
+
+    with tempfile.TemporaryDirectory(prefix="terraviz-") as tmp_dir:
+        plan_path = os.path.join(tmp_dir, "tfplan.json")
+        with open(plan_path, "wb") as f:
+            f.write(plan_bytes)
+        try:
+            # Keep worker output out of the server log
+            with contextlib.redirect_stdout(io.StringIO()):
+                paths = create_diagram(plan_path, output_filename=os.path.join(tmp_dir, "diagram"), outformat=outformat, **options)
+        finally:
+            # The parsed plan stays cached for identical uploads, but this temporary file is never read again
+            plan_cache_forget(plan_path, options.get('plan_cache_dir', DEFAULT_PLAN_CACHE_DIR))
+        with open(paths[0], "rb") as f:
+            return os.path.splitext(paths[0])[1][1:], f.read()
+
+class RenderServer:
+    """Queue, in-flight table and process pool behind the HTTP front-end."""
+
+    def __init__(self, workers=None, max_queue=64):
+        """
+        Args:
+            workers (int, optional): Number of worker processes. Defaults to the CPU count.
+            max_queue (int, optional): Maximum number of renders waiting for a worker. Defaults to 64.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.queue = None
+        self.in_flight = {} # Map: request key -> future of the render
+        self.stats = {'requests': 0, 'deduplicated': 0, 'rendered': 0, 'failed': 0, 'rejected': 0}
+        self.executor = None
+
+    async def _dispatch(self):
+        """Feeds queued renders to the pool, one at a time per dispatcher."""
+        loop = asyncio.get_running_loop()
+        while True:
+            key, plan_bytes, outformat, options, future = await self.queue.get()
+            try:
+                result = await loop.run_in_executor(self.executor, render_upload, plan_bytes, outformat, options)
+                self.stats['rendered'] += 1
+                future.set_result(result)
+            except Exception as e:
+                self.stats['failed'] += 1
+                future.set_exception(e)
+            finally:
+                del self.in_flight[key]
+                self.queue.task_done()
+
+    async def render(self, plan_bytes, outformat, options):
+        """
+        Renders a plan, sharing the work with an identical request in flight.
+
+        Returns:
+            tuple: (file extension, file contents)
+        """
+        self.stats['requests'] += 1
+        key = hashlib.sha256(plan_bytes + json.dumps([outformat, sorted(options.items())]).encode("utf-8")).hexdigest()
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.stats['deduplicated'] += 1
+        else:
+            if self.queue.full():
+                self.stats['rejected'] += 1
+                raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Render queue is full, retry later")
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+            self.queue.put_nowait((key, plan_bytes, outformat, options, future))
+        # Shielded: a client hanging up must not cancel a render others are waiting for
+        return await asyncio.shield(future)
+
+    def health(self):
+        """Statistics of the server."""
+        return dict(self.stats, queued=self.queue.qsize(), in_flight=len(self.in_flight), workers=self.workers)
+
+    async def _read_request(self, reader):
+        """Reads one HTTP request. Returns (method, target, body), or None on a closed connection."""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid Content-Length: {headers['content-length']!r}")
+        if length > MAX_BODY:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Plan too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, body
+
+    async def _respond(self, method, target, body):
+        """Routes a request. Returns (status, content type, body)."""
+        url = urlsplit(target)
+        if url.path == "/health" and method == "GET":
+            return HTTPStatus.OK, "application/json", json.dumps(self.health()).encode("utf-8")
+        if url.path == "/render" and method == "POST":
+            if not body:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Expected the plan JSON as the request body")
+            outformat, options = parse_render_query(url.query)
+            try:
+                extension, data = await self.render(body, outformat, options)
+            except (ValueError, KeyError) as e:
+                # Not JSON, or not a Terraform plan
+                raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, f"Cannot render plan: {type(e).__name__}: {e}")
+            return HTTPStatus.OK, CONTENT_TYPES.get(extension, "application/octet-stream"), data
+        raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} {url.path}")
+
+    async def handle(self, reader, writer):
+        """Connection handler: one request, one response."""
+        try:
+            try:
+                request = await self._read_request(reader)
+                if request is None:
+                    return
+                status, content_type, payload = await self._respond(*request)
+            except RequestError as e:
+                status, content_type, payload = e.status, "application/json", json.dumps({'error': str(e)}).encode("utf-8")
+            except Exception as e:
+                status, content_type, payload = HTTPStatus.INTERNAL_SERVER_ERROR, "application/json", json.dumps({'error': f"{type(e).__name__}: {e}"}).encode("utf-8")
+
+            head = f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n"
+            writer.write(head.encode("latin-1") + payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass # Client went away
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080, socket_path=None):
+        """
+        Starts the pool and serves until cancelled.
+
+        Args:
+            host (str, optional): TCP address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): TCP port. Defaults to 8080.
+            socket_path (str, optional): Listen on this Unix socket instead of TCP.
+        """
+        loop = asyncio.get_running_loop()
+        # Shut down cleanly (pool, socket file) on SIGTERM/SIGINT
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            with contextlib.suppress(NotImplementedError):  # Not supported on Windows
+                loop.add_signal_handler(signum, asyncio.current_task().cancel)
+
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        # Start every worker (and its warm-up) now rather than on the first request
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)))
+        dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            address = socket_path
+        else:
+            server = await asyncio.start_server(self.handle, host=host, port=port)
+            address = f"http://{host}:{port}"
+        print(f"TerraViz render server listening on {address} ({self.workers} workers)", flush=True)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            # Dispatchers hand the pool one render per worker, so nothing waits in it to be cancelled
+            # (and `cancel_futures` needs Python 3.9): let the renders in progress finish
+            self.executor.shutdown()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+def run_server(address, workers=None, max_queue=64):
+    """
+    Runs the render server until interrupted.
+
+    Args:
+        address (str): 'HOST:PORT', ':PORT', or a Unix socket path (anything containing '/').
+        workers (int, optional): Number of worker processes. Defaults to the CPU count.
+        max_queue (int, optional): Maximum number of queued renders. Defaults to 64.
+    """
+    server = RenderServer(workers=workers, max_queue=max_queue)
+    if "/" in address:
+        serve = server.serve(socket_path=address)
+    else:
+        host, _, port = address.rpartition(":")
+        serve = server.serve(host=host or "127.0.0.1", port=int(port))
+    try:
+        asyncio.run(serve)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("TerraViz render server stopped")
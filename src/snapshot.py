@@ -0,0 +1,166 @@
+"""
+Graph Snapshots for Incremental Rendering.
+
+Consecutive plans of a workspace usually differ in a handful of resources, yet
+every run resolves all of them again: labels, and the parent cluster found by
+scanning each resource's references. A snapshot persists those per-resource
+results, keyed by address, together with a fingerprint of the resource they were
+computed from.
+
+On the next run, a resource whose fingerprint is unchanged reuses its label.
+Its parent cluster is reused as well when the set of clusters (the addresses and
+types the reference index is built from) is also unchanged. Only new or modified
+resources go through the resolver again.
+
+A snapshot records the plan file it was made from. A snapshot found at the
+`--snapshot` path is only reused by the same plan, so one file shared by two
+workspaces never hands one plan's labels and clusters to the other.
+"""
+
+from src.loader import load_plan, extract_resources
+from src.resolver import build_graph
+import hashlib
+import json
+import marshal
+import os
+import tempfile
+
+# Bump when labels or parent resolution change, so older snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+CLUSTER_TYPES = ('google_compute_network', 'google_compute_subnetwork')
+
+def resource_fingerprint(resource):
+    """
+    Hashes everything the label and the parent of a resource are derived from.
+
+    Args:
+        resource (dict): An extracted resource (see `extract_resources`).
+
+    Returns:
+        str: A short hex digest.
+    """
+    # marshal format 2 has no back-references, so equal resources always serialize identically
+    return hashlib.blake2b(marshal.dumps(resource, 2), digest_size=16).hexdigest()
+
+def cluster_signature(resources):
+    """Hashes the addresses and types of the clusters (all the cluster index depends on)."""
+    payload = json.dumps([[res['address'], res['type']] for res in resources if res['type'] in CLUSTER_TYPES], separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def fingerprint_resources(resources):
+    """
+    Fingerprints every resource of a plan.
+
+    Returns:
+        tuple: (address -> fingerprint, cluster signature)
+    """
+    return {res['address']: resource_fingerprint(res) for res in resources}, cluster_signature(resources)
+
+def make_snapshot(resolved, fingerprints, signature, simple=False, source=None):
+    """
+    Builds the snapshot of a resolved plan.
+
+    Args:
+        resolved (dict): Per-resource results filled in by `build_graph(resolved=...)`:
+            {'labels': address -> label, 'parents': address -> parent cluster}.
+        fingerprints (dict): Address -> fingerprint (see `fingerprint_resources`).
+        signature (str): Cluster signature of the plan.
+        simple (bool, optional): Whether labels were simplified. Defaults to False.
+        source (str, optional): Absolute path of the plan file. Defaults to None.
+
+    Returns:
+        dict: The snapshot (JSON-serializable).
+    """
+    labels = resolved['labels']
+    parents = resolved['parents']
+    return {
+        'snapshot_version': SNAPSHOT_VERSION,
+        'simple': simple,
+        'source': source,
+        'clusters': signature,
+        'resources': {addr: [fingerprint, labels.get(addr), parents.get(addr)] for addr, fingerprint in fingerprints.items()},
+    }
+
+def reusable_entries(snapshot, fingerprints, signature, simple=False, source=None):
+    """
+    Selects the snapshot entries that are still valid for the current plan.
+
+    Args:
+        snapshot (dict): A previous snapshot.
+        fingerprints (dict): Address -> fingerprint of the current resources.
+        signature (str): Cluster signature of the current plan.
+        simple (bool, optional): Whether labels are simplified. Defaults to False.
+        source (str, optional): When given, a snapshot made from another plan file is ignored.
+
+    Returns:
+        dict: {'labels': address -> label, 'parents': address -> parent cluster} for
+            `build_graph(previous=...)`. 'parents' is empty when the cluster set changed.
+    """
+    if snapshot.get('snapshot_version') != SNAPSHOT_VERSION or snapshot.get('simple') != simple:
+        return {'labels': {}, 'parents': {}}
+    if source is not None and snapshot.get('source') != source:
+        return {'labels': {}, 'parents': {}}
+
+    unchanged = [(addr, entry) for addr, entry in snapshot.get('resources', {}).items() if fingerprints.get(addr) == entry[0]]
+    return {
+        'labels': {addr: entry[1] for addr, entry in unchanged if entry[1] is not None},
+        'parents': {addr: entry[2] for addr, entry in unchanged} if snapshot.get('clusters') == signature else {},
+    }
+
+def is_snapshot(path):
+    """Tells a snapshot file from a plan by its first key."""
+    with open(path, 'rb') as f:
+        return b'"snapshot_version"' in f.read(64)
+
+def load_snapshot(path):
+    """
+    Reads a snapshot file.
+
+    Returns:
+        dict or None: The snapshot, or None if the file is missing or unreadable.
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_snapshot(snapshot, path):
+    """Writes a snapshot atomically (a concurrent reader never sees a partial file)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def previous_snapshot(path, simple=False, include_deleted=False):
+    """
+    Loads the snapshot of a previous run, given either a snapshot file or the previous plan.
+
+    A plan is resolved from scratch to produce its snapshot, which only pays off
+    when several plans are compared against it; prefer persisting snapshots.
+
+    Args:
+        path (str): A snapshot file or a tfplan.json.
+        simple (bool, optional): Whether labels are simplified. Defaults to False.
+        include_deleted (bool, optional): Passed to `extract_resources`. Defaults to False.
+
+    Returns:
+        dict or None: The snapshot, or None if it cannot be read.
+    """
+    if not os.path.exists(path):
+        return None
+    if is_snapshot(path):
+        return load_snapshot(path)
+
+    resources = extract_resources(load_plan(path), include_deleted=include_deleted)
+    fingerprints, signature = fingerprint_resources(resources)
+    resolved = {'labels': {}, 'parents': {}}
+    build_graph(resources, simple=simple, resolved=resolved)
+    return make_snapshot(resolved, fingerprints, signature, simple, source=os.path.abspath(path))
@@ -0,0 +1,29 @@
+import os
+import re
+import sys
+
+import pytest
+
+# Make `src` importable however pytest is started (e.g. `pytest` from the repository root)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.generator
+
+@pytest.fixture
+def graphviz_calls(monkeypatch):
+    """Replaces Graphviz: 'plain' lists every node on a grid, other formats get the DOT source."""
+    calls = []
+
+    def fake_render_formats(source, output_filename, formats, max_workers=None, engine="dot", timeout=None):
+        calls.append((engine, list(formats)))
+        nodes = re.findall(r'^\t("[^"]*") \[label=', source, re.M)
+        for fmt in formats:
+            with open(f"{output_filename}.{fmt}", "w") as f:
+                if fmt == "plain":
+                    f.write("".join(f"node {name} {i}.0 1.0 1.4 1.9 label\n" for i, name in enumerate(nodes)))
+                else:
+                    f.write(source)
+        return [f"{output_filename}.{fmt}" for fmt in formats]
+
+    monkeypatch.setattr(src.generator, "render_formats", fake_render_formats)
+    return calls
@@ -0,0 +1,151 @@
+"""
+Builders of small Terraform plans, in the layout of `terraform show -json`.
+
+Addresses are written as in the plan: 'google_compute_instance.web',
+'google_compute_instance.web[0]' or 'module.app.google_compute_instance.web["a"]';
+the resource type and name are read from them.
+"""
+
+import re
+
+def _type_and_name(address):
+    parts = re.sub(r'\[[^\]]*\]', '', address).split('.')
+    return parts[-2], parts[-1]
+
+def refs(*addresses):
+    """An expression referencing the given addresses."""
+    return {'references': list(addresses)}
+
+def block(address, expressions=None, **extra):
+    """A configuration resource block (address relative to its module)."""
+    res_type, name = _type_and_name(address)
+    res = {'address': address, 'mode': 'managed', 'type': res_type, 'name': name, 'expressions': expressions or {}}
+    res.update(extra)
+    return res
+
+def planned(address, values=None, index=None):
+    """A planned resource instance (plan-wide address)."""
+    res_type, name = _type_and_name(address)
+    res = {'address': address, 'mode': 'managed', 'type': res_type, 'name': name, 'values': values if values is not None else {'name': name}}
+    if index is not None:
+        res['index'] = index
+    return res
+
+def change(address, *actions):
+    """A `resource_changes` entry."""
+    res_type, name = _type_and_name(address)
+    return {'address': address, 'mode': 'managed', 'type': res_type, 'name': name, 'change': {'actions': list(actions), 'before': None, 'after': {}}}
+
+def make_plan(blocks, instances, module_calls=None, child_modules=None, changes=None):
+    """
+    Assembles a plan.
+
+    Args:
+        blocks (list): Root module configuration blocks (see `block`).
+        instances (list): Root module planned instances (see `planned`).
+        module_calls (dict, optional): Root 'module_calls' (configuration).
+        child_modules (list, optional): Root 'child_modules' (planned values).
+        changes (list, optional): 'resource_changes' entries (see `change`).
+    """
+    plan = {
+        'format_version': '1.2',
+        'planned_values': {'root_module': {'resources': instances}},
+        'configuration': {'root_module': {'resources': blocks}},
+    }
+    if module_calls:
+        plan['configuration']['root_module']['module_calls'] = module_calls
+    if child_modules:
+        plan['planned_values']['root_module']['child_modules'] = child_modules
+    if changes is not None:
+        plan['resource_changes'] = changes
+    return plan
+
+def network_plan():
+    """A VPC with two subnets, and resources attached to either (or to the VPC only)."""
+    return make_plan(
+        [
+            block('google_compute_network.vpc'),
+            block('google_compute_subnetwork.a', {'network': refs('google_compute_network.vpc.id', 'google_compute_network.vpc')}),
+            block('google_compute_subnetwork.b', {'network': refs('google_compute_network.vpc.id', 'google_compute_network.vpc')}),
+            # The VPC comes first, then both subnets: the first subnet wins
+            block('google_compute_instance.web', {
+                'network_interface': [{'network': refs('google_compute_network.vpc.id'), 'subnetwork': refs('google_compute_subnetwork.b.self_link', 'google_compute_subnetwork.b')}],
+                'metadata': refs('google_compute_subnetwork.a.id'),
+            }),
+            block('google_compute_instance.api', {'network_interface': [{'subnetwork': refs('google_compute_subnetwork.a.id')}]}),
+            block('google_sql_database_instance.db', {'settings': [{'ip_configuration': [{'private_network': refs('google_compute_network.vpc.id')}]}]}),
+            block('google_storage_bucket.assets'),
+        ],
+        [planned(address) for address in ('google_compute_network.vpc', 'google_compute_subnetwork.a', 'google_compute_subnetwork.b', 'google_compute_instance.web', 'google_compute_instance.api', 'google_sql_database_instance.db', 'google_storage_bucket.assets')],
+    )
+
+def module_plan():
+    """
+    A root VPC and subnet, used by nested modules through input variables:
+    - module.app: an instance in the subnet, a bucket, and an 'ip' output
+    - module.app.module.db: an SQL instance in the network passed down by module.app
+    - module.cdn: a bucket (no network)
+    The root module references the 'ip' output of module.app.
+    """
+    subnet_refs = refs('google_compute_subnetwork.sub.id', 'google_compute_subnetwork.sub')
+    db = {
+        'resources': [block('google_sql_database_instance.db', {'settings': [{'ip_configuration': [{'private_network': refs('var.network')}]}]})],
+    }
+    app = {
+        'resources': [
+            block('google_compute_instance.vm', {'network_interface': [{'subnetwork': refs('var.subnet')}]}),
+            block('google_storage_bucket.logs', {'labels': refs('local.labels')}),
+        ],
+        'module_calls': {'db': {'source': './db', 'expressions': {'network': refs('var.subnet')}, 'module': db}},
+        'outputs': {'ip': {'expression': refs('google_compute_instance.vm.network_interface[0].network_ip', 'google_compute_instance.vm')}},
+    }
+    cdn = {'resources': [block('google_storage_bucket.static')]}
+    return make_plan(
+        [
+            block('google_compute_network.vpc'),
+            block('google_compute_subnetwork.sub', {'network': refs('google_compute_network.vpc.id')}),
+            block('google_dns_record_set.app', {'rrdatas': refs('module.app.ip')}),
+        ],
+        [planned('google_compute_network.vpc'), planned('google_compute_subnetwork.sub'), planned('google_dns_record_set.app')],
+        module_calls={
+            'app': {'source': './app', 'expressions': {'subnet': subnet_refs}, 'module': app},
+            'cdn': {'source': './cdn', 'module': cdn},
+        },
+        child_modules=[
+            {'address': 'module.app', 'resources': [planned('module.app.google_compute_instance.vm'), planned('module.app.google_storage_bucket.logs')], 'child_modules': [
+                {'address': 'module.app.module.db', 'resources': [planned('module.app.module.db.google_sql_database_instance.db')]},
+            ]},
+            {'address': 'module.cdn', 'resources': [planned('module.cdn.google_storage_bucket.static')]},
+        ],
+    )
+
+def fanout_plan():
+    """
+    Three subnets (count) and one instance per subnet (count, `subnet[count.index]`),
+    two for_each buckets, and a module expanded with count holding one topic.
+    """
+    return make_plan(
+        [
+            block('google_compute_network.vpc'),
+            block('google_compute_subnetwork.sub', {'network': refs('google_compute_network.vpc.id')}, count_expression={'constant_value': 3}),
+            block('google_compute_instance.web', {'network_interface': [{'subnetwork': refs('google_compute_subnetwork.sub', 'count.index')}]}, count_expression={'constant_value': 3}),
+            block('google_storage_bucket.data', for_each_expression=refs('var.buckets')),
+        ],
+        [planned('google_compute_network.vpc')]
+        + [planned(f'google_compute_subnetwork.sub[{i}]', {'name': f'sub-{i}'}, index=i) for i in range(3)]
+        + [planned(f'google_compute_instance.web[{i}]', {'name': f'web-{i}'}, index=i) for i in range(3)]
+        + [planned(f'google_storage_bucket.data["{key}"]', {'name': f'data-{key}'}, index=key) for key in ('eu', 'us')],
+        module_calls={'queue': {'source': './queue', 'count_expression': {'constant_value': 2}, 'module': {'resources': [block('google_pubsub_topic.jobs')]}}},
+        child_modules=[
+            {'address': f'module.queue[{i}]', 'resources': [planned(f'module.queue[{i}].google_pubsub_topic.jobs', {'name': f'jobs-{i}'})]}
+            for i in range(2)
+        ],
+    )
+
+def web_changes_plan(actions):
+    """Six web instances (count) planning the given actions (one list per instance)."""
+    return make_plan(
+        [block('google_compute_instance.web', count_expression={'constant_value': 6})],
+        [planned(f'google_compute_instance.web[{i}]', {'name': f'web-{i}'}, index=i) for i in range(6)],
+        changes=[change(f'google_compute_instance.web[{i}]', *acts) for i, acts in enumerate(actions)],
+    )
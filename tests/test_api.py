@@ -0,0 +1,59 @@
+"""Tests for the in-memory API (see `src.api`)."""
+
+import copy
+import json
+import subprocess
+
+import pytest
+
+import src.api
+from plans import fanout_plan, module_plan, web_changes_plan
+from src.api import render_plan
+
+@pytest.mark.parametrize("plan", [module_plan, fanout_plan])
+def test_plan_dict_is_not_modified(plan):
+    plan = plan()
+    original = copy.deepcopy(plan)
+    result = render_plan(plan, outformat="dot", module_clusters=True, aggregate_threshold=2, edges=True)
+    assert plan == original
+    # A second render of the same dict sees the same plan
+    assert render_plan(plan, outformat="dot", module_clusters=True, aggregate_threshold=2, edges=True)['source'] == result['source']
+
+def test_dict_and_json_render_alike():
+    plan = module_plan()
+    result = render_plan(plan, outformat="dot", edges=True)
+    assert render_plan(json.dumps(plan).encode("utf-8"), outformat="dot", edges=True)['source'] == result['source']
+    assert render_plan(json.dumps(plan), outformat="dot", edges=True)['source'] == result['source']
+    assert result['images'] == {'dot': result['source'].encode("utf-8")}
+    assert result['layout'] == "initial" and result['summary'] is None
+    assert 'module.app.google_compute_instance.vm' in result['graph']['nodes']
+
+def test_not_a_plan():
+    for plan in ({}, [], b"[]"):
+        with pytest.raises(ValueError):
+            render_plan(plan, outformat="dot")
+
+def test_timeouts_fall_back_then_degrade(monkeypatch):
+    runs = []
+
+    def slow_pipe_formats(source, formats, max_workers=None, timeout=None):
+        runs.append(source.count("[label="))
+        if len(runs) < limit:
+            raise subprocess.TimeoutExpired("dot", timeout)
+        return {fmt: b"image" for fmt in formats}
+
+    monkeypatch.setattr(src.api, "pipe_formats", slow_pipe_formats)
+    plan = web_changes_plan([['no-op']] * 3 + [['create']] * 3)
+
+    limit = 4
+    result = render_plan(plan, outformat="svg", diff=True, render_timeout=1)
+    assert (result['layout'], result['images']) == ("aggregate", {'svg': b"image"})
+    assert runs == [6, 6, 6, 1]
+    assert result['graph']['nodes']['google_compute_instance.web'].change == "mixed"
+
+    runs.clear()
+    limit = 5
+    result = render_plan(plan, outformat="svg", diff=True, render_timeout=1)
+    assert (result['layout'], result['images']) == ("degraded", {})
+    assert len(result['graph']['nodes']) == 6
+    assert result['summary'].startswith("6 nodes")
@@ -0,0 +1,65 @@
+"""Tests for the render cache (see `src.cache`), alone and through `create_diagram`."""
+
+import json
+import os
+
+from plans import network_plan
+from src.cache import cache_lookup, cache_store, evict, graph_fingerprint
+from src.generator import create_diagram, layout_attrs
+from src.loader import extract_resources
+from src.resolver import build_graph
+
+def fingerprint(plan, outformat="png", **options):
+    graph = build_graph(extract_resources(plan), **options)
+    return graph_fingerprint(graph, layout_attrs(graph), outformat, "dot")
+
+def test_fingerprint_follows_what_is_drawn():
+    key = fingerprint(network_plan())
+    assert fingerprint(network_plan()) == key
+
+    # Fields that are never drawn do not matter
+    plan = network_plan()
+    plan['configuration']['root_module']['resources'][-1]['expressions']['labels'] = {'constant_value': {'team': 'x'}}
+    plan['prior_state'] = {'values': {}}
+    assert fingerprint(plan) == key
+
+    renamed = network_plan()
+    renamed['planned_values']['root_module']['resources'][-1]['values']['name'] = 'renamed'
+    assert fingerprint(renamed) != key
+    assert fingerprint(network_plan(), outformat="svg") != key
+    assert fingerprint(network_plan(), simple=True, edges=True) != key
+
+def test_lookup_store_and_eviction(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    image = tmp_path / "image.png"
+    image.write_bytes(b"x" * 100)
+    assert cache_lookup("a" * 64, "png", cache_dir) is None
+
+    cache_store("a" * 64, "png", str(image), cache_dir)
+    cache_store("b" * 64, "png", str(image), cache_dir)
+    os.utime(os.path.join(cache_dir, "b" * 64 + ".png"), (0, 0))
+    cached = cache_lookup("a" * 64, "png", cache_dir)
+    assert open(cached, "rb").read() == b"x" * 100
+
+    # Over the limit: the least recently used entry goes first
+    evict(cache_dir, max_bytes=150)
+    assert sorted(os.listdir(cache_dir)) == ["a" * 64 + ".png"]
+
+def test_create_diagram_hits_until_the_graph_changes(tmp_path, graphviz_calls):
+    plan_path = tmp_path / "tfplan.json"
+    plan_path.write_text(json.dumps(network_plan()))
+    options = dict(outformat="svg", backend="dot", cache_dir=str(tmp_path / "cache"), plan_cache_dir=str(tmp_path / "plans"))
+
+    create_diagram(str(plan_path), str(tmp_path / "first"), **options)
+    assert create_diagram(str(plan_path), str(tmp_path / "second"), **options) == [str(tmp_path / "second.svg")]
+    assert len(graphviz_calls) == 1
+    assert (tmp_path / "second.svg").read_text() == (tmp_path / "first.svg").read_text()
+
+    plan = network_plan()
+    plan['planned_values']['root_module']['resources'][-1]['values']['name'] = 'renamed'
+    plan_path.write_text(json.dumps(plan))
+    create_diagram(str(plan_path), str(tmp_path / "third"), **options)
+    assert len(graphviz_calls) == 2
+
+    create_diagram(str(plan_path), str(tmp_path / "fourth"), cache=False, **options)
+    assert len(graphviz_calls) == 3
@@ -0,0 +1,133 @@
+"""Tests for concurrent rendering in the threads of one process (see `src.render`)."""
+
+import contextvars
+import json
+import os
+import re
+import sys
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from plans import fanout_plan, module_plan, network_plan
+from src.generator import create_diagram, graph_source, layout_attrs, render_graph
+from src.loader import extract_resources
+from src.render import diagram_source
+from src.resolver import build_graph
+
+# Graphviz stand-in: writes the format and the DOT source to the output file
+FAKE_DOT = """#!{python}
+import sys
+args = sys.argv[1:]
+fmt = next(arg[2:] for arg in args if arg.startswith("-T"))
+out = args[args.index("-o") + 1]
+source = open([arg for arg in args if not arg.startswith("-")][-1]).read()
+open(out, "w").write("FAKE-" + fmt + "\\n" + source)
+"""
+
+# Option sets and plans the renders cycle through, so interleaved builds differ
+JOBS = [(network_plan, {}), (module_plan, {'module_clusters': True, 'edges': True}), (fanout_plan, {'simple': True, 'aggregate_threshold': 2})]
+
+NODE_ID = re.compile(r"\b[0-9a-f]{32}\b")
+
+def normalize(source):
+    """Renumbers the random node ids `diagrams` gives its nodes, in order of appearance."""
+    ids = {}
+    source = NODE_ID.sub(lambda m: ids.setdefault(m.group(), f"n{len(ids)}"), source)
+    # Graphviz quotes the ids that started with a digit
+    return re.sub(r'"(n\d+)"', r"\1", source)
+
+@pytest.fixture
+def fake_dot(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    dot = bin_dir / "dot"
+    dot.write_text(FAKE_DOT.format(python=sys.executable))
+    dot.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+@pytest.fixture(autouse=True)
+def frequent_switches():
+    """Switches threads as often as possible, so concurrent builds really interleave."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def graphs():
+    return [build_graph(extract_resources(plan()), **options) for plan, options in JOBS]
+
+def test_concurrent_builds_match_serial_builds():
+    graphs_ = graphs()
+    expected = [normalize(graph_source(graph, "diagrams", layout_attrs(graph))) for graph in graphs_]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        sources = list(executor.map(lambda i: normalize(graph_source(graphs_[i % 3], "diagrams", layout_attrs(graphs_[i % 3]))), range(48)))
+    assert sources == [expected[i % 3] for i in range(48)]
+
+def test_builds_leave_the_callers_diagram_alone():
+    from diagrams import Cluster, Diagram, getcluster, getdiagram, setdiagram
+
+    graph = graphs()[1]
+    expected = normalize(diagram_source(graph))
+
+    def inside_a_diagram():
+        outer = Diagram("outer", show=False)
+        setdiagram(outer)
+        with Cluster("outer cluster") as cluster:
+            before = outer.dot.source
+            source = diagram_source(graph)
+            assert (getdiagram(), getcluster(), outer.dot.source) == (outer, cluster, before)
+        return normalize(source)
+
+    assert contextvars.Context().run(inside_a_diagram) == expected
+
+def test_concurrent_renders_write_their_own_files(tmp_path, fake_dot):
+    graphs_ = graphs()
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    def render(i):
+        graph = graphs_[i % 3]
+        return render_graph(graph, str(out_dir / f"render_{i}"), ["png"], graph_attr=layout_attrs(graph))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(executor.map(render, range(24)))
+    assert paths == [[str(out_dir / f"render_{i}.png")] for i in range(24)]
+
+    expected = [normalize(graph_source(graph, "diagrams", layout_attrs(graph))) for graph in graphs_]
+    for i in range(24):
+        content = (out_dir / f"render_{i}.png").read_text()
+        assert content.startswith("FAKE-png\n")
+        assert normalize(content[len("FAKE-png\n"):]) == expected[i % 3]
+    # The intermediate DOT files stayed in private temporary directories
+    assert sorted(os.listdir(out_dir)) == sorted(f"render_{i}.png" for i in range(24))
+
+def test_concurrent_create_diagram(tmp_path, fake_dot):
+    plan_paths = []
+    for plan, _ in JOBS:
+        path = tmp_path / f"{plan.__name__}.json"
+        path.write_text(json.dumps(plan()))
+        plan_paths.append(str(path))
+
+    def run(i, name):
+        plan_path, (_, options) = plan_paths[i % 3], JOBS[i % 3]
+        create_diagram(plan_path, str(tmp_path / name), outformat="png", save_script=True, cache=False, **options)
+        with open(tmp_path / f"{name}.png") as f, open(tmp_path / f"{name}.py") as script:
+            return normalize(f.read()), script.read().replace(name, "diagram")
+
+    expected = [run(i, f"serial_{i}") for i in range(3)]
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda i: run(i, f"render_{i}"), range(18)))
+    assert results == [expected[i % 3] for i in range(18)]
+
+def test_memory_tracing_started_elsewhere_keeps_running(tmp_path, fake_dot):
+    plan_path = tmp_path / "tfplan.json"
+    plan_path.write_text(json.dumps(network_plan()))
+    tracemalloc.start()
+    try:
+        create_diagram(str(plan_path), str(tmp_path / "diagram"), outformat="png", cache=False, profile="json")
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert json.loads((tmp_path / "diagram.metrics.json").read_text())['trace_memory'] is True
@@ -0,0 +1,35 @@
+"""Tests for the native DOT backend (see `src.dot`)."""
+
+import re
+
+from plans import fanout_plan, network_plan
+from src.dot import emit_dot, quote
+from src.layout import parse_plain
+from src.loader import extract_resources
+from src.resolver import build_graph
+
+def test_quote_escapes_backslashes_quotes_and_newlines():
+    assert quote('C:\\logs "prod"\nweb') == '"C:\\\\logs \\"prod\\"\\nweb"'
+    # A trailing backslash must not escape the closing quote
+    assert quote('path\\') == '"path\\\\"'
+
+def test_quoted_names_read_back_from_plain_output():
+    address = 'google_storage_bucket.data["a\\\\b \\"c\\""]'
+    assert list(parse_plain(f"node {quote(address)} 1.0 2.0 1.4 1.9 label\n")) == [address]
+
+def test_emit_dot_uses_addresses_as_node_ids():
+    graph = build_graph(extract_resources(fanout_plan()), edges=True)
+    source = emit_dot(graph)
+    assert source.startswith('digraph "Terraform Infrastructure" {')
+    ids = re.findall(r'^\t+("(?:[^"\\]|\\.)*") \[label=', source, re.M)
+    assert ids == [quote(addr) for addr in [addr for cluster in ('google_compute_subnetwork.sub[0]', 'google_compute_subnetwork.sub[1]', 'google_compute_subnetwork.sub[2]') for addr in graph['nodes_by_parent'][cluster]] + graph['nodes_by_parent'][None]]
+    # One subgraph per cluster, subnets nested in the VPC
+    assert source.count("subgraph cluster_") == len(graph['clusters'])
+    assert emit_dot(graph) == source
+
+def test_emit_dot_escapes_labels():
+    plan = network_plan()
+    plan['planned_values']['root_module']['resources'][-1]['values']['name'] = 'logs\\'
+    graph = build_graph(extract_resources(plan), simple=True)
+    source = emit_dot(graph)
+    assert 'label="logs\\\\"' in source
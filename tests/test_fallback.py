@@ -0,0 +1,92 @@
+"""Tests for the render timeout fallback chain (see `src.generator.render_with_fallback`)."""
+
+import json
+import re
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+import src.generator
+from plans import web_changes_plan
+from src.generator import RENDER_FALLBACKS, create_diagram, fallback_layouts
+
+@pytest.fixture
+def slow_graphviz(monkeypatch):
+    """Replaces Graphviz: times out on graphs with more than `graphviz.limit` nodes, records every run."""
+    graphviz = SimpleNamespace(runs=[], limit=3)
+
+    def fake_render_formats(source, output_filename, formats, max_workers=None, engine="dot", timeout=None):
+        nodes = re.findall(r'^\t"[^"]*" \[label="([^"]*)"', source, re.M)
+        graphviz.runs.append({'splines': re.search(r'splines="?(\w+)', source).group(1), 'labels': nodes})
+        if len(nodes) > graphviz.limit:
+            raise subprocess.TimeoutExpired("dot", timeout)
+        for fmt in formats:
+            with open(f"{output_filename}.{fmt}", "w") as f:
+                f.write(source)
+        return [f"{output_filename}.{fmt}" for fmt in formats]
+
+    monkeypatch.setattr(src.generator, "render_formats", fake_render_formats)
+    return graphviz
+
+@pytest.fixture
+def plan_path(tmp_path):
+    path = tmp_path / "tfplan.json"
+    path.write_text(json.dumps(web_changes_plan([['no-op']] * 3 + [['create']] * 3)))
+    return str(path)
+
+def test_fallback_layouts():
+    attrs = {"splines": "ortho", "nodesep": "0.8"}
+    assert fallback_layouts(attrs) == [("initial", attrs, False)]
+
+    steps = fallback_layouts(attrs, timeout=5)
+    assert [step for step, _, _ in steps] == ["initial", "no-ortho", "compact", "aggregate"]
+    assert [agg for _, _, agg in steps] == [False, False, False, True]
+    # Every step overrides the requested attributes, keeping the others
+    assert steps[1][1] == {"splines": "spline", "nodesep": "0.8"}
+    assert steps[2][1] == {**attrs, **RENDER_FALLBACKS[1][1]}
+
+    assert [step for step, _, _ in fallback_layouts(attrs, timeout=5, aggregate=False)] == ["initial", "no-ortho", "compact"]
+
+def run(plan_path, tmp_path, **options):
+    metrics = {}
+    paths = create_diagram(plan_path, str(tmp_path / "out"), outformat="svg", backend="dot", diff=True, render_timeout=1, cache_dir=str(tmp_path / "cache"), plan_cache_dir=str(tmp_path / "plans"), metrics_hook=metrics.update, **options)
+    outcomes = [(s['name'], s.get('outcome')) for s in metrics['stages'] if s['name'].startswith("render")]
+    return paths, outcomes, metrics['counts']
+
+def test_timeouts_fall_back_to_the_aggregated_graph(plan_path, tmp_path, slow_graphviz):
+    paths, outcomes, counts = run(plan_path, tmp_path)
+    assert paths == [str(tmp_path / "out.svg")]
+    assert outcomes == [("render", "timeout"), ("render:no-ortho", "timeout"), ("render:compact", "timeout"), ("render:aggregate", "ok")]
+    assert counts['render_layout'] == "aggregate"
+    assert [r['splines'] for r in slow_graphviz.runs] == ["ortho", "spline", "line", "line"]
+
+    # The six instances became one node, which keeps the changes of all of them
+    assert len(slow_graphviz.runs[0]['labels']) == 6
+    assert slow_graphviz.runs[-1]['labels'] == ["± web-0\\n×6"]
+
+    # A fallback layout is not cached: the next render tries the requested layout again
+    slow_graphviz.runs.clear()
+    run(plan_path, tmp_path)
+    assert slow_graphviz.runs[0]['splines'] == "ortho"
+
+def test_no_aggregate_step_when_already_aggregated(plan_path, tmp_path, slow_graphviz):
+    _, outcomes, _ = run(plan_path, tmp_path, aggregate_threshold=2)
+    assert outcomes == [("render", "ok")]
+    slow_graphviz.limit = 0
+    _, outcomes, _ = run(plan_path, tmp_path, aggregate_threshold=2, cache=False)
+    assert [name for name, _ in outcomes] == ["render", "render:no-ortho", "render:compact", "render:degraded"]
+
+def test_every_timeout_degrades_to_source_and_summary(plan_path, tmp_path, slow_graphviz):
+    slow_graphviz.limit = 0
+    paths, outcomes, counts = run(plan_path, tmp_path)
+    assert paths == [str(tmp_path / "out.dot"), str(tmp_path / "out.txt")]
+    assert outcomes[-1] == ("render:degraded", "degraded")
+    assert counts['render_layout'] == "degraded"
+    assert not (tmp_path / "out.svg").exists()
+
+    # The DOT source is the full graph, not the aggregated one
+    assert len(re.findall(r'\[label=', (tmp_path / "out.dot").read_text())) == 6
+    summary = (tmp_path / "out.txt").read_text()
+    assert "(initial, no-ortho, compact, aggregate)" in summary
+    assert "google_compute_instance: 6" in summary
@@ -0,0 +1,55 @@
+"""Tests for rendering several output formats from one DOT source (see `src.dot.render_formats`)."""
+
+import subprocess
+import threading
+
+import pytest
+
+import src.dot
+from src.dot import pipe_formats, render_formats, run_dot
+from src.generator import parse_formats
+
+def test_parse_formats():
+    assert parse_formats("PNG, svg,png,,dot") == ["png", "svg", "dot"]
+    assert parse_formats(["svg", "svg"]) == ["svg"]
+
+def test_dot_format_is_written_without_graphviz(tmp_path):
+    assert run_dot("digraph {}", str(tmp_path / "out"), "dot", engine="missing-graphviz") == str(tmp_path / "out.dot")
+    assert (tmp_path / "out.dot").read_text() == "digraph {}"
+    assert pipe_formats("digraph {}", ["dot"], engine="missing-graphviz") == {"dot": b"digraph {}"}
+
+def test_formats_render_concurrently(tmp_path, monkeypatch):
+    # Every render waits for the others: this only completes when they run at the same time
+    barrier = threading.Barrier(3, timeout=10)
+
+    def fake_run_dot(source, output_filename, outformat="png", engine="dot", timeout=None):
+        barrier.wait()
+        return f"{output_filename}.{outformat}"
+
+    monkeypatch.setattr(src.dot, "run_dot", fake_run_dot)
+    assert render_formats("digraph {}", str(tmp_path / "out"), ["png", "svg", "pdf"], max_workers=3) == [str(tmp_path / f"out.{fmt}") for fmt in ("png", "svg", "pdf")]
+
+def test_max_workers_bounds_the_processes(tmp_path, monkeypatch):
+    threads = set()
+
+    def fake_run_dot(source, output_filename, outformat="png", engine="dot", timeout=None):
+        threads.add(threading.get_ident())
+        return f"{output_filename}.{outformat}"
+
+    monkeypatch.setattr(src.dot, "run_dot", fake_run_dot)
+    render_formats("digraph {}", str(tmp_path / "out"), ["png", "svg", "pdf", "jpg"], max_workers=1)
+    assert len(threads) == 1
+
+def test_failures_surface_after_every_render(tmp_path, monkeypatch):
+    finished = []
+
+    def fake_run_dot(source, output_filename, outformat="png", engine="dot", timeout=None):
+        if outformat == "svg":
+            raise subprocess.CalledProcessError(1, ["dot"])
+        finished.append(outformat)
+        return f"{output_filename}.{outformat}"
+
+    monkeypatch.setattr(src.dot, "run_dot", fake_run_dot)
+    with pytest.raises(subprocess.CalledProcessError):
+        render_formats("digraph {}", str(tmp_path / "out"), ["png", "svg", "pdf"])
+    assert sorted(finished) == ["pdf", "png"]
@@ -0,0 +1,34 @@
+"""Tests for stable layouts (`--layout`, see `src.layout`) through `create_diagram`."""
+
+import json
+
+from src.generator import create_diagram
+
+PLAN = {
+    'planned_values': {'root_module': {'resources': [
+        {'address': 'google_storage_bucket.assets', 'mode': 'managed', 'type': 'google_storage_bucket', 'name': 'assets', 'values': {'name': 'assets'}},
+        {'address': 'google_pubsub_topic.events', 'mode': 'managed', 'type': 'google_pubsub_topic', 'name': 'events', 'values': {'name': 'events'}},
+    ]}},
+    'configuration': {'root_module': {'resources': [
+        {'address': 'google_storage_bucket.assets', 'mode': 'managed', 'type': 'google_storage_bucket', 'name': 'assets', 'expressions': {}},
+        {'address': 'google_pubsub_topic.events', 'mode': 'managed', 'type': 'google_pubsub_topic', 'name': 'events', 'expressions': {}},
+    ]}},
+}
+
+def test_layout_saved_with_render_cache(tmp_path, graphviz_calls):
+    plan_path = tmp_path / "tfplan.json"
+    plan_path.write_text(json.dumps(PLAN))
+    layout_file = tmp_path / "layout.json"
+    options = dict(outformat="svg", backend="dot", cache=True, cache_dir=str(tmp_path / "cache"), plan_cache_dir=str(tmp_path / "plans"), layout_file=str(layout_file))
+
+    # Without a layout file, this graph would now be a render cache hit: the layout must still be saved
+    create_diagram(str(plan_path), str(tmp_path / "first"), **options)
+    layout_file.unlink()
+    create_diagram(str(plan_path), str(tmp_path / "second"), **options)
+    assert sorted(json.loads(layout_file.read_text())['nodes']) == ['google_pubsub_topic.events', 'google_storage_bucket.assets']
+
+    # The stored layout pins both nodes
+    metrics = {}
+    create_diagram(str(plan_path), str(tmp_path / "third"), metrics_hook=metrics.update, **options)
+    assert metrics['counts']['layout_pinned'] == 2
+    assert graphviz_calls == [("dot", ["svg", "plain"]), ("dot", ["svg", "plain"]), ("fdp", ["svg", "plain"])]
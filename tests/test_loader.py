@@ -0,0 +1,94 @@
+"""Tests for the plan loader (see `src.loader`)."""
+
+import json
+
+import pytest
+
+from plans import change, fanout_plan, module_plan, network_plan, planned, refs
+from src.loader import _load_plan_full, _load_plan_streaming, extract_resources, load_plan, optional_module, parse_plan
+from src.resolver import iter_references
+
+def full_plan():
+    """A plan with every section, including the ones the loader drops."""
+    plan = network_plan()
+    plan['planned_values']['root_module']['resources'][0]['values'].update({'mtu': 1460.5, 'labels': {'env': 'prod'}, 'tags': ['a', None, True]})
+    plan['resource_changes'] = [dict(change(res['address'], 'create'), change={'actions': ['create'], 'before': None, 'after': res['values']}) for res in plan['planned_values']['root_module']['resources']]
+    plan['prior_state'] = {'values': {'root_module': {'resources': [planned('google_compute_network.old')]}}}
+    plan['configuration']['provider_config'] = {'google': {'name': 'google'}}
+    plan['configuration']['root_module']['outputs'] = {'ip': {'expression': refs('google_compute_instance.web')}}
+    return plan
+
+@pytest.fixture
+def plan_file(tmp_path):
+    path = tmp_path / "tfplan.json"
+    path.write_text(json.dumps(full_plan()))
+    return path
+
+def test_streaming_and_full_loaders_agree(plan_file):
+    if optional_module("ijson") is None:
+        pytest.skip("ijson is not installed")
+    with open(plan_file, 'rb') as f:
+        streamed = _load_plan_streaming(f)
+    assert streamed == _load_plan_full(str(plan_file))
+    assert streamed == load_plan(str(plan_file))
+
+def test_loader_keeps_only_the_needed_sections(plan_file):
+    plan = load_plan(str(plan_file))
+    assert sorted(plan) == ['configuration', 'planned_values', 'resource_changes']
+    assert sorted(plan['configuration']['root_module']) == ['resources']
+    assert plan['resource_changes'][0] == {'address': 'google_compute_network.vpc', 'mode': 'managed', 'type': 'google_compute_network', 'name': 'vpc', 'change': {'actions': ['create']}}
+    assert plan['planned_values']['root_module']['resources'][0]['values']['mtu'] == 1460.5
+
+def test_parse_plan_matches_load_plan(plan_file):
+    loaded = load_plan(str(plan_file))
+    assert parse_plan(plan_file.read_bytes()) == loaded
+    assert parse_plan(full_plan()) == loaded
+
+def test_invalid_json_raises_value_error(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text('{"planned_values": {"root_module": ')
+    with pytest.raises(ValueError):
+        load_plan(str(path))
+    with pytest.raises(ValueError):
+        _load_plan_full(str(path))
+
+def test_module_addresses_and_references_are_qualified():
+    resources = {res['address']: res for res in extract_resources(module_plan())}
+    assert list(resources) == [
+        'google_compute_network.vpc',
+        'google_compute_subnetwork.sub',
+        'google_dns_record_set.app',
+        'module.app.google_compute_instance.vm',
+        'module.app.google_storage_bucket.logs',
+        'module.app.module.db.google_sql_database_instance.db',
+        'module.cdn.google_storage_bucket.static',
+    ]
+    assert resources['module.app.module.db.google_sql_database_instance.db']['module_address'] == 'module.app.module.db'
+    assert 'module_address' not in resources['google_dns_record_set.app']
+
+    def references(address):
+        return list(iter_references(resources[address]['expressions']))
+
+    # var.* follows the module calls up to the root, outputs are followed down, locals are dropped
+    assert references('module.app.module.db.google_sql_database_instance.db') == ['google_compute_subnetwork.sub.id', 'google_compute_subnetwork.sub']
+    assert references('google_dns_record_set.app') == ['module.app.google_compute_instance.vm.network_interface[0].network_ip', 'module.app.google_compute_instance.vm']
+    assert references('module.app.google_storage_bucket.logs') == []
+    assert resources['module.app.google_compute_instance.vm']['planned_values'] == {'name': 'vm'}
+
+def test_count_and_for_each_instances_are_expanded():
+    resources = {res['address']: res for res in extract_resources(fanout_plan())}
+    web = resources['google_compute_instance.web[2]']
+    assert (web['config_address'], web['index'], web['planned_values']) == ('google_compute_instance.web', 2, {'name': 'web-2'})
+    assert resources['google_storage_bucket.data["eu"]']['index'] == 'eu'
+    # Instances of a module expanded with count keep their module instance address
+    jobs = resources['module.queue[1].google_pubsub_topic.jobs']
+    assert (jobs['config_address'], jobs['module_address']) == ('module.queue.google_pubsub_topic.jobs', 'module.queue[1]')
+    assert 'google_compute_instance.web' not in resources
+    assert len(resources) == 1 + 3 + 3 + 2 + 2
+
+def test_deleted_instances_are_included_on_request():
+    plan = fanout_plan()
+    plan['resource_changes'] = [change('google_compute_instance.web[0]', 'no-op'), change('google_compute_instance.web[3]', 'delete')]
+    assert 'google_compute_instance.web[3]' not in {res['address'] for res in extract_resources(fanout_plan())}
+    deleted = {res['address']: res for res in extract_resources(plan, include_deleted=True)}['google_compute_instance.web[3]']
+    assert (deleted['config_address'], deleted['change_actions'], deleted['planned_values']) == ('google_compute_instance.web', ['delete'], {})
@@ -0,0 +1,92 @@
+"""Tests for batch resource labeling (see `src.resources.lookup`)."""
+
+import pytest
+
+import src.resolver
+from plans import block, fanout_plan, make_plan, network_plan, planned, refs
+from src.loader import extract_resources
+from src.resolver import build_graph
+from src.resources import lookup
+from src.resources.lookup import body_key, get_resource_label, get_resource_labels
+
+@pytest.fixture
+def labeler_calls(monkeypatch):
+    """Counts the calls of every labeler (built-in ones keep their output)."""
+    calls = []
+
+    def counting(labeler):
+        def label(resource):
+            calls.append(resource['address'])
+            return labeler(resource)
+        return label
+
+    labelers = {res_type: counting(labeler) for res_type, labeler in lookup.RESOURCE_LABELERS.items()}
+    monkeypatch.setattr(lookup, "RESOURCE_LABELERS", labelers)
+    return calls
+
+def instances_plan():
+    """Four instances of one block: same machine type and zone, their own names and IDs, one in another zone."""
+    values = lambda i, zone: {'name': f'web-{i}', 'machine_type': 'e2-small', 'zone': zone, 'id': f'projects/p/instances/web-{i}'}
+    return make_plan(
+        [block('google_compute_instance.web', {'machine_type': {'constant_value': 'e2-small'}, 'name': refs('each.key')}, for_each_expression=refs('var.web'))],
+        [planned(f'google_compute_instance.web["{i}"]', values(i, 'europe-west1-b' if i < 3 else 'us-east1-b'), index=str(i)) for i in range(4)],
+    )
+
+@pytest.mark.parametrize("plan", [network_plan, fanout_plan, instances_plan])
+@pytest.mark.parametrize("options", [{}, {'cache': True}, {'workers': 2}, {'cache': True, 'workers': 2}, {'simple': True, 'cache': True}])
+def test_batch_labels_match_single_labels(plan, options):
+    resources = extract_resources(plan())
+    expected = [get_resource_label(res, simple=options.get('simple', False)) for res in resources]
+    assert get_resource_labels(resources, **options) == expected
+
+def test_body_key_ignores_names_and_instance_values():
+    web = extract_resources(instances_plan())
+    keys = [body_key(res) for res in web]
+    # web-0..2 differ by name and ID only; web-3 is in another zone
+    assert keys[0] == keys[1] == keys[2] != keys[3]
+    assert body_key(web[0], simple=True) == body_key(web[3], simple=True)
+
+def test_fan_out_is_labeled_once_per_body(labeler_calls):
+    web = extract_resources(instances_plan())
+    labels = get_resource_labels(web, cache=True)
+    assert labeler_calls == ['google_compute_instance.web["0"]', 'google_compute_instance.web["3"]']
+    assert labels == [f"web-{i}\ne2-small\n{zone}" for i, zone in enumerate(['europe-west1-b'] * 3 + ['us-east1-b'])]
+
+def test_build_graph_caches_labelers_registered_at_runtime(monkeypatch):
+    calls = []
+
+    def topic_label(resource):
+        calls.append(resource['address'])
+        return f"Topic {resource['planned_values']['name']}"
+
+    monkeypatch.setitem(lookup.RESOURCE_LABELERS, "google_pubsub_topic", topic_label)
+    monkeypatch.setattr(src.resolver, "LABEL_CACHE_RESOURCES", 4)
+    # Runtime labelers may read any planned value: only identical bodies share a label
+    plan = make_plan(
+        [block('google_pubsub_topic.jobs', count_expression={'constant_value': 4})],
+        [planned(f'google_pubsub_topic.jobs[{i}]', {'name': 'jobs', 'labels': {'shard': str(i // 3)}}, index=i) for i in range(4)],
+    )
+    resolved = {'labels': {}, 'parents': {}}
+    graph = build_graph(extract_resources(plan), resolved=resolved)
+    assert [node.label for node in graph['nodes'].values()] == ["Topic jobs"] * 4
+    assert calls == ['google_pubsub_topic.jobs[0]', 'google_pubsub_topic.jobs[3]']
+    assert list(resolved['labels']) == [f'google_pubsub_topic.jobs[{i}]' for i in range(4)]
+
+    # Below the threshold, every resource goes to the labeler
+    calls.clear()
+    monkeypatch.setattr(src.resolver, "LABEL_CACHE_RESOURCES", 5)
+    build_graph(extract_resources(plan))
+    assert len(calls) == 4
+
+def test_build_graph_labels_drawn_resources_only(labeler_calls):
+    # Aggregated instances take the label of the first one; reused labels are not recomputed
+    resources = extract_resources(instances_plan())
+    graph = build_graph(resources, aggregate_threshold=2)
+    assert labeler_calls == ['google_compute_instance.web["0"]']
+    assert graph['nodes']['google_compute_instance.web'].label == "web-0\ne2-small\neurope-west1-b\n×4"
+
+    labeler_calls.clear()
+    previous = {'labels': {res['address']: "kept" for res in resources}, 'parents': {}}
+    graph = build_graph(resources, previous=previous)
+    assert labeler_calls == []
+    assert {node.label for node in graph['nodes'].values()} == {"kept"}
@@ -0,0 +1,34 @@
+"""Tests for the lazy icon-class mapping (see `src.mapper`) and the start-up imports."""
+
+import os
+import subprocess
+import sys
+
+from src.mapper import TERRAFORM_GCP_MAPPING, get_diagram_node
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_modules(code):
+    """Runs `code` in a fresh interpreter and returns the names in sys.modules afterwards."""
+    probe = code + "\nimport sys\nsys.stderr.write('\\n'.join(sys.modules))\n"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, check=True, capture_output=True, text=True)
+    return set(result.stderr.split())
+
+def test_classes_are_imported_on_first_lookup():
+    assert not any(name.startswith("diagrams") for name in imported_modules("import src.mapper"))
+
+    modules = imported_modules("from src.mapper import get_diagram_node\nget_diagram_node('google_compute_instance')")
+    assert "diagrams.gcp.compute" in modules
+    assert "diagrams.gcp.database" not in modules
+
+def test_help_skips_the_heavy_imports():
+    modules = imported_modules("import runpy, sys\nsys.argv = ['main.py', '--help']\ntry:\n    runpy.run_path('main.py', run_name='__main__')\nexcept SystemExit:\n    pass")
+    for name in ("diagrams", "ijson", "orjson", "src.server", "src.generator", "concurrent.futures.process"):
+        assert name not in modules
+
+def test_every_mapped_type_resolves():
+    for resource_type in TERRAFORM_GCP_MAPPING:
+        cls = get_diagram_node(resource_type)
+        assert isinstance(cls, type), resource_type
+    assert get_diagram_node('google_compute_instance') is get_diagram_node('google_compute_instance')
+    assert get_diagram_node('google_unknown_thing') is None
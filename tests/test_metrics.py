@@ -0,0 +1,34 @@
+"""Tests for the pipeline metrics (see `src.metrics`)."""
+
+import tracemalloc
+
+import pytest
+
+from src.metrics import count, finish, format_summary, new_metrics, stage
+
+def test_stages_and_counts():
+    metrics = new_metrics(plan="tfplan.json")
+    with stage(metrics, "load") as entry:
+        entry['outcome'] = "hit"
+    count(metrics, "resources", 3)
+    finish(metrics)
+    assert [s['name'] for s in metrics['stages']] == ["load"]
+    assert metrics['counts'] == {'resources': 3}
+    assert "load" in format_summary(metrics) and "resources=3" in format_summary(metrics)
+
+def test_disabled_metrics_are_a_no_op():
+    with stage(None, "load") as entry:
+        assert entry is None
+    count(None, "resources", 3)
+
+@pytest.mark.parametrize("has_reset_peak", [True, False])
+def test_peak_allocation_is_traced(monkeypatch, has_reset_peak):
+    if not has_reset_peak:
+        # Python 3.8
+        monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    metrics = new_metrics(trace_memory=True)
+    with stage(metrics, "allocate"):
+        data = [bytes(1024) for _ in range(2048)]
+    del data
+    assert metrics['stages'][0]['peak_alloc_mb'] >= 2
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,34 @@
+"""Tests for the graph model records (see `src.model`)."""
+
+import pickle
+
+import pytest
+
+from plans import fanout_plan, module_plan
+from src.loader import extract_resources
+from src.model import Cluster, Node
+from src.resolver import build_graph
+
+def test_records_have_no_instance_dict():
+    node = Node('google_storage_bucket.assets', 'google_storage_bucket', None, 'assets')
+    cluster = Cluster('google_compute_network.vpc', 'vpc', 'vpc')
+    for record in (node, cluster):
+        assert not hasattr(record, '__dict__')
+        with pytest.raises(AttributeError):
+            record.values = {'name': 'assets'}
+    assert (node.parent_addr, node.layer, node.count, node.change) == (None, "app", 1, None)
+
+def test_graph_records_hold_only_their_fields():
+    graph = build_graph(extract_resources(module_plan()), module_clusters=True)
+    for record in list(graph['nodes'].values()) + list(graph['clusters'].values()):
+        # Nothing of the raw plan (configuration, planned values) is kept
+        assert all(isinstance(getattr(record, field), (str, int, type, type(None))) for field in record.__slots__)
+
+def test_graph_survives_pickling():
+    graph = build_graph(extract_resources(fanout_plan()), aggregate_threshold=2)
+    copy = pickle.loads(pickle.dumps(graph))
+    assert copy.keys() == graph.keys()
+    for name in ('nodes', 'clusters'):
+        assert list(copy[name]) == list(graph[name])
+        for addr, record in graph[name].items():
+            assert [getattr(copy[name][addr], field) for field in record.__slots__] == [getattr(record, field) for field in record.__slots__]
@@ -0,0 +1,59 @@
+"""Tests for partitioned rendering (see `src.partition`)."""
+
+import json
+
+import pytest
+
+import src.generator
+from plans import module_plan, network_plan
+from src.generator import create_diagram
+from src.loader import extract_resources
+from src.partition import overview_graph, partition_filename, partition_graph
+from src.resolver import build_graph
+
+def test_partition_by_vpc():
+    graph = build_graph(extract_resources(network_plan()))
+    partitions = dict(partition_graph(graph, by="vpc"))
+    assert list(partitions) == ['google_compute_network.vpc', 'global']
+    assert sorted(partitions['google_compute_network.vpc']['nodes']) == ['google_compute_instance.api', 'google_compute_instance.web', 'google_sql_database_instance.db']
+    assert sorted(partitions['google_compute_network.vpc']['clusters']) == ['google_compute_network.vpc', 'google_compute_subnetwork.a', 'google_compute_subnetwork.b']
+    assert list(partitions['global']['nodes']) == ['google_storage_bucket.assets']
+    assert partitions['global']['clusters'] == {}
+
+def test_partition_by_module_keeps_enclosing_networks():
+    graph = build_graph(extract_resources(module_plan()), edges=True)
+    partitions = dict(partition_graph(graph, by="module"))
+    assert list(partitions) == ['module.app', 'module.cdn']
+    # module.app.module.db belongs to its top-level module, and its subnet comes along
+    assert sorted(partitions['module.app']['nodes']) == ['module.app.google_compute_instance.vm', 'module.app.google_storage_bucket.logs', 'module.app.module.db.google_sql_database_instance.db']
+    assert 'google_compute_subnetwork.sub' in partitions['module.app']['clusters']
+
+    overview = overview_graph(graph, list(partitions.items()))
+    assert [(node.address, node.count) for node in overview['nodes'].values()] == [('module.app', 3), ('module.cdn', 1)]
+
+def test_unknown_partitioning():
+    with pytest.raises(ValueError):
+        partition_graph(build_graph(extract_resources(network_plan())), by="region")
+
+def test_partition_filename():
+    assert partition_filename("output/prod", 'module.app["eu"]') == 'output/prod_module.app_eu'
+
+def test_create_diagram_renders_every_partition(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_render_partitions(jobs, workers=None):
+        calls.append((jobs, workers))
+        return [([f"{job[1]}.{fmt}" for fmt in job[2]], "initial") for job in jobs]
+
+    monkeypatch.setattr(src.generator, "render_partitions", fake_render_partitions)
+    plan_path = tmp_path / "tfplan.json"
+    plan_path.write_text(json.dumps(network_plan()))
+    output = str(tmp_path / "infra")
+    paths = create_diagram(str(plan_path), output, outformat="svg,png", backend="dot", partition="vpc", partition_workers=3, render_workers=1, plan_cache_dir=str(tmp_path / "plans"))
+
+    (jobs, workers), = calls
+    assert workers == 3
+    assert [job[1] for job in jobs] == [output, f"{output}_google_compute_network.vpc", f"{output}_global"]
+    # Formats within each partition are bounded by render_workers
+    assert {job[6] for job in jobs} == {1}
+    assert paths[:2] == [f"{output}.svg", f"{output}.png"]
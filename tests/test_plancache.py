@@ -0,0 +1,95 @@
+"""Tests for the parsed-plan cache (see `src.plancache`), alone and through `create_diagram`."""
+
+import json
+import os
+
+from plans import fanout_plan, network_plan
+from src.generator import create_diagram
+from src.loader import extract_resources
+from src.plancache import plan_cache_forget, plan_cache_key, plan_cache_lookup, plan_cache_store
+
+def write(path, plan):
+    path.write_text(json.dumps(plan))
+    return str(path)
+
+def files(cache_dir, extension):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(extension))
+
+def test_key_follows_the_content(tmp_path):
+    cache_dir = str(tmp_path / "plans")
+    plan_path = write(tmp_path / "tfplan.json", network_plan())
+    key = plan_cache_key(plan_path, cache_dir=cache_dir)
+    assert plan_cache_key(plan_path, cache_dir=cache_dir) == key
+    assert plan_cache_key(plan_path, include_deleted=True, cache_dir=cache_dir) != key
+
+    # Same content elsewhere (or rewritten later): same key; other content: another key
+    assert plan_cache_key(write(tmp_path / "copy.json", network_plan()), cache_dir=cache_dir) == key
+    write(tmp_path / "tfplan.json", fanout_plan())
+    assert plan_cache_key(plan_path, cache_dir=cache_dir) != key
+
+def test_hash_records(tmp_path):
+    cache_dir = str(tmp_path / "plans")
+    plan_path = write(tmp_path / "tfplan.json", network_plan())
+    key = plan_cache_key(plan_path, cache_dir=cache_dir)
+    [ref] = files(cache_dir, ".ref")
+
+    # While the size and mtime hold, the recorded hash is trusted rather than recomputed
+    with open(os.path.join(cache_dir, ref), "w") as f:
+        f.write("0" * 64)
+    assert plan_cache_key(plan_path, cache_dir=cache_dir) != key
+    os.utime(plan_path, ns=(1, 1))
+    assert plan_cache_key(plan_path, cache_dir=cache_dir) == key
+    assert len(files(cache_dir, ".ref")) == 2
+
+    plan_cache_forget(plan_path, cache_dir)
+    assert files(cache_dir, ".ref") == [ref]
+    plan_cache_forget(plan_path, cache_dir) # Already gone: nothing to do
+
+def test_store_and_lookup(tmp_path):
+    cache_dir = str(tmp_path / "plans")
+    resources = extract_resources(fanout_plan())
+    assert plan_cache_lookup("missing", cache_dir) is None
+    plan_cache_store("key", resources, cache_dir)
+    assert plan_cache_lookup("key", cache_dir) == resources
+
+    # A damaged entry is a miss, not an error
+    with open(os.path.join(cache_dir, "key.marshal"), "r+b") as f:
+        f.truncate(10)
+    assert plan_cache_lookup("key", cache_dir) is None
+
+    # Anything marshal cannot store is left uncached
+    plan_cache_store("object", [{'value': object()}], cache_dir)
+    assert plan_cache_lookup("object", cache_dir) is None
+
+    # Eviction keeps the cache under its size limit
+    plan_cache_store("small", resources, cache_dir, max_bytes=1)
+    assert files(cache_dir, ".marshal") == []
+
+def test_create_diagram_hits_until_the_plan_changes(tmp_path, graphviz_calls):
+    plan_path = write(tmp_path / "tfplan.json", network_plan())
+    options = dict(outformat="svg", backend="dot", cache_dir=str(tmp_path / "cache"), plan_cache_dir=str(tmp_path / "plans"))
+
+    def outcome(output, **extra):
+        metrics = {}
+        create_diagram(plan_path, str(tmp_path / output), metrics_hook=metrics.update, **dict(options, **extra))
+        [stage] = [s for s in metrics['stages'] if s['name'] == "plan-cache"]
+        loaded = any(s['name'] == "load" for s in metrics['stages'])
+        return stage['outcome'], loaded, metrics['counts']['resources']
+
+    assert outcome("first") == ("miss", True, 7)
+    assert outcome("second", simple=True) == ("hit", False, 7)
+    # Deleted resources are extracted only for the diff views: another entry
+    assert outcome("diff", diff=True) == ("miss", True, 7)
+    assert outcome("diff", diff=True) == ("hit", False, 7)
+
+    # A regenerated plan with the same content still hits; a changed one does not
+    write(tmp_path / "tfplan.json", network_plan())
+    assert outcome("third") == ("hit", False, 7)
+    write(tmp_path / "tfplan.json", fanout_plan())
+    assert outcome("fourth") == ("miss", True, 11)
+    assert "google_storage_bucket.data" in (tmp_path / "fourth.svg").read_text()
+
+    # Without the cache, nothing is looked up or stored
+    metrics = {}
+    create_diagram(plan_path, str(tmp_path / "uncached"), cache=False, metrics_hook=metrics.update, **options)
+    assert [s['name'] for s in metrics['stages']][:2] == ["load", "extract"]
@@ -0,0 +1,117 @@
+"""Tests for the relationship resolver (see `src.resolver`)."""
+
+from plans import block, fanout_plan, make_plan, module_plan, network_plan, planned, refs, web_changes_plan
+from src.loader import extract_resources
+from src.model import Cluster
+from src.resolver import build_cluster_index, build_graph, find_parent_cluster, reference_prefixes
+
+def test_reference_prefixes():
+    assert list(reference_prefixes('google_compute_subnetwork.sub.id')) == ['google_compute_subnetwork', 'google_compute_subnetwork.sub', 'google_compute_subnetwork.sub.id']
+
+def test_cluster_index_skips_module_clusters():
+    clusters = {
+        'google_compute_network.vpc': Cluster('google_compute_network.vpc', 'vpc', 'vpc'),
+        'module.app': Cluster('module.app', 'module', 'Module: app'),
+    }
+    assert build_cluster_index(clusters) == {'google_compute_network.vpc': {None: ('google_compute_network.vpc', 'vpc')}}
+
+def test_subnet_wins_over_vpc():
+    clusters = {addr: Cluster(addr, kind, addr) for addr, kind in [('google_compute_network.vpc', 'vpc'), ('google_compute_subnetwork.a', 'subnet'), ('google_compute_subnetwork.b', 'subnet')]}
+    index = build_cluster_index(clusters)
+    # The VPC is referenced first, then subnet b, then subnet a: the first subnet wins
+    expressions = block('google_compute_instance.web', {
+        'network': refs('google_compute_network.vpc.id'),
+        'subnetwork': refs('google_compute_subnetwork.b.self_link'),
+        'metadata': refs('google_compute_subnetwork.a'),
+    })['expressions']
+    assert find_parent_cluster(expressions, index) == 'google_compute_subnetwork.b'
+    assert find_parent_cluster({'network': refs('google_compute_network.vpc.id')}, index) == 'google_compute_network.vpc'
+    assert find_parent_cluster({'bucket': refs('google_storage_bucket.assets.name', 'var.region')}, index) is None
+
+def test_graph_places_resources_in_their_clusters():
+    graph = build_graph(extract_resources(network_plan()))
+    parents = {addr: node.parent_addr for addr, node in graph['nodes'].items()}
+    assert parents == {
+        'google_compute_instance.web': 'google_compute_subnetwork.b',
+        'google_compute_instance.api': 'google_compute_subnetwork.a',
+        'google_sql_database_instance.db': 'google_compute_network.vpc',
+        'google_storage_bucket.assets': None,
+    }
+    assert graph['roots'] == ['google_compute_network.vpc']
+    assert graph['children']['google_compute_network.vpc'] == ['google_compute_subnetwork.a', 'google_compute_subnetwork.b']
+
+def test_instances_are_placed_in_the_matching_cluster_instance():
+    graph = build_graph(extract_resources(fanout_plan()))
+    for i in range(3):
+        assert graph['nodes'][f'google_compute_instance.web[{i}]'].parent_addr == f'google_compute_subnetwork.sub[{i}]'
+        assert graph['clusters'][f'google_compute_subnetwork.sub[{i}]'].parent_addr == 'google_compute_network.vpc'
+
+def test_large_fan_outs_are_aggregated():
+    graph = build_graph(extract_resources(fanout_plan()), aggregate_threshold=2)
+    # The web instances sit in different subnets: each group has one instance, nothing to collapse
+    assert 'google_compute_instance.web' not in graph['nodes']
+    data = graph['nodes']['google_storage_bucket.data']
+    assert (data.count, data.label) == (2, 'data-eu\n×2')
+    assert graph['aliases']['google_storage_bucket.data["us"]'] == 'google_storage_bucket.data'
+    assert graph['nodes']['module.queue.google_pubsub_topic.jobs'].count == 2
+    assert graph['layers']['storage'].count('google_storage_bucket.data') == 1
+
+def test_aggregated_node_combines_the_changes_of_its_instances():
+    plan = web_changes_plan([['no-op']] * 3 + [['create']] * 3)
+    graph = build_graph(extract_resources(plan, include_deleted=True), diff=True, aggregate_threshold=2)
+    node = graph['nodes']['google_compute_instance.web']
+    assert (node.change, node.label) == ('mixed', '± web-0\n×6')
+
+    # The created instances must not vanish from the changed-only view
+    graph = build_graph(extract_resources(web_changes_plan([['no-op']] * 3 + [['create']] * 3), include_deleted=True), changed_only=True, aggregate_threshold=2)
+    assert list(graph['nodes']) == ['google_compute_instance.web']
+
+    graph = build_graph(extract_resources(web_changes_plan([['create']] * 6), include_deleted=True), diff=True, aggregate_threshold=2)
+    assert graph['nodes']['google_compute_instance.web'].change == 'create'
+    graph = build_graph(extract_resources(web_changes_plan([['no-op']] * 6), include_deleted=True), diff=True, aggregate_threshold=2)
+    assert graph['nodes']['google_compute_instance.web'].change is None
+
+def test_module_clusters_nest_and_skip_empty_modules():
+    graph = build_graph(extract_resources(module_plan()), module_clusters=True)
+    parents = {addr: node.parent_addr for addr, node in graph['nodes'].items()}
+    assert parents == {
+        'module.app.google_compute_instance.vm': 'google_compute_subnetwork.sub',
+        'module.app.google_storage_bucket.logs': 'module.app',
+        'module.app.module.db.google_sql_database_instance.db': 'google_compute_subnetwork.sub',
+        'module.cdn.google_storage_bucket.static': 'module.cdn',
+    }
+    # module.app.module.db only holds a resource of the root subnet: no empty box
+    assert sorted(graph['clusters']) == ['google_compute_network.vpc', 'google_compute_subnetwork.sub', 'module.app', 'module.cdn']
+    assert graph['roots'] == ['module.app', 'module.cdn', 'google_compute_network.vpc']
+    assert graph['children']['module.app'] == []
+    assert graph['clusters']['module.app'].label == 'Module: app'
+
+def splat_plan(web_count, consumer_count=None):
+    """A plan with `web_count` instances, and a forwarding rule (`consumer_count` of them if set) that references them."""
+    web = [planned(f'google_compute_instance.web[{i}]', {'name': f'web-{i}'}, index=i) for i in range(web_count)]
+    if consumer_count is None:
+        lb = [planned('google_compute_forwarding_rule.lb')]
+    else:
+        lb = [planned(f'google_compute_forwarding_rule.lb[{i}]', {'name': f'lb-{i}'}, index=i) for i in range(consumer_count)]
+    return make_plan(
+        [
+            block('google_compute_instance.web', count_expression={'constant_value': web_count}),
+            block('google_compute_forwarding_rule.lb', {'target': refs('google_compute_instance.web', 'google_compute_instance.web.id')}),
+        ],
+        web + lb,
+    )
+
+def test_unkeyed_reference_reaches_every_instance():
+    # e.g. `google_compute_instance.web[*].id`: the rule depends on all the instances
+    graph = build_graph(extract_resources(splat_plan(3)), edges=True)
+    assert sorted(graph['edges']) == [('google_compute_forwarding_rule.lb', f'google_compute_instance.web[{i}]') for i in range(3)]
+
+def test_unkeyed_reference_to_aggregated_block():
+    graph = build_graph(extract_resources(splat_plan(3)), edges=True, aggregate_threshold=2)
+    target = graph['aliases']['google_compute_instance.web[0]']
+    assert graph['edges'] == [('google_compute_forwarding_rule.lb', target)]
+
+def test_correlated_instances_keep_one_edge():
+    # `count.index` lookups: lb[i] -> web[i] when both blocks have the same keys
+    graph = build_graph(extract_resources(splat_plan(3, 3)), edges=True)
+    assert sorted(graph['edges']) == [(f'google_compute_forwarding_rule.lb[{i}]', f'google_compute_instance.web[{i}]') for i in range(3)]
@@ -0,0 +1,41 @@
+"""Tests for the script emitter (see `src.script`) and its agreement with the renderer."""
+
+import ast
+
+from plans import block, make_plan, module_plan, network_plan, planned, refs
+from src.loader import extract_resources
+from src.render import diagram_source
+from src.resolver import build_graph
+from src.script import generate_script, sanitize_var_name
+
+def test_script_declares_the_graph():
+    graph = build_graph(extract_resources(network_plan()))
+    script = generate_script(graph, "output/infra", outformat=["png", "svg"])
+    tree = ast.parse(script)
+
+    assigned = {target.id for node in ast.walk(tree) if isinstance(node, ast.Assign) for target in node.targets if isinstance(target, ast.Name)}
+    assert {sanitize_var_name(addr) for addr in graph['nodes']} <= assigned
+    clusters = [item.context_expr.args[0].value for node in ast.walk(tree) if isinstance(node, ast.With) for item in node.items if item.context_expr.func.id == "Cluster"]
+    assert clusters == [cluster.label for cluster in graph['clusters'].values()]
+    assert 'filename="infra", outformat=["png", "svg"]' in script
+
+def test_renderer_draws_the_same_model():
+    graph = build_graph(extract_resources(network_plan()))
+    source = diagram_source(graph)
+    for element in list(graph['nodes'].values()) + list(graph['clusters'].values()):
+        assert f'label="{element.label}"' in source or f'label={element.label}' in source
+
+def test_layers_list_every_node_once():
+    graph = build_graph(extract_resources(network_plan()))
+    in_layers = [addr for addrs in graph['layers'].values() for addr in addrs]
+    assert sorted(in_layers) == sorted(graph['nodes'])
+    assert graph['layers']['data'] == ['google_sql_database_instance.db']
+
+def test_script_with_empty_clusters_runs_through_the_parser():
+    # A subnet without resources, and modules whose resources all sit in the root subnet
+    plan = make_plan(
+        [block('google_compute_network.vpc'), block('google_compute_subnetwork.empty', {'network': refs('google_compute_network.vpc.id')})],
+        [planned('google_compute_network.vpc'), planned('google_compute_subnetwork.empty')],
+    )
+    for graph in (build_graph(extract_resources(plan)), build_graph(extract_resources(module_plan()), module_clusters=True)):
+        compile(generate_script(graph, "output/infra"), "script.py", "exec")
@@ -0,0 +1,89 @@
+"""Tests for the render server (see `src.server`), with a thread pool instead of worker processes."""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.server
+from plans import network_plan
+from src.server import RenderServer, render_upload
+
+class Writer:
+    """Collects what the server writes to a connection."""
+
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def cache_options(tmp_path):
+    return {'cache_dir': str(tmp_path / "cache"), 'plan_cache_dir': str(tmp_path / "plans")}
+
+@pytest.fixture
+def exchange(monkeypatch, cache_options):
+    """Sends raw HTTP requests to a server. Returns (status, JSON error or body) for each."""
+    upload = render_upload
+    monkeypatch.setattr(src.server, "render_upload", lambda plan_bytes, outformat, options: upload(plan_bytes, outformat, dict(options, **cache_options)))
+
+    def run(*requests):
+        async def main():
+            server = RenderServer(workers=1)
+            server.queue = asyncio.Queue(maxsize=server.max_queue)
+            server.executor = ThreadPoolExecutor(max_workers=1)
+            dispatcher = asyncio.create_task(server._dispatch())
+            responses = []
+            for request in requests:
+                reader = asyncio.StreamReader()
+                reader.feed_data(request)
+                reader.feed_eof()
+                writer = Writer()
+                await server.handle(reader, writer)
+                head, _, body = writer.data.partition(b"\r\n\r\n")
+                status = int(head.split(b" ")[1])
+                responses.append((status, json.loads(body)['error'] if status >= 400 else body))
+            dispatcher.cancel()
+            server.executor.shutdown()
+            return responses
+        return asyncio.run(main())
+    return run
+
+def post(body, query="format=dot&backend=dot", length=None):
+    length = len(body) if length is None else length
+    return f"POST /render?{query} HTTP/1.1\r\nHost: test\r\nContent-Length: {length}\r\n\r\n".encode("latin-1") + body
+
+def test_render(exchange):
+    [(status, body)] = exchange(post(json.dumps(network_plan()).encode("utf-8")))
+    assert status == 200
+    assert body.startswith(b"digraph") and b"google_compute_instance.web" in body
+
+@pytest.mark.parametrize("body", [b"[]", b"{}", b'{"format_version": "1.2"}', b"not json"])
+def test_non_plan_bodies_are_unprocessable(exchange, body):
+    [(status, error)] = exchange(post(body))
+    assert status == 422
+    assert error.startswith("Cannot render plan: ValueError")
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1.5"])
+def test_invalid_content_length(exchange, length):
+    [(status, error)] = exchange(post(b"{}", length=length))
+    assert status == 400
+    assert error == f"Invalid Content-Length: '{length}'"
+
+def test_uploads_leave_no_hash_records(cache_options):
+    plan_bytes = json.dumps(network_plan()).encode("utf-8")
+    for _ in range(2):
+        assert render_upload(plan_bytes, "dot", dict(cache_options, backend="dot"))[0] == "dot"
+    with pytest.raises(ValueError):
+        render_upload(b"[]", "dot", dict(cache_options, backend="dot"))
+    # The parsed plan is cached once; the records of the temporary files are gone
+    assert [os.path.splitext(name)[1] for name in os.listdir(cache_options['plan_cache_dir'])] == [".marshal"]